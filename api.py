@@ -3,22 +3,40 @@ FastAPI сервис для розпізнавання паспортних да
 Локальна веб-система на базі Florence-2 VLM моделі.
 """
 
+import json
 import base64
+import asyncio
 import logging
+import threading
+import time
 from pathlib import Path
-from io import BytesIO
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import fastapi
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import uvicorn
 
-from inference import PassportOCREngine
+from engine_base import TieredOCREngine, BaseOCREngine
+from uploads import read_upload, PayloadTooLargeError
+from result_cache import ResultCache
+from image_encoding import IMAGE_FORMATS, encode_image_async, media_type, extension
+from fast_json import FastJSONResponse, dumps
+from job_store import JobStore
+from stage_timer import StageTimer
+from profiler import ProfilerCapture
+import metrics
 from config import (
-    API_CONFIG, MODEL_LOCAL_PATH, LOGS_DIR, STATIC_DIR,
-    JPEG_QUALITY, API_HOST, API_PORT, ENABLE_SWAGGER_DOCS,
+    API_CONFIG, LOGS_DIR, STATIC_DIR,
+    API_HOST, API_PORT, ENABLE_SWAGGER_DOCS,
+    QUALITY_LEVELS, DEFAULT_QUALITY, PROCESS_TASKS, DEFAULT_TASKS, MAX_FILE_SIZE_MB,
+    MAX_CONCURRENT_REQUESTS, BATCH_SIZE, BATCH_PREFETCH,
+    API_BATCH_MAX_ITEMS, API_BATCH_MAX_UPLOAD_MB,
+    FACE_IMAGE_DELIVERY_MODES, DEFAULT_FACE_IMAGE_DELIVERY, RESULT_CACHE_TTL_SECONDS,
+    FACE_IMAGE_FORMAT, FAST_JSON_RESPONSES, JOBS_POLL_INTERVAL, JOBS_RETENTION_HOURS, ENGINE_BACKEND,
+    ENABLE_METRICS, LOG_STAGE_TIMINGS, ENABLE_PROFILER_ENDPOINT,
     get_config_summary, ensure_directories
 )
 
@@ -35,7 +53,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger("passport_api")
 
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 
 # ========== Startup/Shutdown события ==========
 @asynccontextmanager
@@ -44,21 +62,35 @@ async def lifespan(app: FastAPI):
     LifeSpan context manager для управління життєвим циклом додатка.
     Завантажує модель при старті та очищає при вимиканні.
     """
-    global ocr_engine
+    global ocr_engine, job_store, job_wakeup
 
     logger.info("[STARTUP] Starting Passport Reader API Server...")
-    logger.info("[STARTUP] Loading Florence-2 model...")
+    logger.info(f"[STARTUP] Loading engine ({ENGINE_BACKEND}, fast JSON: {FAST_JSON_RESPONSES})...")
 
     try:
-        ocr_engine = PassportOCREngine(model_path=MODEL_LOCAL_PATH)
+        ocr_engine = TieredOCREngine()
         logger.info("[STARTUP] Model initialized successfully")
     except Exception as e:
         logger.error(f"[STARTUP] Critical error loading model: {e}")
         raise
 
+    job_store = JobStore()
+    job_wakeup = asyncio.Event()
+    requeued = job_store.requeue_running()
+    if requeued:
+        logger.info(f"[STARTUP] Requeued {requeued} interrupted job(s)")
+    worker = asyncio.ensure_future(_job_worker())
+
+    metrics.JOBS_QUEUED.set_function(lambda: job_store.count("queued"))
+    metrics.JOBS_RUNNING.set_function(lambda: job_store.count("running"))
+    metrics.RESULT_CACHE_ITEMS.set_function(lambda: len(result_cache))
+    metrics.RESULT_CACHE_BYTES.set_function(lambda: result_cache.nbytes)
+
     yield
 
     logger.info("[SHUTDOWN] Stopping server...")
+    worker.cancel()
+    job_store.close()
     if ocr_engine is not None:
         ocr_engine.cleanup()
 
@@ -66,23 +98,325 @@ async def lifespan(app: FastAPI):
 # ========== Приватизування FastAPI ==========
 app = FastAPI(**API_CONFIG, lifespan=lifespan)
 
+if ENABLE_METRICS:
+    @app.middleware("http")
+    async def http_metrics(request: Request, call_next):
+        """Кількість запитів за шаблоном маршруту/методом/статусом та їх затримка."""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Шаблон маршруту ("/api/jobs/{job_id}"), а не шлях - інакше мітки без меж
+            route = request.scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            metrics.HTTP_REQUESTS.inc(route=template, method=request.method, status=str(status))
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route=template)
+
 # ========== Глобальні змінні ==========
-ocr_engine: Optional[PassportOCREngine] = None
+ocr_engine: Optional[TieredOCREngine] = None
+
+# Обмежує одночасні виклики рушія (GPU). Семафор блокуючий - захоплюється лише в
+# пулі потоків (run_in_threadpool), щоб очікування не зупиняло цикл подій
+engine_gate = threading.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# torch.profiler на вимогу (POST /api/admin/profile); поки не взведено - без накладних витрат
+profiler_capture = ProfilerCapture()
+
+# Кадровані обличчя для face_image_delivery="url"
+result_cache = ResultCache()
+
+# Черга асинхронних задач (створюється в lifespan) та сигнал воркеру про нову задачу
+job_store: Optional[JobStore] = None
+job_wakeup: Optional[asyncio.Event] = None
 
 # ========== Моделі для запитів/відповідей ==========
 class ProcessRequest(BaseModel):
     """Запит для обробки зображення."""
     file_path: str  # Абсолютний шлях до файлу на локальній машині
+    quality: str = DEFAULT_QUALITY  # Рівень якості: "high" (768px), "medium" (512px), "fast" (384px)
+    model_tier: Optional[str] = None  # Примусовий рівень моделі ("base"/"large"), None - автоескалація
+    tasks: List[str] = list(DEFAULT_TASKS)  # Потрібні результати: "number", "ocr_text", "face_box", "face_image"
+    face_image_delivery: str = DEFAULT_FACE_IMAGE_DELIVERY  # "base64" (в JSON) або "url" (окремий GET)
+    face_image_format: str = FACE_IMAGE_FORMAT  # "jpeg" або "webp"
+    include_timings: bool = False  # Додати у відповідь timings (час етапів і токени)
+
+
+class BatchProcessRequest(BaseModel):
+    """Запит пакетної обробки файлів, що лежать на сервері."""
+    file_paths: List[str]  # Абсолютні шляхи; індекс у списку повертається в полі "index"
+    quality: str = DEFAULT_QUALITY
+    model_tier: Optional[str] = None
+    tasks: List[str] = list(DEFAULT_TASKS)
+    face_image_delivery: str = DEFAULT_FACE_IMAGE_DELIVERY
+    face_image_format: str = FACE_IMAGE_FORMAT
 
 
 class ProcessResponse(BaseModel):
-    """Відповідь з результатами обробки."""
+    """
+    Відповідь з результатами обробки.
+
+    Поля задач, які не були запитані в ProcessRequest.tasks, не потрапляють у JSON.
+    """
     status: str  # "success" або "error"
     passport_number: Optional[str] = None  # Знайдений номер або null
-    image_base64: str  # Зображення в Base64 з MIME-типом
+    document_type: Optional[str] = None  # Тип документа за форматом номера (ключ PASSPORT_REGEX_PATTERNS)
+    image_base64: Optional[str] = None  # Зображення в Base64 з MIME-типом
+    face_image_url: Optional[str] = None  # Посилання на фото (face_image_delivery="url"), живе RESULT_CACHE_TTL_SECONDS
+    face_box: Optional[List[int]] = None  # Рамка обличчя [x1, y1, x2, y2] або null
+    face_source: Optional[str] = None  # Хто знайшов обличчя: "template", "haar" або "florence"
     ocr_text: str = ""  # Сирий текст OCR (для отладки)
     processing_time: str  # Час обробки у форматі "0.45s"
+    quality: str = DEFAULT_QUALITY  # Рівень якості, з яким виконано інференс
+    model_tier: Optional[str] = None  # Рівень моделі, що дав відповідь
+    escalated: bool = False  # True, якщо дешевша модель не впоралася і запит пішов вище
     error_message: Optional[str] = None  # Повідомлення про помилку
+    timings: Optional[Dict[str, Any]] = None  # Час етапів і токени (include_timings=true), див. _timings
+
+
+async def _build_response_fields(
+    result: Dict[str, Any],
+    delivery: str = DEFAULT_FACE_IMAGE_DELIVERY,
+    image_format: str = FACE_IMAGE_FORMAT,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    """
+    Збирає поля ProcessResponse з результату рушія.
+
+    Заповнюються лише поля запитаних задач, тому дорогі поля (image_base64,
+    ocr_text) не серіалізуються, якщо не потрібні, а фото без задачі
+    face_image не кодується взагалі.
+    З delivery="url" фото кладеться в result_cache без кодування, а JSON
+    містить лише посилання; інакше кодується в пулі image_encoding.
+    Час цього кроку потрапляє в timer як етап "encode".
+    """
+    tasks = result["tasks"]
+    fields: Dict[str, Any] = {
+        "status": "success",
+        "processing_time": f"{result['processing_time']:.2f}s",
+        "quality": result["quality"],
+        "model_tier": result["model_tier"],
+        "escalated": result["escalated"],
+        "error_message": None,
+    }
+
+    if "number" in tasks:
+        fields["passport_number"] = result["passport_number"]
+        fields["document_type"] = result["document_type"]
+
+    if "ocr_text" in tasks:
+        fields["ocr_text"] = result["ocr_text"][:500]  # Обмежуємо для JSON
+
+    if "face_box" in tasks:
+        fields["face_box"] = list(result["face_box"]) if result["face_box"] else None
+        fields["face_source"] = result["face_source"]
+
+    if "face_image" in tasks:
+        with timer.stage("encode") if timer is not None else nullcontext():
+            if delivery == "url":
+                result_id = result_cache.put(result["image"], image_format)
+                fields["face_image_url"] = f"/api/results/{result_id}/face.{extension(image_format)}"
+            else:
+                # Кодуємо зображення поза циклом подій і конвертуємо в Base64
+                data = await encode_image_async(result["image"], image_format)
+                image_base64 = base64.b64encode(data).decode("utf-8")
+                fields["image_base64"] = f"data:{media_type(image_format)};base64,{image_base64}"
+
+    return fields
+
+
+def _respond(fields: Dict[str, Any]):
+    """
+    Відповідь для ендпоінтів з response_model=ProcessResponse.
+
+    З FAST_JSON_RESPONSES поля, зібрані сервером, серіалізуються напряму
+    (FastAPI не валідує повернений Response); інакше - через pydantic
+    з response_model_exclude_unset.
+    """
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(fields)
+    return ProcessResponse(**fields)
+
+
+def _require_engine() -> TieredOCREngine:
+    """Повертає рушій або 500, якщо модель не завантажена."""
+    if ocr_engine is None:
+        logger.error("[ERROR] Model not loaded!")
+        raise HTTPException(
+            status_code=500,
+            detail="Модель не завантажена. Перезавантажте сервер."
+        )
+    return ocr_engine
+
+
+def _validate_options(
+    quality: str,
+    tasks: List[str],
+    delivery: str = DEFAULT_FACE_IMAGE_DELIVERY,
+    image_format: str = FACE_IMAGE_FORMAT,
+) -> None:
+    """Перевіряє рівень якості, список задач, спосіб видачі та формат фото (400 при помилці)."""
+    if quality not in QUALITY_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Невідомий рівень якості '{quality}'. Доступні: {', '.join(QUALITY_LEVELS)}"
+        )
+
+    unknown_tasks = [task for task in tasks if task not in PROCESS_TASKS]
+    if unknown_tasks or not tasks:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Некоректний список задач {tasks}. Доступні: {', '.join(PROCESS_TASKS)}"
+        )
+
+    if delivery not in FACE_IMAGE_DELIVERY_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Невідомий спосіб видачі фото '{delivery}'. Доступні: {', '.join(FACE_IMAGE_DELIVERY_MODES)}"
+        )
+
+    if image_format not in IMAGE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Невідомий формат фото '{image_format}'. Доступні: {', '.join(IMAGE_FORMATS)}"
+        )
+
+
+def _validate_tier(engine: TieredOCREngine, model_tier: Optional[str]) -> None:
+    """Перевіряє, що примусовий рівень моделі завантажено (400 при помилці)."""
+    if model_tier is not None and model_tier not in engine.order:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Рівень моделі '{model_tier}' не завантажено. Доступні: {', '.join(engine.order)}"
+        )
+
+
+def _engine_error(e: Exception, source: str) -> HTTPException:
+    """
+    Переводить виняток рушія в HTTP-помилку.
+
+    FileNotFoundError -> 404, ValueError -> 400, RuntimeError та інше -> 500.
+    """
+    if isinstance(e, FileNotFoundError):
+        logger.warning(f"[WARN] File not found: {source}")
+        return HTTPException(status_code=404, detail=f"Файл не знайдено: {source}")
+
+    if isinstance(e, ValueError):
+        logger.warning(f"[WARN] Invalid request: {e}")
+        return HTTPException(status_code=400, detail=str(e))
+
+    if isinstance(e, RuntimeError):
+        error_msg = str(e)
+        if "Out of Memory" in error_msg:
+            logger.error(f"[ERROR] CUDA OOM: {e}")
+            return HTTPException(
+                status_code=500,
+                detail="CUDA Out of Memory. Спробуйте менше зображення."
+            )
+        logger.error(f"[ERROR] Inference error: {e}")
+        return HTTPException(
+            status_code=500,
+            detail=f"Помилка при обробці зображення: {error_msg}"
+        )
+
+    logger.error(f"[ERROR] Unknown error: {e}", exc_info=True)
+    return HTTPException(
+        status_code=500,
+        detail=f"Невідома помилка сервера: {str(e)}"
+    )
+
+
+def _request_timer(include_timings: bool = False) -> Optional[StageTimer]:
+    """Таймер етапів запиту, якщо він потрібен відповіді, логу або метрикам."""
+    if include_timings or LOG_STAGE_TIMINGS or ENABLE_METRICS:
+        return StageTimer()
+    return None
+
+
+def _call_engine(engine: TieredOCREngine, batch_size: int, call, timer: Optional[StageTimer] = None):
+    """
+    Виконує call() під engine_gate із заміром етапів і метриками рушія.
+    Блокує потік - викликати лише з пулу потоків (run_in_threadpool).
+
+    timer підключається до рушія на час виклику (для метрик створюється
+    свій, якщо не передано). Час поза етапами рушія (постобробка, ескалація)
+    потрапляє в етап "other", тож сума етапів дорівнює часу виклику.
+    Рахує виклики в очікуванні слоту та в роботі, а після виклику віддає
+    час етапів і кількість згенерованих токенів у гістограми. Взведений
+    profiler_capture профілює виклик, а експортує профіль після звільнення engine_gate.
+    """
+    if timer is None and ENABLE_METRICS:
+        timer = StageTimer()
+
+    if ENABLE_METRICS:
+        metrics.ENGINE_WAITING.inc()
+    try:
+        engine_gate.acquire()
+    finally:
+        if ENABLE_METRICS:
+            metrics.ENGINE_WAITING.dec()
+
+    if ENABLE_METRICS:
+        metrics.ENGINE_BUSY.inc()
+    try:
+        if timer is not None:
+            engine.set_stage_timer(timer)
+            engine_call = call
+
+            def call():
+                with timer.stage("other"):
+                    return engine_call()
+
+        return profiler_capture.run(call) if profiler_capture.armed else call()
+    finally:
+        if timer is not None:
+            engine.set_stage_timer(None)
+        engine_gate.release()
+        # Експорт профілю - поза слотом рушія і поза замірами етапів
+        profiler_capture.finish()
+
+        if ENABLE_METRICS:
+            metrics.ENGINE_BUSY.dec()
+            metrics.BATCH_SIZE.observe(batch_size)
+            for stage, seconds in timer.timings.items():
+                metrics.STAGE_LATENCY.observe(seconds, stage=stage)
+            for stage, count in timer.stage_tokens.items():
+                metrics.GENERATED_TOKENS.inc(count, stage=stage)
+
+
+def _timings(timer: StageTimer) -> Dict[str, Any]:
+    """
+    Поле timings відповіді: час етапів (мс, без вкладених етапів), токени та швидкість декодування.
+
+    Етапи: decode (читання зображення), preprocess, vision_encode, ocr_decode,
+    grounding_decode, face_detect, crop, other (решта часу рушія) та encode
+    (кодування фото для відповіді). Токени - за етапами декодування.
+    """
+    return {
+        "total_ms": round(sum(timer.timings.values()) * 1000, 1),
+        "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in timer.timings.items()},
+        "tokens": dict(timer.stage_tokens),
+        "tokens_per_second": {
+            stage: round(count / timer.timings[stage], 1)
+            for stage, count in timer.stage_tokens.items()
+            if timer.timings.get(stage)
+        },
+    }
+
+
+def _log_result(result: Dict[str, Any], timer: Optional[StageTimer] = None, source: str = "") -> None:
+    if ENABLE_METRICS:
+        metrics.RESULTS.inc(model_tier=str(result["model_tier"]), escalated=str(bool(result["escalated"])).lower())
+    logger.info(
+        f"[INFO] Processing complete. Passport: {result['passport_number'] or 'Not found'} "
+        f"(tier: {result['model_tier']}, escalated: {result['escalated']})"
+    )
+    if LOG_STAGE_TIMINGS and timer is not None:
+        # Один JSON-рядок на запит - для пошуку повільних етапів у лозі
+        record = {"source": source, "model_tier": result["model_tier"], "quality": result["quality"], **_timings(timer)}
+        logger.info(f"[TIMINGS] {json.dumps(record, ensure_ascii=False)}")
 
 
 # ========== REST API Endpoints ==========
@@ -103,33 +437,28 @@ async def root():
     return static_path
 
 
-@app.post("/api/process", response_model=ProcessResponse)
+@app.post("/api/process", response_model=ProcessResponse, response_model_exclude_unset=True)
 async def process_image(request: ProcessRequest) -> ProcessResponse:
     """
     Обробляє зображення для розпізнавання паспортного номера.
 
     Query Params:
         file_path (str): Абсолютний шлях до файлу на локальній машині
+        quality (str): Рівень якості з QUALITY_LEVELS (default: DEFAULT_QUALITY)
+        model_tier (str): Примусовий рівень моделі (default: автоматична ескалація)
+        tasks (List[str]): Потрібні результати з PROCESS_TASKS (default: всі)
 
     Returns:
         ProcessResponse: JSON з результатами
 
     Error Codes:
-        400: Некоректний запит (відсутній file_path)
+        400: Некоректний запит (відсутній file_path, невідомий quality, model_tier або task)
         404: Файл не знайдено
         500: Помилка моделі або CUDA OOM
     """
-    global ocr_engine
-
     logger.info(f"[INFO] Processing request for file: {request.file_path}")
 
-    # Перевіряємо наявність моделі
-    if ocr_engine is None:
-        logger.error("[ERROR] Model not loaded!")
-        raise HTTPException(
-            status_code=500,
-            detail="Модель не завантажена. Перезавантажте сервер."
-        )
+    engine = _require_engine()
 
     # Валідація вхідних даних
     if not request.file_path:
@@ -138,59 +467,553 @@ async def process_image(request: ProcessRequest) -> ProcessResponse:
             detail="Поле 'file_path' не може бути пусте"
         )
 
+    _validate_options(request.quality, request.tasks, request.face_image_delivery, request.face_image_format)
+
+    timer = _request_timer(request.include_timings)
     try:
         # Обробляємо зображення
-        result = ocr_engine.process_image(request.file_path)
+        # engine_gate блокує потік - чекаємо на нього в пулі, а не в циклі подій
+        result = await run_in_threadpool(_call_engine, engine, 1, lambda: engine.process_image(
+            request.file_path,
+            quality=request.quality,
+            tasks=request.tasks,
+            tier=request.model_tier,
+        ), timer)
+    except Exception as e:
+        raise _engine_error(e, request.file_path)
 
-        # Конвертуємо зображення в Base64
-        buffer = BytesIO()
-        result["image"].save(buffer, format="JPEG", quality=JPEG_QUALITY)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        image_base64_with_mime = f"data:image/jpeg;base64,{image_base64}"
+    fields = await _build_response_fields(result, request.face_image_delivery, request.face_image_format, timer)
+    _log_result(result, timer, request.file_path)
+    if request.include_timings:
+        fields["timings"] = _timings(timer)
+    return _respond(fields)
 
-        logger.info(
-            f"[INFO] Processing complete. Passport: {result['passport_number'] or 'Not found'}"
-        )
 
-        return ProcessResponse(
-            status="success",
-            passport_number=result["passport_number"],
-            image_base64=image_base64_with_mime,
-            ocr_text=result["ocr_text"][:500],  # Обмежуємо для JSON
-            processing_time=f"{result['processing_time']:.2f}s",
-            error_message=None
-        )
+@app.post("/api/process/upload", response_model=ProcessResponse, response_model_exclude_unset=True)
+async def process_upload(
+    request: Request,
+    quality: str = DEFAULT_QUALITY,
+    model_tier: Optional[str] = None,
+    tasks: List[str] = Query(list(DEFAULT_TASKS)),
+    face_image_delivery: str = DEFAULT_FACE_IMAGE_DELIVERY,
+    face_image_format: str = FACE_IMAGE_FORMAT,
+    include_timings: bool = False,
+) -> ProcessResponse:
+    """
+    Обробляє зображення, передане в тілі запиту (без копіювання на диск сервера).
 
-    except FileNotFoundError as e:
-        logger.warning(f"[WARN] File not found: {request.file_path}")
-        raise HTTPException(
-            status_code=404,
-            detail=f"Файл не знайдено: {request.file_path}"
+    Body:
+        multipart/form-data з файловою частиною або сирі байти
+        (application/octet-stream / image/*, ім'я - у заголовку X-Filename)
+
+    Query Params:
+        quality, model_tier, tasks, face_image_delivery, face_image_format, include_timings: як у POST /api/process
+        (tasks повторюється: ?tasks=number&tasks=face_box)
+
+    Error Codes:
+        400: Некоректне тіло, не зображення, невідомі параметри
+        413: Файл більший за MAX_FILE_SIZE_MB (перевіряється під час читання)
+        500: Помилка моделі або CUDA OOM
+    """
+    engine = _require_engine()
+    _validate_options(quality, tasks, face_image_delivery, face_image_format)
+
+    try:
+        (name, data), = await read_upload(request)
+    except PayloadTooLargeError:
+        raise HTTPException(status_code=413, detail=f"Файл перевищує {MAX_FILE_SIZE_MB} MB")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"[INFO] Processing upload: {name} ({len(data)} bytes)")
+
+    timer = _request_timer(include_timings)
+    try:
+        result = await run_in_threadpool(
+            _call_engine,
+            engine,
+            1,
+            lambda: engine.process_bytes(data, name, quality=quality, tasks=tasks, tier=model_tier),
+            timer,
         )
+    except Exception as e:
+        raise _engine_error(e, name)
 
-    except RuntimeError as e:
-        error_msg = str(e)
-        
-        if "Out of Memory" in error_msg:
-            logger.error(f"[ERROR] CUDA OOM: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="CUDA Out of Memory. Спробуйте менше зображення."
+    fields = await _build_response_fields(result, face_image_delivery, face_image_format, timer)
+    _log_result(result, timer, name)
+    if include_timings:
+        fields["timings"] = _timings(timer)
+    return _respond(fields)
+
+
+def _ndjson(record: Dict[str, Any]) -> bytes:
+    return dumps(record) + b"\n"
+
+
+def _process_batch_locked(engine: TieredOCREngine, images, names, quality, tasks, tier):
+    return _call_engine(
+        engine, len(images), lambda: engine.process_batch(images, names, quality=quality, tasks=tasks, tier=tier)
+    )
+
+
+async def _stream_batch(
+    engine: TieredOCREngine,
+    sources: List[Any],
+    names: List[str],
+    loader,
+    quality: str,
+    tasks: List[str],
+    tier: Optional[str],
+    delivery: str,
+    image_format: str,
+):
+    """
+    NDJSON-генератор результатів пакетної обробки.
+
+    Файли читаються й декодуються в пулі потоків; готові зображення збираються
+    в батчі по BATCH_SIZE для рушія. Рядок видається, щойно документ готовий,
+    тому порядок довільний - відповідність задає поле "index". Помилки читання
+    видаються одразу, не чекаючи батчу. Одночасно в пам'яті не більше
+    BATCH_SIZE * (BATCH_PREFETCH + 1) декодованих зображень.
+    """
+    window = asyncio.Semaphore(BATCH_SIZE * (BATCH_PREFETCH + 1))
+
+    async def load(index: int):
+        await window.acquire()
+        try:
+            return index, await run_in_threadpool(loader, sources[index], names[index]), None
+        except Exception as e:
+            return index, None, str(e)
+
+    pending_loads = [asyncio.ensure_future(load(index)) for index in range(len(sources))]
+    ready: List[Any] = []
+    remaining = len(sources)
+
+    async def flush():
+        indices = [index for index, _ in ready]
+        images = [image for _, image in ready]
+        ready.clear()
+        try:
+            results = await run_in_threadpool(
+                _process_batch_locked, engine, images, [names[i] for i in indices], quality, tasks, tier
+            )
+            lines = []
+            for index, result in zip(indices, results):
+                fields = await _build_response_fields(result, delivery, image_format)
+                lines.append(_ndjson({"index": index, "file": names[index], **fields}))
+        except Exception as e:
+            logger.error(f"[ERROR] Batch inference error: {e}")
+            lines = [_ndjson(_batch_error(index, names[index], str(e))) for index in indices]
+        for _ in indices:
+            window.release()
+        return lines
+
+    try:
+        for next_load in asyncio.as_completed(pending_loads):
+            index, image, error = await next_load
+            remaining -= 1
+
+            if error is not None:
+                window.release()
+                yield _ndjson(_batch_error(index, names[index], error))
+            else:
+                ready.append((index, image))
+
+            if ready and (len(ready) >= BATCH_SIZE or remaining == 0):
+                for line in await flush():
+                    yield line
+    finally:
+        for future in pending_loads:
+            future.cancel()
+
+
+def _batch_error(index: int, name: str, message: str) -> Dict[str, Any]:
+    return {"index": index, "file": name, "status": "error", "error_message": message}
+
+
+@app.post("/api/process/batch")
+async def process_batch(
+    request: Request,
+    quality: str = DEFAULT_QUALITY,
+    model_tier: Optional[str] = None,
+    tasks: List[str] = Query(list(DEFAULT_TASKS)),
+    face_image_delivery: str = DEFAULT_FACE_IMAGE_DELIVERY,
+    face_image_format: str = FACE_IMAGE_FORMAT,
+) -> StreamingResponse:
+    """
+    Пакетна обробка з потоковою відповіддю (application/x-ndjson).
+
+    Body:
+        application/json - BatchProcessRequest (file_paths та параметри в тілі)
+        multipart/form-data - файлові частини; параметри в query, як у /api/process/upload
+
+    Returns:
+        По одному JSON-рядку на документ у порядку завершення:
+        {"index": 3, "file": "...", "status": "success", ...поля ProcessResponse}
+        {"index": 0, "file": "...", "status": "error", "error_message": "..."}
+
+    Error Codes:
+        400: Некоректне тіло, параметри або більше API_BATCH_MAX_ITEMS документів
+        413: Завантаження перевищує ліміти розміру
+        500: Модель не завантажена
+    """
+    engine = _require_engine()
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        try:
+            uploads = await read_upload(
+                request,
+                max_files=API_BATCH_MAX_ITEMS,
+                max_total=API_BATCH_MAX_UPLOAD_MB * 1024 * 1024,
             )
-        else:
-            logger.error(f"[ERROR] Inference error: {e}")
+        except PayloadTooLargeError:
             raise HTTPException(
-                status_code=500,
-                detail=f"Помилка при обробці зображення: {error_msg}"
+                status_code=413,
+                detail=f"Файл перевищує {MAX_FILE_SIZE_MB} MB або пакет - {API_BATCH_MAX_UPLOAD_MB} MB"
             )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    except Exception as e:
-        logger.error(f"[ERROR] Unknown error: {e}", exc_info=True)
+        names = [name for name, _ in uploads]
+        sources = [data for _, data in uploads]
+        loader = lambda data, name: BaseOCREngine._decode_image(data, name)
+    else:
+        try:
+            batch_request = BatchProcessRequest.model_validate(await request.json())
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Некоректне тіло запиту: {e}")
+
+        quality, model_tier, tasks = batch_request.quality, batch_request.model_tier, batch_request.tasks
+        face_image_delivery = batch_request.face_image_delivery
+        face_image_format = batch_request.face_image_format
+        names = sources = batch_request.file_paths
+        loader = lambda path, name: BaseOCREngine._load_image(path)
+
+    _validate_options(quality, tasks, face_image_delivery, face_image_format)
+    _validate_tier(engine, model_tier)
+    if not sources or len(sources) > API_BATCH_MAX_ITEMS:
         raise HTTPException(
-            status_code=500,
-            detail=f"Невідома помилка сервера: {str(e)}"
+            status_code=400,
+            detail=f"Пакет має містити від 1 до {API_BATCH_MAX_ITEMS} документів"
         )
 
+    logger.info(f"[INFO] Batch request: {len(sources)} document(s)")
+
+    return StreamingResponse(
+        _stream_batch(engine, sources, names, loader, quality, tasks, model_tier, face_image_delivery, face_image_format),
+        media_type="application/x-ndjson",
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Одна подія Server-Sent Events."""
+    return b"event: " + event.encode("ascii") + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def _stream_events(engine: TieredOCREngine, request: ProcessRequest):
+    """
+    Генератор SSE: події етапів рушія по мірі готовності, потім фото та результат.
+
+    Рушій працює в пулі потоків і передає події в asyncio.Queue через
+    call_soon_threadsafe; цикл подій тим часом віддає їх клієнту.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    timer = _request_timer(request.include_timings)
+
+    def work():
+        return _call_engine(engine, 1, lambda: engine.process_image(
+            request.file_path,
+            quality=request.quality,
+            tasks=request.tasks,
+            tier=request.model_tier,
+            on_event=on_event,
+        ), timer)
+
+    job = asyncio.ensure_future(run_in_threadpool(work))
+    try:
+        while not job.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield _sse(*getter.result())
+            else:
+                getter.cancel()
+
+        while not queue.empty():
+            yield _sse(*queue.get_nowait())
+
+        try:
+            result = job.result()
+        except Exception as e:
+            error = _engine_error(e, request.file_path)
+            yield _sse("error", {"status_code": error.status_code, "detail": error.detail})
+            return
+
+        fields = await _build_response_fields(result, request.face_image_delivery, request.face_image_format, timer)
+        _log_result(result, timer, request.file_path)
+        if request.include_timings:
+            fields["timings"] = _timings(timer)
+        if "face_image" in request.tasks:
+            yield _sse("face_image", {key: fields[key] for key in ("image_base64", "face_image_url") if key in fields})
+        yield _sse("result", fields)
+    finally:
+        # Клієнт відключився - дочікуємось рушія у фоні, не блокуючи відповідь
+        if not job.done():
+            job.add_done_callback(lambda future: future.exception())
+
+
+@app.get("/api/process/stream")
+async def process_stream(
+    file_path: str,
+    quality: str = DEFAULT_QUALITY,
+    model_tier: Optional[str] = None,
+    tasks: List[str] = Query(list(DEFAULT_TASKS)),
+    face_image_delivery: str = DEFAULT_FACE_IMAGE_DELIVERY,
+    face_image_format: str = FACE_IMAGE_FORMAT,
+    include_timings: bool = False,
+) -> StreamingResponse:
+    """
+    Обробка з потоковими подіями етапів (text/event-stream, для EventSource).
+
+    Query Params:
+        Як поля POST /api/process
+
+    Events:
+        ocr_token  {"text"} - приріст тексту OCR під час генерації (greedy-декодування;
+                   цей самий текст - фінальний ocr_text, він може відрізнятися від
+                   beam search у POST /api/process)
+        number     {"index", "passport_number", "document_type", "ocr_text"} - одразу після OCR
+        escalate   {"index", "model_tier"} - результат переробляє старша модель
+        face_box   {"index", "face_box", "face_source"}
+        face_image {"image_base64"} або {"face_image_url"} - якщо запитано face_image
+        result     поля ProcessResponse - фінальний результат
+        error      {"status_code", "detail"}
+
+    Error Codes:
+        400: Некоректні параметри (до початку потоку)
+    """
+    engine = _require_engine()
+    request = ProcessRequest(
+        file_path=file_path,
+        quality=quality,
+        model_tier=model_tier,
+        tasks=tasks,
+        face_image_delivery=face_image_delivery,
+        face_image_format=face_image_format,
+        include_timings=include_timings,
+    )
+
+    if not request.file_path:
+        raise HTTPException(status_code=400, detail="Поле 'file_path' не може бути пусте")
+    _validate_options(request.quality, request.tasks, request.face_image_delivery, request.face_image_format)
+
+    logger.info(f"[INFO] Streaming request for file: {request.file_path}")
+
+    return StreamingResponse(
+        _stream_events(engine, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _run_jobs(engine: TieredOCREngine, jobs: List[Dict[str, Any]]) -> None:
+    """Обробляє задачі з однаковими параметрами одним батчем рушія."""
+    request = ProcessRequest(**jobs[0]["request"])
+    if request.face_image_delivery == "url":
+        # Посилання з кешу прожило б менше, ніж результат задачі
+        request.face_image_delivery = "base64"
+
+    loaded = []
+    for job in jobs:
+        path = job["request"]["file_path"]
+        try:
+            loaded.append((job, await run_in_threadpool(BaseOCREngine._load_image, path)))
+        except Exception as e:
+            await run_in_threadpool(job_store.fail, job["id"], str(e))
+
+    if not loaded:
+        return
+
+    try:
+        results = await run_in_threadpool(
+            _process_batch_locked,
+            engine,
+            [image for _, image in loaded],
+            [Path(job["request"]["file_path"]).name for job, _ in loaded],
+            request.quality,
+            request.tasks,
+            request.model_tier,
+        )
+    except Exception as e:
+        logger.error(f"[ERROR] Job batch failed: {e}")
+        for job, _ in loaded:
+            await run_in_threadpool(job_store.fail, job["id"], str(e))
+        return
+
+    for (job, _), result in zip(loaded, results):
+        # Помилка однієї задачі не повинна лишати решту в стані running до перезапуску
+        try:
+            fields = await _build_response_fields(result, request.face_image_delivery, request.face_image_format)
+            await run_in_threadpool(job_store.complete, job["id"], fields)
+        except Exception as e:
+            logger.error(f"[ERROR] Job {job['id']} completion failed: {e}")
+            await run_in_threadpool(job_store.fail, job["id"], str(e))
+
+
+async def _job_worker() -> None:
+    """
+    Фоновий воркер черги: забирає до BATCH_SIZE сумісних задач і обробляє їх.
+
+    Прокидається одразу після POST /api/jobs або раз на JOBS_POLL_INTERVAL.
+    """
+    last_purge = 0.0
+    while True:
+        try:
+            engine = _require_engine()
+            jobs = await run_in_threadpool(job_store.claim, BATCH_SIZE)
+            if jobs:
+                logger.info(f"[INFO] Running {len(jobs)} queued job(s)")
+                await _run_jobs(engine, jobs)
+                continue
+
+            if time.time() - last_purge > 3600:
+                await run_in_threadpool(job_store.purge, JOBS_RETENTION_HOURS * 3600)
+                last_purge = time.time()
+
+            job_wakeup.clear()
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), JOBS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[ERROR] Job worker error: {e}", exc_info=True)
+            await asyncio.sleep(JOBS_POLL_INTERVAL)
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: ProcessRequest) -> Dict[str, Any]:
+    """
+    Ставить обробку файлу в чергу і одразу повертає ідентифікатор задачі.
+
+    Body:
+        Як POST /api/process (face_image_delivery="url" замінюється на "base64",
+        бо результат задачі зберігається довше за кеш посилань)
+
+    Returns:
+        {"job_id": "...", "status": "queued"}
+
+    Error Codes:
+        400: Некоректні параметри або рівень моделі не завантажено
+        500: Модель не завантажена
+    """
+    engine = _require_engine()
+    if not request.file_path:
+        raise HTTPException(status_code=400, detail="Поле 'file_path' не може бути пусте")
+    _validate_options(request.quality, request.tasks, request.face_image_delivery, request.face_image_format)
+    _validate_tier(engine, request.model_tier)
+
+    job_id = await run_in_threadpool(job_store.create, request.model_dump())
+    job_wakeup.set()
+
+    logger.info(f"[INFO] Job {job_id} queued for file: {request.file_path}")
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Стан задачі: queued, running, done (з result) або error (з error_message).
+
+    Error Codes:
+        404: Задачу не знайдено (або її видалено після JOBS_RETENTION_HOURS)
+    """
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задачу '{job_id}' не знайдено")
+    return FastJSONResponse(job)
+
+
+@app.get("/api/results/{result_id}/face.{file_extension}")
+async def get_face_image(result_id: str, file_extension: str) -> Response:
+    """
+    Віддає кадроване обличчя, збережене з face_image_delivery="url".
+
+    Error Codes:
+        404: Невідомий ідентифікатор, інший формат або минув RESULT_CACHE_TTL_SECONDS
+    """
+    image_format = next((name for name in IMAGE_FORMATS if extension(name) == file_extension), None)
+    data = None
+    if image_format is not None:
+        data = await run_in_threadpool(result_cache.get, result_id, image_format)
+    if ENABLE_METRICS:
+        metrics.RESULT_CACHE_REQUESTS.inc(result="miss" if data is None else "hit")
+    if data is None:
+        raise HTTPException(status_code=404, detail="Результат не знайдено або термін його зберігання минув")
+
+    return Response(
+        content=data,
+        media_type=media_type(image_format),
+        headers={"Cache-Control": f"private, max-age={RESULT_CACHE_TTL_SECONDS}"},
+    )
+
+
+def _require_profiler() -> None:
+    if not ENABLE_PROFILER_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Профілювання вимкнено (ENABLE_PROFILER_ENDPOINT)")
+
+
+@app.post("/api/admin/profile", status_code=202)
+async def arm_profiler(requests: int = 1) -> Dict[str, Any]:
+    """
+    Взводить torch.profiler на наступні requests викликів рушія.
+
+    Chrome trace кожного виклику та таблиця операторів пишуться в
+    PROFILER_DIR/<capture_id>/; стан - GET /api/admin/profile.
+
+    Error Codes:
+        400: requests поза межами 1..PROFILER_MAX_REQUESTS
+        404: Ендпоінт вимкнено (ENABLE_PROFILER_ENDPOINT = False)
+        409: Попереднє захоплення ще не завершене
+        503: torch не встановлено (ENGINE_BACKEND="fake")
+    """
+    _require_profiler()
+    try:
+        return profiler_capture.arm(requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        status_code = 409 if profiler_capture.armed else 503
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+
+@app.get("/api/admin/profile")
+async def profiler_status() -> Dict[str, Any]:
+    """Стан захоплення: чи взведено, скільки запитів лишилось, записані файли."""
+    _require_profiler()
+    return profiler_capture.status()
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> Response:
+    """
+    Метрики у текстовому форматі Prometheus (запити, етапи, токени, черга, кеш, RSS).
+
+    Error Codes:
+        404: Метрики вимкнено (ENABLE_METRICS = False)
+    """
+    if not ENABLE_METRICS:
+        raise HTTPException(status_code=404, detail="Метрики вимкнено (ENABLE_METRICS)")
+    content = await run_in_threadpool(metrics.REGISTRY.render)
+    return Response(content=content, media_type=metrics.CONTENT_TYPE)
+
 
 @app.get("/api/health")
 async def health_check():
@@ -208,19 +1031,36 @@ async def health_check():
 @app.get("/api/info")
 async def api_info():
     """Повертає інформацію про API та ресурси."""
-    import torch
-    
+    # Синтетичний рушій (ENGINE_BACKEND="fake") працює і без torch
+    try:
+        import torch
+    except ImportError:
+        torch = None
+    cuda_available = torch is not None and torch.cuda.is_available()
+
     return {
         "service_name": "Passport Reader API",
         "version": "0.1.0",
         "model": "Microsoft/Florence-2-Large",
-        "pytorch_version": torch.__version__,
-        "cuda_available": torch.cuda.is_available(),
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "engine_backend": ENGINE_BACKEND,
+        "model_tiers": ocr_engine.order if ocr_engine is not None else [],
+        "pytorch_version": torch.__version__ if torch is not None else None,
+        "cuda_available": cuda_available,
+        "device": "cuda" if cuda_available else "cpu",
+        "quality_levels": QUALITY_LEVELS,
         "endpoints": {
             "GET /": "HTML інтерфейс",
             "POST /api/process": "Обробка зображення",
+            "POST /api/process/upload": "Обробка завантаженого зображення (multipart або octet-stream)",
+            "POST /api/process/batch": "Пакетна обробка, потокова відповідь NDJSON",
+            "GET /api/process/stream": "Обробка з подіями етапів (Server-Sent Events)",
+            "POST /api/jobs": "Поставити обробку в чергу (повертає job_id)",
+            "GET /api/jobs/{id}": "Стан і результат задачі",
+            "GET /api/results/{id}/face.jpg|webp": "Кадроване обличчя (face_image_delivery=url)",
             "GET /api/health": "Перевірка здоров'я",
+            "GET /metrics": "Метрики Prometheus",
+            "POST /api/admin/profile?requests=N": "Профілювати наступні N запитів (ENABLE_PROFILER_ENDPOINT)",
+            "GET /api/admin/profile": "Стан профілювання",
             "GET /api/info": "Інформація про сервіс"
         }
     }
@@ -0,0 +1,505 @@
+"""
+Пакетна обробка папки або архіву зі сканами без HTTP.
+
+Рушій (TieredOCREngine) працює в цьому ж процесі; зображення читаються та
+декодуються пулом потоків наперед, поки GPU обробляє поточний батч.
+Результати дописуються в JSONL (один JSON-об'єкт на рядок, UTF-8) одразу
+після кожного батчу, тому файл можна читати під час роботи.
+
+Завершені входи записуються в append-only чекпойнт (<output>.ckpt), тому
+перерваний запуск (OOM, перезавантаження, деплой) продовжується з місця зупинки.
+--shard i/n детерміновано ділить корпус між процесами чи хостами за хешем
+ключа файлу - без координатора.
+
+Використання:
+    python batch.py D:\\Scans --output results.jsonl
+    python batch.py scans.zip --batch-size 16 --quality fast
+    python batch.py scans.tar.gz --tasks number face_image --faces-dir faces/
+    python batch.py /mnt/scans --shard 0/4     # на кожному хості свій i
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import hashlib
+import tarfile
+import zipfile
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from config import (
+    SUPPORTED_FORMATS, QUALITY_LEVELS, DEFAULT_QUALITY, PROCESS_TASKS,
+    BATCH_SIZE, BATCH_PREFETCH, BATCH_DECODE_WORKERS, BATCH_DEFAULT_TASKS,
+    MODEL_TIERS, JPEG_QUALITY, BATCH_CHECKPOINT_SUFFIX,
+)
+
+# (ключ запису, функція, що повертає шлях або файловий об'єкт для Image.open)
+InputItem = Tuple[str, Callable[[], Any]]
+
+# Фільтр ключів (шард, чекпойнт), застосовується до читання файлу
+KeyFilter = Callable[[str], bool]
+
+
+def _is_supported(name: str) -> bool:
+    return name.lower().endswith(SUPPORTED_FORMATS)
+
+
+def _keep_all(key: str) -> bool:
+    return True
+
+
+def iter_directory(root: Path, keep: KeyFilter = _keep_all) -> Iterator[InputItem]:
+    """Рекурсивно обходить папку у стабільному (відсортованому) порядку."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if _is_supported(filename):
+                path = Path(dirpath) / filename
+                key = path.relative_to(root).as_posix()
+                if keep(key):
+                    yield key, (lambda path=path: path)
+
+
+def iter_zip(archive: Path, keep: KeyFilter = _keep_all) -> Iterator[InputItem]:
+    """Члени zip-архіву; читання з кількох потоків безпечне."""
+    zf = zipfile.ZipFile(archive)
+    for name in sorted(zf.namelist()):
+        if _is_supported(name) and keep(name):
+            yield name, (lambda name=name: io.BytesIO(zf.read(name)))
+
+
+def iter_tar(archive: Path, keep: KeyFilter = _keep_all) -> Iterator[InputItem]:
+    """Члени tar-архіву; tarfile не потокобезпечний, тому байти читаються тут послідовно."""
+    with tarfile.open(archive) as tf:
+        for member in tf:
+            if member.isfile() and _is_supported(member.name) and keep(member.name):
+                data = tf.extractfile(member).read()
+                yield member.name, (lambda data=data: io.BytesIO(data))
+
+
+def iter_inputs(source: Path, keep: KeyFilter = _keep_all) -> Iterator[InputItem]:
+    """
+    Вибирає спосіб обходу за типом джерела.
+
+    Args:
+        source: Папка, zip або tar(.gz)
+        keep: Фільтр ключів; відкинуті файли навіть не читаються
+
+    Raises:
+        FileNotFoundError: Джерело не існує
+        ValueError: Непідтримуваний тип файлу
+    """
+    if not source.exists():
+        raise FileNotFoundError(f"[ERROR] Input not found: {source}")
+    if source.is_dir():
+        return iter_directory(source, keep)
+    if zipfile.is_zipfile(source):
+        return iter_zip(source, keep)
+    if tarfile.is_tarfile(source):
+        return iter_tar(source, keep)
+    raise ValueError(f"[ERROR] Unsupported input (expected directory, zip or tar): {source}")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Розбирає --shard "i/n" (i від 0 до n-1).
+
+    Raises:
+        argparse.ArgumentTypeError: Некоректний формат
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/n (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}': need 0 <= i < n")
+    return index, count
+
+
+def in_shard(key: str, index: int, count: int) -> bool:
+    """Детермінований розподіл за CRC32 ключа - однаковий на всіх хостах і запусках."""
+    return zlib.crc32(key.encode("utf-8")) % count == index
+
+
+class Checkpoint:
+    """
+    Append-only журнал завершених входів.
+
+    Кожен рядок - 16 hex-символів blake2b від ключа файлу, тож розмір не залежить
+    від довжини шляхів (~17 байт на файл). Обірваний останній рядок після збою
+    ігнорується. Ключі дописуються лише після запису їх результатів у JSONL,
+    тому збій між двома записами дає дубль результату, а не пропуск.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done = set()
+
+        if path.exists():
+            with open(path, "r", encoding="ascii", errors="ignore") as f:
+                for line in f:
+                    line = line.strip()
+                    if len(line) == 16:
+                        self.done.add(line)
+
+        self._file = open(path, "a", encoding="ascii")
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        return self.digest(key) in self.done
+
+    def __len__(self) -> int:
+        return len(self.done)
+
+    def add_many(self, keys: List[str]) -> None:
+        """Дописує ключі та скидає їх на диск (fsync)."""
+        if not keys:
+            return
+        digests = [self.digest(key) for key in keys]
+        self._file.write("".join(digest + "\n" for digest in digests))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(digests)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _decode(item: InputItem) -> Tuple[str, Optional[Image.Image], Optional[str]]:
+    """Декодує зображення у потоці пулу: (ключ, зображення або None, помилка або None)."""
+    key, opener = item
+    try:
+        with Image.open(opener()) as image:
+            return key, image.convert("RGB"), None
+    except Exception as e:
+        return key, None, f"Image loading error: {e}"
+
+
+def iter_decoded_batches(
+    items: Iterator[InputItem],
+    batch_size: int,
+    prefetch: int = BATCH_PREFETCH,
+    workers: int = BATCH_DECODE_WORKERS,
+) -> Iterator[List[Tuple[str, Optional[Image.Image], Optional[str]]]]:
+    """
+    Повертає батчі декодованих зображень, тримаючи наперед prefetch батчів у роботі.
+
+    Декодування (PIL) відпускає GIL, тому пул потоків працює паралельно з GPU.
+    """
+    window = batch_size * (prefetch + 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = deque()
+        items = iter(items)
+        exhausted = False
+
+        while True:
+            while not exhausted and len(futures) < window:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                futures.append(pool.submit(_decode, item))
+
+            if not futures:
+                return
+
+            batch = []
+            while futures and len(batch) < batch_size:
+                batch.append(futures.popleft().result())
+            yield batch
+
+
+def face_file_name(key: str) -> str:
+    """
+    Ім'я файлу кадрованого обличчя для ключа входу.
+
+    Відносний шлях лишається читабельним, а відбиток повного ключа робить ім'я
+    унікальним: a/scan.jpg, a/scan.png і a__scan.jpg не перезаписують одне одного.
+    """
+    readable = Path(key).with_suffix("").as_posix().replace("/", "__")
+    return f"{readable}-{Checkpoint.digest(key)[:8]}.jpg"
+
+
+def result_to_record(key: str, result: Dict[str, Any], faces_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Перетворює результат рушія на JSONL-запис (лише поля запитаних задач)."""
+    tasks = result["tasks"]
+    record: Dict[str, Any] = {"file": key, "status": "success"}
+
+    if "number" in tasks:
+        record["passport_number"] = result["passport_number"]
+        record["document_type"] = result["document_type"]
+
+    if "ocr_text" in tasks:
+        record["ocr_text"] = result["ocr_text"]
+
+    if "face_box" in tasks:
+        record["face_box"] = list(result["face_box"]) if result["face_box"] else None
+        record["face_source"] = result["face_source"]
+
+    if "face_image" in tasks and faces_dir is not None:
+        face_path = faces_dir / face_file_name(key)
+        result["image"].save(face_path, format="JPEG", quality=JPEG_QUALITY)
+        record["face_image"] = str(face_path)
+
+    record.update({
+        "quality": result["quality"],
+        "model_tier": result["model_tier"],
+        "processing_time": round(result["processing_time"], 3),
+    })
+    return record
+
+
+def error_record(key: str, message: str) -> Dict[str, Any]:
+    """JSONL-запис про помилку обробки одного файлу."""
+    return {"file": key, "status": "error", "error_message": message}
+
+
+def write_record(sink, record: Dict[str, Any]) -> None:
+    """
+    Дописує запис одним рядком та одразу скидає буфер.
+
+    sink - текстовий файл або об'єкт з власним write_record (напр. watcher.SidecarSink).
+    """
+    if hasattr(sink, "write_record"):
+        sink.write_record(record)
+        return
+    sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sink.flush()
+
+
+def sync_sink(sink) -> None:
+    """
+    Скидає записані результати на диск (fsync), якщо sink - файл.
+
+    Викликається перед Checkpoint.add_many: інакше після збою живлення
+    чекпойнт міг би містити входи, рядки яких не дійшли до диска, і вони
+    були б пропущені назавжди. Канали й консоль (stdout) fsync не підтримують.
+    """
+    if not hasattr(sink, "fileno"):
+        return
+    sink.flush()
+    try:
+        os.fsync(sink.fileno())
+    except OSError:
+        pass
+
+
+def run_batch(
+    engine,
+    items: Iterator[InputItem],
+    sink,
+    batch_size: int = BATCH_SIZE,
+    quality: str = DEFAULT_QUALITY,
+    tasks=BATCH_DEFAULT_TASKS,
+    tier: Optional[str] = None,
+    faces_dir: Optional[Path] = None,
+    prefetch: int = BATCH_PREFETCH,
+    workers: int = BATCH_DECODE_WORKERS,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, int]:
+    """
+    Обробляє всі елементи батчами та пише результати в sink.
+
+    Помилка декодування чи інференсу стосується лише відповідних файлів:
+    для них пишуться записи зі status "error", обробка триває.
+    У чекпойнт потрапляють успішні файли та файли, що не декодуються
+    (повтор не допоможе); помилки інференсу повторяться при наступному запуску.
+
+    Returns:
+        Лічильники {"success": ..., "error": ...}
+    """
+    counts = {"success": 0, "error": 0}
+
+    for batch in iter_decoded_batches(items, batch_size, prefetch, workers):
+        keys, images, done = [], [], []
+        for key, image, error in batch:
+            if error is not None:
+                write_record(sink, error_record(key, error))
+                counts["error"] += 1
+                done.append(key)
+            else:
+                keys.append(key)
+                images.append(image)
+
+        if images:
+            try:
+                results = engine.process_batch(images, keys, quality=quality, tasks=tasks, tier=tier)
+            except RuntimeError as e:
+                for key in keys:
+                    write_record(sink, error_record(key, str(e)))
+                counts["error"] += len(keys)
+            else:
+                for key, result in zip(keys, results):
+                    write_record(sink, result_to_record(key, result, faces_dir))
+                    counts["success"] += 1
+                done.extend(keys)
+
+        if checkpoint is not None and done:
+            sync_sink(sink)
+            checkpoint.add_many(done)
+
+    return counts
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Аргументи командного рядка batch.py."""
+    parser = argparse.ArgumentParser(
+        description="Passport Reader - bulk processing to JSONL",
+        epilog="Example: python batch.py D:\\Scans --output results.jsonl"
+    )
+    parser.add_argument("input", type=str, help="Папка, zip або tar(.gz) архів зі сканами")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="JSONL-файл результатів (default: batch_results.jsonl, з шардом - batch_results.shard-i-of-n.jsonl)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="I/N",
+        help="Обробити лише шард i з n (0 <= i < n), напр. 0/4"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help=f"Файл чекпойнта (default: <output>{BATCH_CHECKPOINT_SUFFIX})"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ігнорувати наявний чекпойнт і обробити все заново"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Зображень в одному generate (default: {BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--quality",
+        choices=list(QUALITY_LEVELS),
+        default=DEFAULT_QUALITY,
+        help=f"Рівень якості (default: {DEFAULT_QUALITY})"
+    )
+    parser.add_argument(
+        "--tasks",
+        nargs="+",
+        choices=list(PROCESS_TASKS),
+        default=list(BATCH_DEFAULT_TASKS),
+        help=f"Задачі (default: {' '.join(BATCH_DEFAULT_TASKS)})"
+    )
+    parser.add_argument(
+        "--model-tier",
+        choices=list(MODEL_TIERS),
+        default=None,
+        help="Примусовий рівень моделі (default: автоматична ескалація)"
+    )
+    parser.add_argument(
+        "--faces-dir",
+        type=str,
+        default=None,
+        help="Папка для кадрованих облич (потрібна для задачі face_image)"
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=BATCH_PREFETCH,
+        help=f"Батчів, що декодуються наперед (default: {BATCH_PREFETCH})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BATCH_DECODE_WORKERS,
+        help=f"Потоків декодування (default: {BATCH_DECODE_WORKERS})"
+    )
+    return parser
+
+
+def main():
+    """Головна функція."""
+    args = build_parser().parse_args()
+
+    faces_dir = Path(args.faces_dir) if args.faces_dir else None
+    if "face_image" in args.tasks and faces_dir is None:
+        print("[ERROR] Task 'face_image' requires --faces-dir")
+        sys.exit(1)
+    if faces_dir is not None:
+        faces_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.output is None:
+        suffix = f".shard-{args.shard[0]}-of-{args.shard[1]}" if args.shard else ""
+        args.output = f"batch_results{suffix}.jsonl"
+
+    checkpoint_path = Path(args.checkpoint or args.output + BATCH_CHECKPOINT_SUFFIX)
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = Checkpoint(checkpoint_path)
+    if len(checkpoint):
+        print(f"[INFO] Resuming: {len(checkpoint)} input(s) already completed ({checkpoint_path})")
+
+    def keep(key: str) -> bool:
+        if args.shard is not None and not in_shard(key, *args.shard):
+            return False
+        return key not in checkpoint
+
+    try:
+        items = iter_inputs(Path(args.input), keep)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    from engine_base import TieredOCREngine
+    engine = TieredOCREngine()
+
+    start = time.time()
+    with open(args.output, "a", encoding="utf-8") as sink:
+        counts = run_batch(
+            engine,
+            items,
+            sink,
+            batch_size=args.batch_size,
+            quality=args.quality,
+            tasks=args.tasks,
+            tier=args.model_tier,
+            faces_dir=faces_dir,
+            prefetch=args.prefetch,
+            workers=args.workers,
+            checkpoint=checkpoint,
+        )
+    elapsed = time.time() - start
+    checkpoint.close()
+    engine.cleanup()
+
+    total = counts["success"] + counts["error"]
+    print("\n" + "=" * 70)
+    print(" BATCH COMPLETE")
+    print("=" * 70)
+    print(f"  {'processed':20s}: {total}")
+    print(f"  {'success':20s}: {counts['success']}")
+    print(f"  {'errors':20s}: {counts['error']}")
+    print(f"  {'elapsed':20s}: {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"  {'throughput':20s}: {total / elapsed:.2f} images/s")
+    if args.shard is not None:
+        print(f"  {'shard':20s}: {args.shard[0]}/{args.shard[1]}")
+    print(f"  {'output':20s}: {args.output}")
+    print(f"  {'checkpoint':20s}: {checkpoint_path}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+"""
+Бенчмарк рушія по етапах на зображеннях з data/ та proccessed_examples/.
+
+Кожне зображення обробляється N разів для прогріву (CUDA-ядра, кеші
+аллокатора) і M разів із замірами. Для кожного етапу - decode (читання
+файлу), preprocess, vision_encode, ocr_decode, face_detect, grounding_decode,
+crop, encode (JPEG/WebP) - рахуються p50/p95/p99; також токени за секунду
+декодування, пікова RSS процесу та пікова пам'ять CUDA. Результат можна
+зберегти в JSON для відстеження між версіями, а з --compare - порівняти з
+попереднім звітом: етап вважається регресією, якщо його медіана зросла понад
+--tolerance і зростання значуще за тестом Манна-Уітні (p < --alpha).
+Порівнюються лише звіти з однаковими умовами (COMPARABLE_META: якість,
+задачі, рівень моделі, рушій, набір зображень, формат фото); інакше - exit 1
+(--force - порівняти з попередженням).
+
+Використання:
+    python benchmark.py                                  # 2 прогріви, 5 замірів
+    python benchmark.py --warmup 3 --iterations 20 --quality fast
+    python benchmark.py --tasks number --output bench/baseline.json
+    python benchmark.py --tasks number --compare bench/baseline.json   # exit 1 при регресії
+    python benchmark.py --module-timing                  # + час DaViT / енкодера / декодера / lm_head
+"""
+
+import sys
+import json
+import math
+import time
+import hashlib
+import platform
+import importlib.util
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import (
+    PROJECT_ROOT, SUPPORTED_FORMATS, QUALITY_LEVELS, DEFAULT_QUALITY,
+    PROCESS_TASKS, MODEL_TIERS, MODEL_TIER_ORDER, FACE_IMAGE_FORMAT, ENGINE_BACKEND,
+)
+
+# Порядок етапів у звіті
+STAGES = (
+    "decode", "preprocess", "vision_encode", "ocr_decode",
+    "face_detect", "grounding_decode", "crop", "encode",
+)
+
+DEFAULT_DATA_DIRS = [PROJECT_ROOT / "data", PROJECT_ROOT / "proccessed_examples"]
+
+# Поля meta, що мають збігатися, щоб порівняння звітів мало сенс
+COMPARABLE_META = ("quality", "tasks", "model_tier", "engine_backend", "image_set", "face_image_format")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль q (0-100) з лінійною інтерполяцією."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Статистика вибірки (мс)."""
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) if samples else 0.0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+def mann_whitney_p(current: List[float], baseline: List[float]) -> float:
+    """
+    Однобічний тест Манна-Уітні (нормальне наближення з поправкою на зв'язки):
+    p-значення гіпотези "current повільніший за baseline".
+    """
+    n1, n2 = len(current), len(baseline)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+
+    # Ранги з усередненням для однакових значень
+    combined = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0.0
+    if variance <= 0:
+        return 1.0
+
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def image_set_digest(images: List[Path]) -> str:
+    """Відбиток набору зображень: імена файлів і їхні розміри."""
+    digest = hashlib.sha1()
+    for path in sorted(images, key=lambda path: path.name):
+        digest.update(f"{path.name}:{path.stat().st_size}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def meta_mismatches(baseline_meta: Dict[str, Any], current_meta: Dict[str, Any]) -> List[str]:
+    """Поля COMPARABLE_META, що відрізняються (або відсутні в одному зі звітів)."""
+    mismatches = []
+    for key in COMPARABLE_META:
+        old, new = baseline_meta.get(key), current_meta.get(key)
+        if key == "tasks" and old is not None and new is not None:
+            old, new = sorted(old), sorted(new)
+        if old is None or new is None or old != new:
+            mismatches.append(f"{key}: baseline={baseline_meta.get(key)!r}, current={current_meta.get(key)!r}")
+    return mismatches
+
+
+def load_torch():
+    """torch, якщо встановлено; None - синтетичний рушій без torch (пам'ять CUDA і sync не міряються)."""
+    if importlib.util.find_spec("torch") is None:
+        return None
+    import torch
+    return torch
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float,
+    alpha: float,
+    min_delta_ms: float = 1.0,
+    force: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Порівнює етапи двох звітів. Регресія - медіана зросла більше ніж на
+    tolerance (частка) і щонайменше на min_delta_ms (шум коротких етапів),
+    а зростання статистично значуще (p < alpha). Без вибірок вирішують лише пороги.
+
+    Returns:
+        Рядки порівняння по етапах, спільних для обох звітів
+
+    Raises:
+        ValueError: Умови звітів (COMPARABLE_META) відрізняються, а force не задано
+    """
+    mismatches = meta_mismatches(baseline.get("meta", {}), current.get("meta", {}))
+    if mismatches and not force:
+        raise ValueError("[ERROR] Reports are not comparable:\n  " + "\n  ".join(mismatches))
+
+    rows = []
+    for stage in list(STAGES) + ["total"]:
+        old, new = baseline["stages"].get(stage), current["stages"].get(stage)
+        if old is None or new is None:
+            continue
+
+        old_samples = baseline.get("samples", {}).get(stage)
+        new_samples = current.get("samples", {}).get(stage)
+        p_value = mann_whitney_p(new_samples, old_samples) if old_samples and new_samples else None
+
+        change = (new["p50"] - old["p50"]) / old["p50"] if old["p50"] > 0 else 0.0
+        significant = p_value is None or p_value < alpha
+        rows.append({
+            "stage": stage,
+            "baseline_p50": old["p50"],
+            "current_p50": new["p50"],
+            "baseline_p95": old["p95"],
+            "current_p95": new["p95"],
+            "change": change,
+            "p_value": p_value,
+            "regression": (
+                change > tolerance and new["p50"] - old["p50"] > min_delta_ms and significant
+            ),
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline_path: str, tolerance: float, alpha: float) -> None:
+    print("\n" + "=" * 78)
+    print(f" COMPARISON vs {baseline_path}  (tolerance {tolerance * 100:.0f}%, alpha {alpha})")
+    print("=" * 78)
+    print(f"  {'stage':18s} {'base p50':>10s} {'now p50':>10s} {'base p95':>10s} {'now p95':>10s} {'change':>8s} {'p':>6s}")
+
+    for row in rows:
+        p_value = f"{row['p_value']:.3f}" if row["p_value"] is not None else "-"
+        verdict = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"  {row['stage']:18s} {row['baseline_p50']:>8.1f}ms {row['current_p50']:>8.1f}ms "
+            f"{row['baseline_p95']:>8.1f}ms {row['current_p95']:>8.1f}ms "
+            f"{row['change'] * 100:>+7.1f}% {p_value:>6s}{verdict}"
+        )
+    print("=" * 78)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пікова RSS процесу (MB) або None, якщо платформа не дає її виміряти."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux - кілобайти, macOS - байти
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def find_images(directories: List[Path]) -> List[Path]:
+    images = []
+    for directory in directories:
+        if directory.is_dir():
+            images.extend(sorted(
+                path for path in directory.iterdir()
+                if path.suffix.lower() in SUPPORTED_FORMATS
+            ))
+    return images
+
+
+def run_benchmark(
+    engine,
+    images: List[Path],
+    warmup: int,
+    iterations: int,
+    quality: str,
+    tasks: List[str],
+    image_format: str = FACE_IMAGE_FORMAT,
+    synchronize: bool = True,
+    module_timer=None,
+) -> Dict[str, Any]:
+    """
+    Проганяє зображення через рушій і збирає вибірки часу етапів.
+
+    module_timer (ModuleTimer з хуками на моделі рушія) обнуляється після
+    прогріву, тож його звіт охоплює лише проходи із замірами.
+
+    Returns:
+        Словник результатів (формат JSON-звіту, див. main)
+    """
+    from image_encoding import encode_image
+    from engine_base import BaseOCREngine
+    from stage_timer import StageTimer
+
+    timer = StageTimer(synchronize=synchronize)
+    engine.stage_timer = timer
+
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    samples["total"] = []
+    tokens = 0
+    decode_seconds = 0.0
+
+    for iteration in range(warmup + iterations):
+        measured = iteration >= warmup
+        label = "measure" if measured else "warmup"
+        if module_timer is not None and iteration == warmup:
+            module_timer.reset()
+        print(f"[INFO] Iteration {iteration + 1}/{warmup + iterations} ({label})")
+
+        for image_path in images:
+            timer.reset()
+            start = time.perf_counter()
+
+            with timer.stage("decode"):
+                image = BaseOCREngine._load_image(str(image_path))
+            result = engine.process_batch([image], [image_path.name], quality=quality, tasks=tasks)[0]
+            if "face_image" in tasks:
+                with timer.stage("encode"):
+                    encode_image(result["image"], image_format)
+
+            total = time.perf_counter() - start
+            if not measured:
+                continue
+
+            for stage, seconds in timer.timings.items():
+                samples.setdefault(stage, []).append(seconds * 1000)
+            samples["total"].append(total * 1000)
+            tokens += timer.tokens
+            decode_seconds += timer.timings.get("ocr_decode", 0.0) + timer.timings.get("grounding_decode", 0.0)
+
+    engine.stage_timer = None
+
+    report: Dict[str, Any] = {
+        "stages": {stage: summarize(values) for stage, values in samples.items() if values},
+        "tokens": tokens,
+        "tokens_per_second": tokens / decode_seconds if decode_seconds > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_cuda_mb": None,
+        "samples": {stage: values for stage, values in samples.items() if values},
+    }
+    if module_timer is not None:
+        report["module_timing"] = module_timer.report()
+
+    torch = load_torch()
+    if torch is not None and torch.cuda.is_available():
+        report["peak_cuda_mb"] = torch.cuda.max_memory_allocated() / (1024 * 1024)
+
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    meta = report["meta"]
+    print("\n" + "=" * 78)
+    print(" BENCHMARK")
+    print("=" * 78)
+    print(f"  images: {meta['images']}  warmup: {meta['warmup']}  iterations: {meta['iterations']}")
+    print(f"  tier: {meta['model_tier']}  quality: {meta['quality']}  tasks: {' '.join(meta['tasks'])}\n")
+    print(f"  {'stage':18s} {'count':>6s} {'mean':>10s} {'p50':>10s} {'p95':>10s} {'p99':>10s}")
+
+    for stage in list(STAGES) + ["total"]:
+        stats = report["stages"].get(stage)
+        if stats is None:
+            continue
+        print(
+            f"  {stage:18s} {stats['count']:>6d} {stats['mean']:>8.1f}ms {stats['p50']:>8.1f}ms "
+            f"{stats['p95']:>8.1f}ms {stats['p99']:>8.1f}ms"
+        )
+
+    print()
+    if report["tokens_per_second"] is not None:
+        print(f"  {'decode tokens/s':18s}: {report['tokens_per_second']:.1f} ({report['tokens']} tokens)")
+    if report["peak_rss_mb"] is not None:
+        print(f"  {'peak RSS':18s}: {report['peak_rss_mb']:.0f} MB")
+    if report["peak_cuda_mb"] is not None:
+        print(f"  {'peak CUDA memory':18s}: {report['peak_cuda_mb']:.0f} MB")
+    print("=" * 78)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Passport Reader - per-stage benchmark")
+    parser.add_argument(
+        "--data-dirs",
+        nargs="+",
+        default=[str(path) for path in DEFAULT_DATA_DIRS],
+        help="Папки з зображеннями (default: data/ proccessed_examples/)"
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="Прогрівочних проходів (default: 2)")
+    parser.add_argument("--iterations", type=int, default=5, help="Проходів із замірами (default: 5)")
+    parser.add_argument(
+        "--quality",
+        choices=list(QUALITY_LEVELS),
+        default=DEFAULT_QUALITY,
+        help=f"Рівень якості (default: {DEFAULT_QUALITY})"
+    )
+    parser.add_argument(
+        "--tasks",
+        nargs="+",
+        choices=list(PROCESS_TASKS),
+        default=list(PROCESS_TASKS),
+        help="Задачі (default: всі)"
+    )
+    parser.add_argument(
+        "--model-tier",
+        choices=list(MODEL_TIERS),
+        default=MODEL_TIER_ORDER[-1],
+        help=f"Рівень моделі (default: {MODEL_TIER_ORDER[-1]})"
+    )
+    parser.add_argument(
+        "--face-image-format",
+        choices=["jpeg", "webp"],
+        default=FACE_IMAGE_FORMAT,
+        help=f"Формат кодування фото для етапу encode (default: {FACE_IMAGE_FORMAT})"
+    )
+    parser.add_argument(
+        "--no-sync",
+        action="store_true",
+        help="Не синхронізувати CUDA на межах етапів (менше впливу на загальний час, менш точні етапи)"
+    )
+    parser.add_argument("--output", type=str, default=None, help="Зберегти звіт у JSON")
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="JSON-звіт базової версії; при регресії етапу код виходу 1"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Порівнювати навіть звіти з різними умовами (якість, задачі, модель, рушій, зображення)"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=10.0,
+        help="Допустиме зростання медіани етапу, %% (default: 10)"
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Рівень значущості тесту Манна-Уітні (default: 0.05)"
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="Мінімальне абсолютне зростання медіани для регресії, мс (default: 1.0)"
+    )
+    parser.add_argument(
+        "--module-timing",
+        action="store_true",
+        help="Forward-хуки на підмодулях Florence-2 (DaViT, шари енкодера/декодера, lm_head)"
+    )
+    return parser
+
+
+def main():
+    """Головна функція."""
+    args = build_parser().parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot read baseline {args.compare}: {e}")
+            sys.exit(1)
+
+    images = find_images([Path(directory) for directory in args.data_dirs])
+    if not images:
+        print(f"[ERROR] No images found in {', '.join(args.data_dirs)}")
+        sys.exit(1)
+
+    conditions = {
+        "quality": args.quality,
+        "tasks": args.tasks,
+        "model_tier": args.model_tier,
+        "engine_backend": ENGINE_BACKEND,
+        "image_set": image_set_digest(images),
+        "face_image_format": args.face_image_format,
+    }
+
+    # Перевіряємо умови до довгого прогону
+    if baseline is not None:
+        mismatches = meta_mismatches(baseline.get("meta", {}), conditions)
+        if mismatches:
+            level = "WARN" if args.force else "ERROR"
+            print(f"[{level}] Baseline {args.compare} was measured under different conditions:")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+            if not args.force:
+                print("[ERROR] Refusing to compare. Re-record the baseline or pass --force")
+                sys.exit(1)
+            print("[WARN] --force: comparison below is NOT like for like")
+
+    torch = load_torch()
+    from engine_base import create_engine
+    engine = create_engine(MODEL_TIERS[args.model_tier]["path"])
+
+    module_timer = None
+    if args.module_timing:
+        from module_timing import ModuleTimer
+        if getattr(engine, "model", None) is None:
+            print("[ERROR] --module-timing requires the florence engine backend")
+            sys.exit(1)
+        module_timer = ModuleTimer(synchronize=not args.no_sync)
+        module_timer.attach(engine.model)
+
+    report = run_benchmark(
+        engine,
+        images,
+        warmup=args.warmup,
+        iterations=args.iterations,
+        quality=args.quality,
+        tasks=args.tasks,
+        image_format=args.face_image_format,
+        synchronize=not args.no_sync,
+        module_timer=module_timer,
+    )
+    report["meta"] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "images": len(images),
+        "warmup": args.warmup,
+        "iterations": args.iterations,
+        **conditions,
+        "device": engine.device,
+        "gpu": torch.cuda.get_device_name(0) if torch is not None and torch.cuda.is_available() else None,
+        "torch": torch.__version__ if torch is not None else None,
+        "python": platform.python_version(),
+    }
+
+    print_report(report)
+    if module_timer is not None:
+        from module_timing import print_module_report
+        print_module_report(report["module_timing"])
+        module_timer.detach()
+    engine.cleanup()
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[INFO] Report saved: {output}")
+
+    if baseline is not None:
+        tolerance = args.tolerance / 100
+        rows = compare_reports(baseline, report, tolerance, args.alpha, args.min_delta_ms, force=args.force)
+        print_comparison(rows, args.compare, tolerance, args.alpha)
+        regressions = [row["stage"] for row in rows if row["regression"]]
+        if regressions:
+            print(f"[ERROR] Regression in: {', '.join(regressions)}")
+            sys.exit(1)
+        print("[INFO] No regressions")
+
+
+if __name__ == "__main__":
+    main()
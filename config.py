@@ -22,6 +22,27 @@ LOGS_DIR = PROJECT_ROOT / "logs"
 MODEL_NAME = "microsoft/Florence-2-large"
 MODEL_LOCAL_PATH = str(MODELS_DIR / "florence2-large")
 
+# Рівні моделей: сервер тримає в пам'яті всі завантажені рівні одночасно
+MODEL_TIERS = {
+    "base": {
+        "name": "microsoft/Florence-2-base",    # 0.23B, у кілька разів дешевший токен
+        "path": str(MODELS_DIR / "florence2-base"),
+    },
+    "large": {
+        "name": MODEL_NAME,                     # 0.77B
+        "path": MODEL_LOCAL_PATH,
+    },
+}
+
+# Мініатюрна Florence-2 з випадковими вагами для наскрізних тестів (make_tiny_model.py)
+TINY_MODEL_PATH = str(MODELS_DIR / "florence2-tiny")
+
+# Порядок ескалації: спершу дешевша модель, дорожча - лише якщо результат не пройшов перевірку
+MODEL_TIER_ORDER = ("base", "large")
+
+# Автоматична ескалація base -> large (False - працює лише останній рівень з MODEL_TIER_ORDER)
+ENABLE_TIER_ESCALATION = True
+
 # Параметри моделі
 MODEL_CONFIG = {
     "torch_dtype": "float16",           # FP16 для економії пам'яті
@@ -31,6 +52,29 @@ MODEL_CONFIG = {
     "max_new_tokens": 256,              # Максимум токенів в інференсі
 }
 
+# Реалізація рушія: "florence" - справжня модель, "fake" - синтетичні затримки
+# та відповіді без torch і ваг (навантажувальні тести API на будь-якій машині)
+ENGINE_BACKENDS = ("florence", "fake")
+ENGINE_BACKEND = os.environ.get("PASSPORT_ENGINE", "florence")
+
+# fake: затримки етапів на батч з одного зображення, мс - (медіана, sigma) логнормального розподілу
+FAKE_ENGINE_LATENCY_MS = {
+    "preprocess": (15.0, 0.2),
+    "vision_encode": (60.0, 0.2),
+    "ocr_decode": (250.0, 0.35),
+    "face_detect": (40.0, 0.3),
+    "crop": (2.0, 0.2),
+}
+
+# fake: кожне наступне зображення батчу додає таку частку часу спільних етапів
+FAKE_ENGINE_BATCH_FACTOR = 0.3
+
+# fake: частка зображень без номера/обличчя (перевірка ескалації між рівнями)
+FAKE_ENGINE_MISS_RATE = 0.05
+
+# fake: зерно генератора випадкових чисел (None - щоразу різні затримки)
+FAKE_ENGINE_SEED = None
+
 # ============================================================================
 # СЕРВЕР (FastAPI / Uvicorn)
 # ============================================================================
@@ -63,6 +107,107 @@ MAX_IMAGE_SIZE = (4096, 4096)  # Ширина, висота
 # Якість JPEG при кодуванні Base64
 JPEG_QUALITY = 85
 
+# Способи видачі кадрованого обличчя (поле face_image_delivery запиту):
+# "base64" - data URL в JSON, "url" - посилання /api/results/{id}/face.jpg
+FACE_IMAGE_DELIVERY_MODES = ("base64", "url")
+DEFAULT_FACE_IMAGE_DELIVERY = "base64"
+
+# Формат кадрованого обличчя у відповіді API за замовчуванням: "jpeg" або "webp"
+FACE_IMAGE_FORMAT = "jpeg"
+
+# Якість кодування фото у відповіді API (1-100)
+FACE_IMAGE_QUALITY = JPEG_QUALITY
+
+# Фото зменшується до цього розміру більшої сторони перед кодуванням (None - без зменшення).
+# За замовчуванням фото віддається в повній роздільності; зменшення (наприклад, 600)
+# прискорює кодування, коли обличчя не знайдено і повертається вся сторінка.
+FACE_IMAGE_MAX_SIDE = None
+
+# Потоки для кодування фото поза циклом подій
+IMAGE_ENCODE_WORKERS = 2
+
+# Скільки секунд фото доступне за посиланням і скільки фото тримати в пам'яті
+RESULT_CACHE_TTL_SECONDS = 300
+RESULT_CACHE_MAX_ITEMS = 256
+
+# Обмеження пам'яті кешу: незакодоване фото рахується як ширина * висота * канали,
+# закодоване - розміром байтів (без знайденого обличчя в кеш потрапляє ціла сторінка)
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Рівні якості: розмір квадратного входу vision tower (кратний 32 - сумарний stride DaViT).
+# 768 - рідна роздільна здатність Florence-2 (сітка 24x24, 577 токенів зображення).
+# Менші розміри зменшують FLOPs DaViT та довжину послідовності енкодера;
+# позиційні вбудовування image_pos_embed інтерполюються під нову сітку.
+QUALITY_LEVELS = {
+    "high": 768,    # 24x24 + 1 = 577 токенів
+    "medium": 512,  # 16x16 + 1 = 257 токенів
+    "fast": 384,    # 12x12 + 1 = 145 токенів
+}
+DEFAULT_QUALITY = "high"
+
+# Задачі, які може замовити клієнт (ProcessRequest.tasks):
+#   number     - номер паспорта (OCR + regex)
+#   ocr_text   - сирий текст OCR
+#   face_box   - координати обличчя
+#   face_image - кадроване обличчя в Base64 (найдорожче в JSON)
+PROCESS_TASKS = ("number", "ocr_text", "face_box", "face_image")
+DEFAULT_TASKS = PROCESS_TASKS
+
+# ============================================================================
+# ДЕТЕКЦІЯ ОБЛИЧЧЯ
+# ============================================================================
+
+# Швидкий CPU-детектор, що запускається першим (ключ з face_detection.FACE_DETECTORS).
+# None - лише Florence-2 <CAPTION_TO_PHRASE_GROUNDING> (повна генерація до 1024 токенів)
+FACE_DETECTOR = "haar"
+
+# Більша сторона зображення перед пошуком обличчя (пікселі)
+FACE_DETECTOR_MAX_SIDE = 800
+
+# Мінімальний розмір обличчя відносно меншої сторони зображення
+FACE_MIN_SIZE_RATIO = 0.05
+
+# Шаблони розміщення фото (layouts.py) - використовуються раніше за будь-який детектор.
+# Вимкнено за замовчуванням: рамки шаблонів треба звірити з власними сканами (quality_eval.py)
+ENABLE_LAYOUT_TEMPLATES = False
+
+# Ключі збігаються з PASSPORT_REGEX_PATTERNS (тип документа визначається за форматом номера).
+# aspect_ratio - ширина / висота документа, face_box - фото у частках документа (x1, y1, x2, y2),
+# text_markers - рядки, один з яких має бути в тексті OCR (розрізняє шаблони з однаковими пропорціями)
+DOCUMENT_LAYOUTS = {
+    "ukrainian_id_card": {
+        "aspect_ratio": 85.6 / 54.0,             # ID-1 (ISO/IEC 7810)
+        "face_box": (0.03, 0.24, 0.34, 0.88),
+    },
+    "passport_book": {
+        "aspect_ratio": 125.0 / 88.0,            # Сторінка з фото паспортної книжечки
+        "face_box": (0.05, 0.30, 0.38, 0.88),
+    },
+    "international": {
+        "aspect_ratio": 125.0 / 88.0,            # ID-3 (ICAO 9303, сторінка даних)
+        "face_box": (0.03, 0.22, 0.33, 0.80),
+        "text_markers": ("P<",),                 # Машинозчитувана зона (MRZ) сторінки даних
+    },
+}
+
+# Допустиме відносне відхилення пропорцій документа від шаблону
+LAYOUT_ASPECT_TOLERANCE = 0.08
+
+# Мінімальне стандартне відхилення яскравості кадру фото (відсікає порожній фон)
+LAYOUT_MIN_CROP_STD = 12.0
+
+# Відступ навколо рамки шаблону, в якому швидкий детектор шукає обличчя (частка розміру рамки)
+LAYOUT_FACE_SEARCH_MARGIN = 0.15
+
+# Без швидкого детектора: мінімальна частка пікселів кольору шкіри в рамці шаблону
+LAYOUT_MIN_SKIN_RATIO = 0.15
+
+# Більша сторона зображення під час пошуку меж документа (пікселі)
+LAYOUT_ALIGN_MAX_SIDE = 400
+
+# Поріг відмінності від кольору фону для пошуку меж документа (0-255)
+LAYOUT_BACKGROUND_THRESHOLD = 40
+
 # ============================================================================
 # ПАСПОРТИ - РОЗПІЗНАВАННЯ
 # ============================================================================
@@ -73,6 +218,38 @@ PASSPORT_REGEX_PATTERNS = {
     "international": r"\b(?=[A-Z0-9]*\d)([A-Z0-9]{8,15})\b",  # 8-15 символів, мінімум 1 цифра
 }
 
+# ============================================================================
+# ПАКЕТНА ОБРОБКА (batch.py)
+# ============================================================================
+
+# Кількість зображень в одному generate
+BATCH_SIZE = 8
+
+# Скільки батчів декодується наперед, поки GPU зайнятий поточним
+BATCH_PREFETCH = 2
+
+# Потоки для читання та декодування зображень
+BATCH_DECODE_WORKERS = 4
+
+# Задачі за замовчуванням (face_image зберігається файлами лише з --faces-dir)
+BATCH_DEFAULT_TASKS = ("number", "ocr_text", "face_box")
+
+# Суфікс файлу чекпойнта поруч з JSONL-результатами
+BATCH_CHECKPOINT_SUFFIX = ".ckpt"
+
+# ============================================================================
+# СПОСТЕРЕЖЕННЯ ЗА ПАПКОЮ (watcher.py)
+# ============================================================================
+
+# Файл вважається дописаним, якщо розмір і mtime не змінювались стільки секунд
+WATCH_DEBOUNCE_SECONDS = 2.0
+
+# Інтервал сканування папки без inotify (мережеві диски, Windows)
+WATCH_POLL_INTERVAL = 2.0
+
+# Куди писати результати: "jsonl" (один файл) або "sidecar" (<файл>.json поруч)
+WATCH_SINK = "jsonl"
+
 # ============================================================================
 # ЖУРНАЛЮВАННЯ (Logging)
 # ============================================================================
@@ -94,6 +271,61 @@ INFERENCE_TIMEOUT = 30
 # Максимальна кількість одночасних обробок
 MAX_CONCURRENT_REQUESTS = 1
 
+# POST /api/process/batch: максимум документів в одному запиті
+API_BATCH_MAX_ITEMS = 1000
+
+# POST /api/process/batch: максимальний сумарний розмір завантажених файлів (MB)
+API_BATCH_MAX_UPLOAD_MB = 500
+
+# ============================================================================
+# АСИНХРОННІ ЗАДАЧІ (POST /api/jobs)
+# ============================================================================
+
+# SQLite-файл черги задач (переживає перезапуск сервера)
+JOBS_DB_PATH = LOGS_DIR / "jobs.sqlite3"
+
+# Як часто воркер перевіряє чергу, якщо нових задач не надходило (секунди)
+JOBS_POLL_INTERVAL = 1.0
+
+# Скільки годин зберігати завершені задачі та їх результати
+JOBS_RETENTION_HOURS = 24
+
+# ============================================================================
+# МЕТРИКИ (GET /metrics) ТА ЗАМІРИ ЕТАПІВ
+# ============================================================================
+
+# Віддавати метрики у форматі Prometheus
+ENABLE_METRICS = True
+
+# Кошики гістограм затримок запитів та етапів (секунди)
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Кошики гістограми розміру батчу рушія
+METRICS_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+# Писати час етапів кожного запиту в лог рядком "[TIMINGS] {json}"
+# (у відповідь поле timings додається лише з include_timings=true)
+LOG_STAGE_TIMINGS = True
+
+# ============================================================================
+# ПРОФІЛЮВАННЯ (POST /api/admin/profile)
+# ============================================================================
+
+# Дозволити захоплення torch.profiler на вимогу (адмін-ендпоінт, вимкнено в production)
+ENABLE_PROFILER_ENDPOINT = False
+
+# Куди писати Chrome trace та таблиці операторів (підпапка на кожне захоплення)
+PROFILER_DIR = LOGS_DIR / "profiles"
+
+# Максимум запитів в одному захопленні
+PROFILER_MAX_REQUESTS = 20
+
+# Записувати форми тензорів (докладніша таблиця, більший trace)
+PROFILER_RECORD_SHAPES = True
+
+# Рядків у таблиці операторів
+PROFILER_SUMMARY_ROWS = 40
+
 # ============================================================================
 # ФУНКЦІЀНАЛЬНІСТЬ
 # ============================================================================
@@ -104,6 +336,10 @@ ENABLE_TEST_ENDPOINT = True
 # Дозволити Swagger документацію
 ENABLE_SWAGGER_DOCS = True
 
+# Серіалізувати відповіді API напряму (orjson, без повторної валідації pydantic).
+# PASSPORT_FAST_JSON=0 вмикає шлях через pydantic - для A/B порівняння loadtest.py
+FAST_JSON_RESPONSES = os.environ.get("PASSPORT_FAST_JSON", "1") != "0"
+
 # Включити детальне журналювання інференсу
 VERBOSE_INFERENCE = True
 
@@ -116,10 +352,14 @@ def get_config_summary():
     return {
         "api": f"http://{API_HOST}:{API_PORT}",
         "model": MODEL_NAME,
+        "engine_backend": ENGINE_BACKEND,
         "model_path": MODEL_LOCAL_PATH,
+        "model_tiers": " -> ".join(MODEL_TIER_ORDER) if ENABLE_TIER_ESCALATION else MODEL_TIER_ORDER[-1],
         "dtype": MODEL_CONFIG["torch_dtype"],
         "attention": MODEL_CONFIG["attn_implementation"],
         "max_image_size": MAX_IMAGE_SIZE,
+        "face_detector": FACE_DETECTOR or "florence",
+        "default_quality": f"{DEFAULT_QUALITY} ({QUALITY_LEVELS[DEFAULT_QUALITY]}px)",
         "supported_formats": SUPPORTED_FORMATS,
         "log_level": LOG_LEVEL,
     }
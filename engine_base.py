@@ -0,0 +1,514 @@
+"""
+Спільний інтерфейс рушіїв розпізнавання та рівні моделей з ескалацією.
+
+BaseOCREngine описує те, чого від рушія очікують API, batch.py та watcher.py:
+process_batch над вже завантаженими зображеннями плюс спільні для всіх
+реалізацій перевірка параметрів, читання зображень і розбір номера.
+Реалізації:
+    florence - PassportOCREngine (inference.py), справжня модель Florence-2;
+    fake     - FakeOCREngine (fake_engine.py), синтетичні затримки та відповіді
+               без torch і ваг моделі - для навантажувальних тестів сервера.
+
+Рушій обирається ENGINE_BACKEND (змінна середовища PASSPORT_ENGINE).
+"""
+
+import io
+import re
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional, Tuple, Dict, Any, List, Sequence, Callable
+
+from PIL import Image
+
+from config import (
+    VERBOSE_INFERENCE, REGEX_PATTERNS, QUALITY_LEVELS, DEFAULT_QUALITY,
+    MODEL_TIERS, MODEL_TIER_ORDER, ENABLE_TIER_ESCALATION,
+    PROCESS_TASKS, DEFAULT_TASKS, ENGINE_BACKEND, ENGINE_BACKENDS,
+)
+from stage_timer import StageTimer
+
+# Колбек подій етапів: on_event(назва, дані). Викликається з потоку інференсу.
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class BaseOCREngine(ABC):
+    """Рушій розпізнавання одного рівня моделі."""
+
+    @property
+    def stage_timer(self) -> Optional[StageTimer]:
+        """
+        Заміри етапів (встановлюють benchmark.py та api.py); None - без накладних витрат.
+
+        Таймер свій у кожного потоку: виклики рушія з різних потоків пулу
+        (MAX_CONCURRENT_REQUESTS > 1) не змішують свої заміри.
+        """
+        local = self.__dict__.get("_stage_local")
+        return getattr(local, "timer", None) if local is not None else None
+
+    @stage_timer.setter
+    def stage_timer(self, timer: Optional[StageTimer]) -> None:
+        self.__dict__.setdefault("_stage_local", threading.local()).timer = timer
+
+    @abstractmethod
+    def process_batch(
+        self,
+        images: List[Image.Image],
+        names: Optional[List[str]] = None,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        on_event: Optional[EventCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Обробляє батч вже завантажених зображень.
+
+        Returns:
+            Список результатів у форматі process_image (у тому ж порядку)
+
+        Raises:
+            ValueError: Невідомий рівень якості або задача
+            RuntimeError: Помилка при інференсу
+        """
+
+    @abstractmethod
+    def cleanup(self) -> None:
+        """Звільняє ресурси рушія."""
+
+    def process_image(
+        self,
+        image_path: str,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+    ) -> Dict[str, Any]:
+        """
+        Обробляє зображення для вилучення номера паспорта.
+
+        Запускаються лише етапи, потрібні для tasks:
+        OCR - для "number"/"ocr_text", пошук обличчя - для "face_box"/"face_image",
+        кадрування - лише для "face_image".
+
+        Args:
+            image_path: Абсолютний шлях до зображення
+            quality: Рівень якості з QUALITY_LEVELS (розмір входу vision tower)
+            tasks: Задачі з PROCESS_TASKS
+
+        Returns:
+            Словник з результатами (поля невиконаних етапів - None):
+            {
+                "passport_number": str або None,
+                "ocr_text": str (сирий текст) або None,
+                "confidence": float (умовна впевненість),
+                "image": PIL.Image або None,
+                "face_box": (x1, y1, x2, y2) або None,
+                "face_source": str або None ("template"/"haar"/"florence"/"fake"),
+                "document_type": str або None (ключ з REGEX_PATTERNS),
+                "quality": str,
+                "tasks": tuple,
+                "processing_time": float
+            }
+
+        Raises:
+            FileNotFoundError: Файл не знайдено
+            ValueError: Невідомий рівень якості або задача
+            RuntimeError: Помилка при інференсу (GPU OOM тощо)
+        """
+        # Перевіряємо параметри до читання файлу
+        self._resolve_resolution(quality)
+        self._resolve_tasks(tasks)
+
+        # Завантажуємо зображення
+        with self._stage("decode"):
+            image = self._load_image(image_path)
+
+        return self.process_batch([image], [Path(image_path).name], quality=quality, tasks=tasks)[0]
+
+    def _stage(self, name: str):
+        """Контекст заміру етапу (нічого не робить без stage_timer)."""
+        if self.stage_timer is None:
+            return nullcontext()
+        return self.stage_timer.stage(name)
+
+    def _resolve_resolution(self, quality: str) -> int:
+        """
+        Повертає розмір входу vision tower для рівня якості.
+
+        Raises:
+            ValueError: Невідомий рівень якості
+        """
+        if quality not in QUALITY_LEVELS:
+            raise ValueError(
+                f"[ERROR] Unknown quality '{quality}'. Available: {', '.join(QUALITY_LEVELS)}"
+            )
+        return QUALITY_LEVELS[quality]
+
+    def _resolve_tasks(self, tasks: Sequence[str]) -> Tuple[str, ...]:
+        """
+        Перевіряє список задач запиту.
+
+        Raises:
+            ValueError: Порожній список або невідома задача
+        """
+        unknown = [task for task in tasks if task not in PROCESS_TASKS]
+        if unknown or not tasks:
+            raise ValueError(
+                f"[ERROR] Invalid tasks {list(tasks)}. Available: {', '.join(PROCESS_TASKS)}"
+            )
+        return tuple(dict.fromkeys(tasks))
+
+    @staticmethod
+    def _load_image(image_path: str) -> Image.Image:
+        """
+        Завантажує зображення з диска.
+
+        Args:
+            image_path: Абсолютний шлях до зображення
+
+        Returns:
+            PIL Image об'єкт
+
+        Raises:
+            FileNotFoundError: Файл не знайдено
+        """
+        image_path = Path(image_path)
+
+        if not image_path.exists():
+            raise FileNotFoundError(f"[ERROR] File not found: {image_path}")
+
+        try:
+            image = Image.open(image_path).convert("RGB")
+            print(f"[INFO] Image loaded: {image_path.name} ({image.size})")
+            return image
+        except Exception as e:
+            raise RuntimeError(f"[ERROR] Image loading error: {str(e)}")
+
+    @staticmethod
+    def _decode_image(data: bytes, name: str = "upload") -> Image.Image:
+        """
+        Декодує зображення з буфера в пам'яті (завантаження через HTTP).
+
+        Raises:
+            ValueError: Дані не є підтримуваним зображенням
+        """
+        try:
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+        except Exception as e:
+            raise ValueError(f"[ERROR] Cannot decode image '{name}': {str(e)}")
+
+        print(f"[INFO] Image decoded: {name} ({image.size})")
+        return image
+
+    @staticmethod
+    def _crop_face(image: Image.Image, face_box: Optional[Tuple[int, int, int, int]]) -> Image.Image:
+        """Кадрує обличчя; якщо рамки немає чи вона замала - повертає повне зображення."""
+        if face_box:
+            x1, y1, x2, y2 = face_box
+            if (x2 - x1) > 10 and (y2 - y1) > 10:
+                print(f"[INFO] Cropped face: ({x1}, {y1}, {x2}, {y2})")
+                return image.crop((x1, y1, x2, y2))
+            print(f"[WARN] Detected face too small: {face_box}. Returning full image.")
+            return image
+
+        print("[WARN] No face detected with any prompt. Returning full image.")
+        return image
+
+    def _extract_passport_number(self, ocr_text: str) -> Optional[str]:
+        """Вилучає номер паспорта зі сирого тексту OCR (див. _match_passport_number)."""
+        return self._match_passport_number(ocr_text)[0]
+
+    def _match_passport_number(self, ocr_text: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Вилучає номер паспорта зі сирого тексту OCR і визначає тип документа.
+
+        Формати:
+        - Українська ID-картка: 9 цифр (xxx xxx xxx або xxxxxxxxx)
+        - Паспортна книжечка: 2 літери + 6 цифр (XX 123456 або XX123456)
+        - Міжнародний паспорт: 8-15 символів (літери + цифри, обов'язково є цифра)
+
+        Args:
+            ocr_text: Сирий текст з OCR
+
+        Returns:
+            (знайдений номер паспорта або None,
+             тип документа - ключ з REGEX_PATTERNS - або None)
+        """
+        if not ocr_text:
+            return None, None
+
+        # Видаляємо зайві пропуски та переносимо на нові рядки
+        cleaned_text = re.sub(r"\s+", " ", ocr_text).upper()
+
+        # ID-картка: 9 цифр у форматі XXX XXX XXX або xxxxxxxxx
+        pattern = REGEX_PATTERNS.get("ukrainian_id_card")
+        match = re.search(pattern, cleaned_text)
+        if match:
+            passport = match.group(1).replace(" ", "")
+            if passport.isdigit() and len(passport) == 9:
+                if VERBOSE_INFERENCE:
+                    print(f"[DEBUG] Found ID card: {passport}")
+                return passport, "ukrainian_id_card"
+
+        # Паспортна книжечка: 2 літери + 6 цифр у форматі XX 123456 або XX123456
+        pattern = REGEX_PATTERNS.get("passport_book")
+        match = re.search(pattern, cleaned_text)
+        if match:
+            passport = match.group(1).replace(" ", "")
+            if VERBOSE_INFERENCE:
+                print(f"[DEBUG] Found passport book: {passport}")
+            return passport, "passport_book"
+
+        # Міжнародний паспорт: 9 символів загального формату
+        pattern = REGEX_PATTERNS.get("international")
+        match = re.search(pattern, cleaned_text)
+        if match:
+            passport = match.group(1)
+            if VERBOSE_INFERENCE:
+                print(f"[DEBUG] Found international passport: {passport}")
+            return passport, "international"
+
+        if VERBOSE_INFERENCE:
+            print("[WARN] Passport number not recognized in OCR text")
+        return None, None
+
+
+def create_engine(model_path: str, backend: str = ENGINE_BACKEND) -> BaseOCREngine:
+    """
+    Створює рушій одного рівня моделі.
+
+    Raises:
+        ValueError: Невідомий рушій
+    """
+    if backend == "florence":
+        from inference import PassportOCREngine
+        return PassportOCREngine(model_path=model_path)
+    if backend == "fake":
+        from fake_engine import FakeOCREngine
+        return FakeOCREngine(model_path=model_path)
+    raise ValueError(f"[ERROR] Unknown engine backend '{backend}'. Available: {', '.join(ENGINE_BACKENDS)}")
+
+
+class TieredOCREngine:
+    """
+    Кілька рівнів моделей (Florence-2-base / Florence-2-large) в одному процесі.
+
+    Запит спершу обробляє найдешевша модель з MODEL_TIER_ORDER; наступний рівень
+    запускається лише тоді, коли результат не пройшов перевірку (див. _needs_escalation).
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, Dict[str, str]]] = None,
+        order: Sequence[str] = MODEL_TIER_ORDER,
+        escalation: bool = ENABLE_TIER_ESCALATION,
+        backend: str = ENGINE_BACKEND,
+    ):
+        """
+        Ініціалізація рівнів моделей.
+
+        Args:
+            tiers: Опис рівнів {назва: {"name": ..., "path": ...}} (default: MODEL_TIERS)
+            order: Порядок ескалації від дешевшого рівня до дорожчого
+            escalation: Чи вмикати автоматичну ескалацію
+            backend: Реалізація рушія з ENGINE_BACKENDS
+
+        Raises:
+            FileNotFoundError: Не знайдено жодної локальної копії моделі
+        """
+        tiers = tiers or MODEL_TIERS
+        if not escalation:
+            order = order[-1:]
+
+        self.backend = backend
+        self.engines: Dict[str, BaseOCREngine] = {}
+        for tier in order:
+            model_path = Path(tiers[tier]["path"])
+            # Синтетичному рушію ваги не потрібні
+            if backend == "florence" and not model_path.exists():
+                print(f"[WARN] Model tier '{tier}' not found at {model_path}, skipping")
+                continue
+            print(f"[INFO] Loading model tier '{tier}' ({backend})...")
+            self.engines[tier] = create_engine(str(model_path), backend)
+
+        if not self.engines:
+            raise FileNotFoundError(
+                f"[ERROR] No model tiers found: {', '.join(order)}\n"
+                f"Execute: python model_setup.py"
+            )
+
+        self.order = list(self.engines)
+        print(f"[INFO] Model tiers ready: {' -> '.join(self.order)}")
+
+    @staticmethod
+    def _needs_escalation(result: Dict[str, Any]) -> bool:
+        """Результат не пройшов перевірку: запитаний номер не вилучено або обличчя не знайдено."""
+        tasks = result["tasks"]
+        if "number" in tasks and result["passport_number"] is None:
+            return True
+        if ("face_box" in tasks or "face_image" in tasks) and result["face_box"] is None:
+            return True
+        return False
+
+    @staticmethod
+    def _tier_event(on_event: EventCallback, positions: List[int]) -> EventCallback:
+        """Колбек рівня: переводить "index" з нумерації батчу рівня в нумерацію вхідного батчу."""
+        def forward(event: str, data: Dict[str, Any]) -> None:
+            if "index" in data:
+                data = dict(data, index=positions[data["index"]])
+            on_event(event, data)
+
+        return forward
+
+    def process_image(
+        self,
+        image_path: str,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        tier: Optional[str] = None,
+        on_event: Optional[EventCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Обробляє зображення з ескалацією між рівнями моделей.
+
+        Args:
+            image_path: Абсолютний шлях до зображення
+            quality: Рівень якості з QUALITY_LEVELS
+            tasks: Задачі з PROCESS_TASKS
+            tier: Примусовий рівень моделі (None - автоматична ескалація)
+            on_event: Колбек проміжних результатів (див. process_batch)
+
+        Returns:
+            Результат BaseOCREngine.process_image з додатковими полями
+            "model_tier" (рівень, що дав відповідь) та "escalated" (bool).
+            processing_time включає час усіх запущених рівнів.
+
+        Raises:
+            ValueError: Невідомий або не завантажений рівень моделі
+        """
+        tiers = self._resolve_tiers(tier)
+        engine = self.engines[tiers[0]]
+        engine._resolve_resolution(quality)
+        engine._resolve_tasks(tasks)
+
+        with engine._stage("decode"):
+            image = BaseOCREngine._load_image(image_path)
+        return self.process_batch(
+            [image], [Path(image_path).name], quality=quality, tasks=tasks, tier=tier, on_event=on_event
+        )[0]
+
+    def process_bytes(
+        self,
+        data: bytes,
+        name: str = "upload",
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        tier: Optional[str] = None,
+        on_event: Optional[EventCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Як process_image, але для вмісту файлу в пам'яті (без тимчасового файлу).
+
+        Raises:
+            ValueError: Невідомі параметри або дані не декодуються як зображення
+        """
+        tiers = self._resolve_tiers(tier)
+        engine = self.engines[tiers[0]]
+        engine._resolve_resolution(quality)
+        engine._resolve_tasks(tasks)
+
+        with engine._stage("decode"):
+            image = BaseOCREngine._decode_image(data, name)
+        return self.process_batch([image], [name], quality=quality, tasks=tasks, tier=tier, on_event=on_event)[0]
+
+    def _resolve_tiers(self, tier: Optional[str]) -> List[str]:
+        """
+        Рівні, які будуть запущені для запиту.
+
+        Raises:
+            ValueError: Невідомий або не завантажений рівень моделі
+        """
+        if tier is None:
+            return self.order
+
+        if tier not in self.engines:
+            raise ValueError(
+                f"[ERROR] Model tier '{tier}' is not loaded. Available: {', '.join(self.order)}"
+            )
+        return [tier]
+
+    def process_batch(
+        self,
+        images: List[Image.Image],
+        names: Optional[List[str]] = None,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        tier: Optional[str] = None,
+        on_event: Optional[EventCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Обробляє батч зображень з ескалацією окремих результатів.
+
+        Наступний рівень отримує батч лише з тих зображень,
+        результати яких не пройшли перевірку.
+
+        on_event отримує події process_batch рушія кожного рівня
+        (з "index" у нумерації цього батчу) та "escalate" {"index", "model_tier"}
+        перед повторною обробкою зображення старшою моделлю.
+
+        Returns:
+            Список результатів у форматі process_image (у тому ж порядку)
+        """
+        tiers = self._resolve_tiers(tier)
+        if names is None:
+            names = [f"#{index}" for index in range(len(images))]
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        spent = [0.0] * len(images)
+        pending = list(range(len(images)))
+
+        for level, name in enumerate(tiers):
+            tier_event = self._tier_event(on_event, pending) if on_event is not None else None
+            if on_event is not None and level > 0:
+                for index in pending:
+                    on_event("escalate", {"index": index, "model_tier": name})
+
+            batch = self.engines[name].process_batch(
+                [images[index] for index in pending],
+                [names[index] for index in pending],
+                quality=quality,
+                tasks=tasks,
+                on_event=tier_event,
+            )
+
+            is_last = level == len(tiers) - 1
+            escalate = []
+            for index, result in zip(pending, batch):
+                spent[index] += result["processing_time"]
+                result["model_tier"] = name
+                result["escalated"] = level > 0
+                result["processing_time"] = spent[index]
+                results[index] = result
+
+                if not is_last and self._needs_escalation(result):
+                    escalate.append(index)
+
+            if not escalate:
+                break
+
+            print(
+                f"[INFO] Tier '{name}': {len(escalate)} result(s) failed validation, "
+                f"escalating to '{tiers[level + 1]}'"
+            )
+            pending = escalate
+
+        return results
+
+    def set_stage_timer(self, timer: Optional[StageTimer]) -> None:
+        """Встановлює (None - знімає) заміри етапів для всіх рівнів (у поточному потоці)."""
+        for engine in self.engines.values():
+            engine.stage_timer = timer
+
+    def cleanup(self) -> None:
+        """Очищає VRAM від усіх рівнів моделей."""
+        for engine in self.engines.values():
+            engine.cleanup()
+        self.engines.clear()
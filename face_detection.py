@@ -0,0 +1,130 @@
+"""
+Швидкі детектори обличчя для кадрування фото з паспорта.
+
+Класичний CPU-детектор запускається першим і займає кілька мілісекунд.
+Florence-2 <CAPTION_TO_PHRASE_GROUNDING> (повна генерація до 1024 токенів)
+використовується в PassportOCREngine лише як fallback, коли детектор
+нічого не знайшов або недоступний.
+"""
+
+from typing import Dict, Optional, Tuple, Type
+
+from PIL import Image
+
+from config import FACE_DETECTOR, FACE_DETECTOR_MAX_SIDE, FACE_MIN_SIZE_RATIO
+
+Box = Tuple[int, int, int, int]
+
+
+class FaceDetector:
+    """Базовий інтерфейс детектора обличчя."""
+
+    # Назва детектора (повертається в результаті як "face_source")
+    name = "base"
+
+    # Відносний відступ навколо знайденої рамки при кадруванні
+    padding = 0.1
+
+    def detect(self, image: Image.Image) -> Optional[Box]:
+        """
+        Шукає найбільше обличчя на зображенні.
+
+        Args:
+            image: PIL Image (RGB)
+
+        Returns:
+            Рамка (x1, y1, x2, y2) у координатах вхідного зображення або None
+        """
+        raise NotImplementedError
+
+
+class HaarCascadeFaceDetector(FaceDetector):
+    """Детектор на каскаді Хаара з OpenCV (opencv-python-headless)."""
+
+    name = "haar"
+
+    # Каскад обводить лише овал обличчя, для фото документа потрібні волосся та підборіддя
+    padding = 0.3
+
+    def __init__(self, max_side: int = FACE_DETECTOR_MAX_SIDE, min_size_ratio: float = FACE_MIN_SIZE_RATIO):
+        """
+        Args:
+            max_side: Зображення зменшується до цього розміру більшої сторони перед пошуком
+            min_size_ratio: Мінімальний розмір обличчя відносно меншої сторони зображення
+
+        Raises:
+            ImportError: OpenCV не встановлено
+        """
+        import cv2
+        import numpy as np
+
+        self._cv2 = cv2
+        self._np = np
+        self.max_side = max_side
+        self.min_size_ratio = min_size_ratio
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        if self.cascade.empty():
+            raise RuntimeError("[ERROR] OpenCV Haar cascade could not be loaded")
+
+    def detect(self, image: Image.Image) -> Optional[Box]:
+        scale = min(1.0, self.max_side / max(image.width, image.height))
+        gray = image.convert("L")
+        if scale < 1.0:
+            gray = gray.resize(
+                (int(image.width * scale), int(image.height * scale)),
+                Image.BILINEAR,
+            )
+
+        min_side = int(min(gray.width, gray.height) * self.min_size_ratio)
+        faces = self.cascade.detectMultiScale(
+            self._np.asarray(gray),
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(min_side, min_side),
+        )
+        if len(faces) == 0:
+            return None
+
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return (
+            int(x / scale),
+            int(y / scale),
+            int((x + w) / scale),
+            int((y + h) / scale),
+        )
+
+
+# Реєстр доступних детекторів (ключ - значення FACE_DETECTOR)
+FACE_DETECTORS: Dict[str, Type[FaceDetector]] = {
+    "haar": HaarCascadeFaceDetector,
+}
+
+
+def create_face_detector(name: Optional[str] = FACE_DETECTOR) -> Optional[FaceDetector]:
+    """
+    Створює швидкий детектор обличчя.
+
+    Args:
+        name: Ключ з FACE_DETECTORS або None (лише Florence grounding)
+
+    Returns:
+        Екземпляр детектора або None, якщо детектор вимкнено чи недоступний
+    """
+    if name is None:
+        return None
+
+    if name not in FACE_DETECTORS:
+        raise ValueError(
+            f"[ERROR] Unknown face detector '{name}'. Available: {', '.join(FACE_DETECTORS)}"
+        )
+
+    try:
+        detector = FACE_DETECTORS[name]()
+    except ImportError as e:
+        print(f"[WARN] Face detector '{name}' unavailable ({e}). Using Florence grounding only.")
+        return None
+
+    print(f"[INFO] Fast face detector enabled: {name}")
+    return detector
@@ -0,0 +1,198 @@
+"""
+Синтетичний рушій для навантажувальних тестів сервера (ENGINE_BACKEND = "fake").
+
+Не завантажує torch і ваги: кожен етап "виконується" як time.sleep на час з
+логнормального розподілу (FAKE_ENGINE_LATENCY_MS), спільні етапи дорожчають
+з розміром батчу (FAKE_ENGINE_BATCH_FACTOR). Відповіді мають форму справжніх:
+текст OCR з номером проходить той самий розбір _match_passport_number, рамка
+обличчя береться з шаблону документа (DOCUMENT_LAYOUTS), а частка
+FAKE_ENGINE_MISS_RATE зображень повертається без номера й обличчя, щоб
+спрацьовувала ескалація між рівнями.
+
+    PASSPORT_ENGINE=fake python api.py
+"""
+
+import math
+import time
+import random
+import threading
+from typing import Optional, Tuple, Dict, Any, List, Sequence
+
+from PIL import Image
+
+from config import (
+    QUALITY_LEVELS, DEFAULT_QUALITY, DEFAULT_TASKS, DOCUMENT_LAYOUTS,
+    FAKE_ENGINE_LATENCY_MS, FAKE_ENGINE_BATCH_FACTOR, FAKE_ENGINE_MISS_RATE, FAKE_ENGINE_SEED,
+)
+from engine_base import BaseOCREngine, EventCallback
+
+# Кирилиця, що збігається з латиницею на друці (серії паспортних книжечок)
+_BOOK_SERIES_LETTERS = "АВЕКМНОРСТХ"
+
+_OCR_TEMPLATES = {
+    "ukrainian_id_card": (
+        "УКРАЇНА UKRAINE ПАСПОРТ ГРОМАДЯНИНА УКРАЇНИ / PASSPORT OF THE CITIZEN OF UKRAINE "
+        "Прізвище / Surname ШЕВЧЕНКО SHEVCHENKO Ім'я / Given names ОЛЕНА OLENA "
+        "Стать / Sex Ж/F Громадянство / Nationality УКРАЇНА/UKR "
+        "Дата народження / Date of birth 12 03 1990 Документ № / Document No. {number}"
+    ),
+    "passport_book": (
+        "ПАСПОРТ ГРОМАДЯНИНА УКРАЇНИ {number} Прізвище ШЕВЧЕНКО Ім'я ОЛЕНА "
+        "По батькові ІВАНІВНА Дата народження 12.03.1990 Місце народження М. КИЇВ"
+    ),
+}
+
+
+class FakeOCREngine(BaseOCREngine):
+    """Рушій з імітацією затримок і реалістичними відповідями."""
+
+    def __init__(
+        self,
+        model_path: str = "fake",
+        latency_ms: Optional[Dict[str, Tuple[float, float]]] = None,
+        batch_factor: float = FAKE_ENGINE_BATCH_FACTOR,
+        miss_rate: float = FAKE_ENGINE_MISS_RATE,
+        seed: Optional[int] = FAKE_ENGINE_SEED,
+    ):
+        """
+        Args:
+            model_path: Лише для журналу (ваги не читаються)
+            latency_ms: {етап: (медіана мс, sigma)} (default: FAKE_ENGINE_LATENCY_MS)
+            batch_factor: Приріст часу спільних етапів на кожне наступне зображення батчу
+            miss_rate: Частка зображень без номера та обличчя
+            seed: Зерно генератора (None - випадкове)
+        """
+        self.model_path = model_path
+        self.device = "fake"
+        self.latency_ms = latency_ms if latency_ms is not None else FAKE_ENGINE_LATENCY_MS
+        self.batch_factor = batch_factor
+        self.miss_rate = miss_rate
+        self.stage_timer = None
+        # Як і GPU, рушій виконує один батч за раз
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        print(f"[INFO] Initializing FakeOCREngine ({model_path})")
+
+    def _sleep(self, stage: str, scale: float = 1.0) -> None:
+        """Імітує етап: затримка з логнормального розподілу, помножена на scale."""
+        median, sigma = self.latency_ms.get(stage, (0.0, 0.0))
+        if median <= 0:
+            return
+        with self._stage(stage):
+            time.sleep(self._random.lognormvariate(math.log(median), sigma) * scale / 1000)
+
+    def _fake_document(self, image: Image.Image) -> Tuple[Optional[str], Optional[Tuple[int, int, int, int]]]:
+        """Текст OCR і рамка обличчя для одного зображення (None - "не розпізнано")."""
+        if self._random.random() < self.miss_rate:
+            return "ПАСПОРТ", None
+
+        document_type = self._random.choice(list(_OCR_TEMPLATES))
+        if document_type == "ukrainian_id_card":
+            number = "".join(self._random.choice("0123456789") for _ in range(9))
+        else:
+            series = "".join(self._random.choice(_BOOK_SERIES_LETTERS) for _ in range(2))
+            number = series + "".join(self._random.choice("0123456789") for _ in range(6))
+
+        x1, y1, x2, y2 = DOCUMENT_LAYOUTS[document_type]["face_box"]
+        jitter = lambda value: min(max(value + self._random.uniform(-0.01, 0.01), 0.0), 1.0)
+        face_box = (
+            int(jitter(x1) * image.width), int(jitter(y1) * image.height),
+            int(jitter(x2) * image.width), int(jitter(y2) * image.height),
+        )
+        return _OCR_TEMPLATES[document_type].format(number=number), face_box
+
+    def process_batch(
+        self,
+        images: List[Image.Image],
+        names: Optional[List[str]] = None,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        on_event: Optional[EventCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """Те саме, що PassportOCREngine.process_batch, але з синтетичними етапами."""
+        resolution = self._resolve_resolution(quality)
+        tasks = self._resolve_tasks(tasks)
+        need_ocr = "number" in tasks or "ocr_text" in tasks
+        need_face = "face_box" in tasks or "face_image" in tasks
+
+        if not images:
+            return []
+        if names is None:
+            names = [f"#{index}" for index in range(len(images))]
+
+        count = len(images)
+        # Час спільних етапів росте з батчем і з площею входу vision tower
+        batch_scale = 1 + self.batch_factor * (count - 1)
+        pixel_scale = (resolution / QUALITY_LEVELS[DEFAULT_QUALITY]) ** 2
+
+        with self._lock:
+            batch_start = time.time()
+            documents = [self._fake_document(image) for image in images]
+            ocr_texts: List[Optional[str]] = [None] * count
+            matches: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * count
+            faces: List[Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]] = [(None, None)] * count
+
+            if need_ocr:
+                self._sleep("preprocess", batch_scale)
+                self._sleep("vision_encode", batch_scale * pixel_scale)
+                self._sleep("ocr_decode", batch_scale)
+                if self.stage_timer is not None:
+                    # ~1 токен BPE на 4 символи тексту
+                    self.stage_timer.add_tokens(sum(len(text) // 4 for text, _ in documents), "ocr_decode")
+                for index, (ocr_text, _) in enumerate(documents):
+                    ocr_texts[index] = ocr_text
+                    matches[index] = self._match_passport_number(ocr_text)
+                    if on_event is None:
+                        continue
+                    if count == 1:
+                        for word in ocr_text.split(" "):
+                            on_event("ocr_token", {"text": word + " "})
+                    on_event("number", {
+                        "index": index,
+                        "passport_number": matches[index][0],
+                        "document_type": matches[index][1],
+                        "ocr_text": ocr_text,
+                    })
+
+            if need_face:
+                self._sleep("face_detect", batch_scale)
+                for index, (_, face_box) in enumerate(documents):
+                    faces[index] = (face_box, "fake" if face_box else None)
+                    if on_event is not None:
+                        on_event("face_box", {
+                            "index": index,
+                            "face_box": list(face_box) if face_box else None,
+                            "face_source": faces[index][1],
+                        })
+
+            shared_time = (time.time() - batch_start) / count
+
+            results = []
+            for index, image in enumerate(images):
+                item_start = time.time()
+                passport_number, document_type = matches[index]
+                face_box, face_source = faces[index]
+
+                face_image = None
+                if "face_image" in tasks:
+                    self._sleep("crop")
+                    face_image = self._crop_face(image, face_box)
+
+                results.append({
+                    "passport_number": passport_number,
+                    "ocr_text": ocr_texts[index],
+                    "confidence": 0.85 if passport_number else 0.0,
+                    "image": face_image,
+                    "face_box": face_box,
+                    "face_source": face_source,
+                    "document_type": document_type,
+                    "quality": quality,
+                    "tasks": tasks,
+                    "processing_time": shared_time + (time.time() - item_start),
+                })
+
+        print(f"[INFO] Fake batch of {count} processed ({', '.join(names)})")
+        return results
+
+    def cleanup(self) -> None:
+        print("[INFO] Fake engine released")
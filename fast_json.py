@@ -0,0 +1,33 @@
+"""
+Швидка серіалізація відповідей API.
+
+Відповіді, які сервер збирає сам (_build_response_fields в api.py), вже мають
+форму ProcessResponse, тому повторна валідація pydantic і стандартний
+JSON-енкодер FastAPI (jsonable_encoder + json.dumps) - зайва робота,
+особливо з мегабайтними рядками Base64. Тут словник одразу серіалізується
+через orjson, а за його відсутності - через json.dumps без перевірок.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """UTF-8 JSON без пробілів; кирилиця не екранується."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, що серіалізує вміст як є - без jsonable_encoder і валідації."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,71 @@
+"""
+Кодування кадрованих облич для відповіді API.
+
+Кодування JPEG/WebP займає десятки мілісекунд (для цілої сторінки, коли
+обличчя не знайдено, - сотні), тому виконується в окремому пулі потоків,
+а не в потоці циклу подій. Якщо задано FACE_IMAGE_MAX_SIDE, перед кодуванням
+зображення зменшується до нього по більшій стороні (за замовчуванням - ні).
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from config import FACE_IMAGE_FORMAT, FACE_IMAGE_QUALITY, FACE_IMAGE_MAX_SIDE, IMAGE_ENCODE_WORKERS
+
+# Формат запиту -> (формат PIL, MIME-тип, розширення файлу)
+IMAGE_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+
+_encoder_pool = ThreadPoolExecutor(max_workers=IMAGE_ENCODE_WORKERS, thread_name_prefix="encode")
+
+
+def media_type(image_format: str) -> str:
+    return IMAGE_FORMATS[image_format][1]
+
+
+def extension(image_format: str) -> str:
+    return IMAGE_FORMATS[image_format][2]
+
+
+def encode_image(
+    image: Image.Image,
+    image_format: str = FACE_IMAGE_FORMAT,
+    quality: int = FACE_IMAGE_QUALITY,
+    max_side: Optional[int] = FACE_IMAGE_MAX_SIDE,
+) -> bytes:
+    """
+    Зменшує (за потреби) та кодує зображення.
+
+    Args:
+        image: PIL Image
+        image_format: Ключ з IMAGE_FORMATS
+        quality: Якість 1-100
+        max_side: Максимальна більша сторона результату (None - без зменшення)
+
+    Raises:
+        ValueError: Невідомий формат
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(
+            f"[ERROR] Unknown image format '{image_format}'. Available: {', '.join(IMAGE_FORMATS)}"
+        )
+
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+
+    buffer = BytesIO()
+    image.save(buffer, format=IMAGE_FORMATS[image_format][0], quality=quality)
+    return buffer.getvalue()
+
+
+async def encode_image_async(image: Image.Image, image_format: str = FACE_IMAGE_FORMAT) -> bytes:
+    """encode_image у пулі кодування, не блокуючи цикл подій."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_encoder_pool, encode_image, image, image_format)
@@ -3,33 +3,140 @@
 Обгортка навколо моделі з оптимізацією для обмежених ресурсів GPU (4GB VRAM).
 """
 
-import re
 import torch
+import torch.nn.functional as F
 from pathlib import Path
 from PIL import Image
 from transformers import AutoProcessor, AutoModelForCausalLM
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Sequence
+from transformers.generation.streamers import BaseStreamer
+
+from config import (
+    MODEL_CONFIG, VERBOSE_INFERENCE,
+    QUALITY_LEVELS, DEFAULT_QUALITY,
+    FACE_DETECTOR, DEFAULT_TASKS, ENABLE_LAYOUT_TEMPLATES,
+)
+from engine_base import BaseOCREngine, EventCallback
+from face_detection import create_face_detector
+from layouts import predict_face_box
+from stage_timer import StageTimer
+
+
+class InterpolatedPositionEmbedding2D(torch.nn.Module):
+    """
+    Обгортка над LearnedAbsolutePositionEmbedding2D з інтерполяцією під меншу сітку.
+
+    Florence-2 навчена на сітці base_grid x base_grid (24x24 для входу 768x768).
+    Оригінальний модуль для меншої сітки просто бере перші рядки/стовпці таблиці,
+    тобто "бачить" обрізане зображення. Тут навчена частина таблиці лінійно
+    інтерполюється до потрібного розміру, тому зменшене зображення зберігає
+    відносні позиції. Для рідної сітки викликається оригінальний модуль без змін.
+    """
+
+    def __init__(self, base: torch.nn.Module, base_grid: int):
+        super().__init__()
+        self.base = base
+        self.base_grid = base_grid
+        self._cache: Dict[Tuple[int, int], torch.Tensor] = {}
+
+    @staticmethod
+    def _resample(weight: torch.Tensor, size: int) -> torch.Tensor:
+        """Лінійно інтерполює таблицю (N, D) до (size, D)."""
+        resized = F.interpolate(
+            weight.float().t().unsqueeze(0),
+            size=size,
+            mode="linear",
+            align_corners=False,
+        )
+        return resized.squeeze(0).t().to(weight.dtype)
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        if len(pixel_values.shape) != 4:
+            raise ValueError("pixel_values must be a 4D tensor")
+
+        height, width = pixel_values.shape[1:3]
+        if height == self.base_grid and width == self.base_grid:
+            return self.base(pixel_values)
+
+        pos = self._cache.get((height, width))
+        if pos is None:
+            row_weight = self.base.row_embeddings.weight[: self.base_grid]
+            column_weight = self.base.column_embeddings.weight[: self.base_grid]
+            y_emb = self._resample(row_weight, height)
+            x_emb = self._resample(column_weight, width)
+            # (height, width, embedding_dim) - той самий порядок, що й в оригіналі
+            pos = torch.cat(
+                [x_emb.unsqueeze(0).expand(height, -1, -1), y_emb.unsqueeze(1).expand(-1, width, -1)],
+                dim=-1,
+            )
+            self._cache[(height, width)] = pos
+
+        return pos.unsqueeze(0).expand(pixel_values.shape[0], -1, -1, -1)
+
+
+class OCRTokenStreamer(BaseStreamer):
+    """
+    Передає текст OCR в on_event("ocr_token", {"text": ...}) по мірі генерації.
+
+    Працює для батчу з одного зображення і greedy-декодування (beam search
+    не віддає токени по одному). Greedy-текст і є фінальним результатом
+    потокового запиту - OCR виконується один раз, тож він може відрізнятися
+    від beam search без потоку (generation_config, num_beams=3 у Florence-2).
+    Текст декодується повністю на кожному кроці, а назовні йде лише приріст;
+    незавершений UTF-8 символ притримується.
+    """
 
-from config import MODEL_CONFIG, VERBOSE_INFERENCE, REGEX_PATTERNS
+    def __init__(self, tokenizer, on_event: EventCallback):
+        self.tokenizer = tokenizer
+        self.on_event = on_event
+        self.token_ids: List[int] = []
+        self.text = ""
 
+    def put(self, value: torch.Tensor) -> None:
+        self.token_ids.extend(value.reshape(-1).tolist())
+        text = self.tokenizer.decode(self.token_ids, skip_special_tokens=True)
+        if text.endswith("\ufffd") or not text.startswith(self.text):
+            return
+        delta = text[len(self.text):]
+        if delta:
+            self.text = text
+            self.on_event("ocr_token", {"text": delta})
 
-class PassportOCREngine:
+    def end(self) -> None:
+        pass
+
+
+class PassportOCREngine(BaseOCREngine):
     """Клас для роботи з Florence-2 моделлю для розпізнавання паспортних даних."""
 
-    def __init__(self, model_path: str = "./models/florence2-large"):
+    def __init__(
+        self,
+        model_path: str = "./models/florence2-large",
+        face_detector: Optional[str] = FACE_DETECTOR,
+        layout_templates: bool = ENABLE_LAYOUT_TEMPLATES,
+    ):
         """
         Ініціалізація моделі Florence-2.
 
         Args:
             model_path: Шлях до локальної копії моделі
+            face_detector: Швидкий детектор обличчя (ключ з FACE_DETECTORS, None - лише Florence)
+            layout_templates: Брати рамку обличчя з шаблону документа (layouts.py) перед детектором
         """
         self.model_path = Path(model_path)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.dtype = torch.float16 if self.device == "cuda" else torch.float32
         self.processor = None
         self.model = None
+        self.native_resolution = QUALITY_LEVELS[DEFAULT_QUALITY]
+
+        # Заміри етапів (встановлює benchmark.py); None - без накладних витрат
+        self.stage_timer: Optional[StageTimer] = None
 
         print(f"[INFO] Initializing PassportOCREngine... (Device: {self.device})")
         self._load_model()
+        self.face_detector = create_face_detector(face_detector)
+        self.layout_templates = layout_templates
 
     def _load_model(self) -> None:
         """Завантажує модель і процесор з локальної копії."""
@@ -62,233 +169,369 @@ class PassportOCREngine:
                 trust_remote_code=MODEL_CONFIG["trust_remote_code"],
             ).to(self.device).eval()
 
+            self.native_resolution = self.processor.image_processor.size["height"]
+            self._install_position_interpolation()
+            self._install_stage_hooks()
+
             print(f"[INFO] Model successfully loaded on {self.device}")
 
         except Exception as e:
             raise RuntimeError(f"[ERROR] Model loading error: {str(e)}")
 
-    def _load_image(self, image_path: str) -> Image.Image:
-        """
-        Завантажує зображення з диска.
+    def _install_position_interpolation(self) -> None:
+        """Замінює image_pos_embed моделі на версію з інтерполяцією для рівнів якості."""
+        total_stride = 1
+        for stride in self.model.config.vision_config.patch_stride:
+            total_stride *= stride
 
-        Args:
-            image_path: Абсолютний шлях до зображення
+        base_grid = self.native_resolution // total_stride
+        self.model.image_pos_embed = InterpolatedPositionEmbedding2D(
+            self.model.image_pos_embed, base_grid=base_grid
+        )
 
-        Returns:
-            PIL Image об'єкт
+        if VERBOSE_INFERENCE:
+            print(f"[DEBUG] image_pos_embed interpolation installed (native grid {base_grid}x{base_grid})")
 
-        Raises:
-            FileNotFoundError: Файл не знайдено
-        """
-        image_path = Path(image_path)
+    def _install_stage_hooks(self) -> None:
+        """Виділяє vision encode (DaViT + проекція), що виконується всередині generate, в окремий етап."""
+        encode_image = self.model._encode_image
 
-        if not image_path.exists():
-            raise FileNotFoundError(f"[ERROR] File not found: {image_path}")
+        def timed_encode_image(pixel_values):
+            with self._stage("vision_encode"):
+                return encode_image(pixel_values)
 
-        try:
-            image = Image.open(image_path).convert("RGB")
-            print(f"[INFO] Image loaded: {image_path.name} ({image.size})")
-            return image
-        except Exception as e:
-            raise RuntimeError(f"[ERROR] Image loading error: {str(e)}")
+        self.model._encode_image = timed_encode_image
 
-    def _extract_passport_number(self, ocr_text: str) -> Optional[str]:
+    def _preprocess_images(self, images: List[Image.Image], resolution: int) -> torch.Tensor:
         """
-        Вилучає номер паспорта зі сирого тексту OCR.
+        Готує pixel_values (batch, 3, resolution, resolution) для заданої роздільної здатності.
 
-        Формати:
-        - Українська ID-картка: 9 цифр (xxx xxx xxx або xxxxxxxxx)
-        - Паспортна книжечка: 2 літери + 6 цифр (XX 123456 або XX123456)
-        - Міжнародний паспорт: 8-15 символів (літери + цифри, обов'язково є цифра)
+        Виконується один раз на зображення: OCR та пошук обличчя
+        використовують той самий тензор.
+        """
+        size = {"height": resolution, "width": resolution}
+        with self._stage("preprocess"):
+            pixel_values = self.processor.image_processor(
+                images,
+                size=size,
+                crop_size=size,
+                return_tensors="pt",
+            )["pixel_values"]
+            return pixel_values.to(self.device, dtype=self.dtype)
+
+    def _tokenize_prompt(self, prompt: str) -> torch.Tensor:
+        """Токенізує task-prompt так само, як це робить Florence2Processor."""
+        text = self.processor._construct_prompts([prompt])
+        input_ids = self.processor.tokenizer(text, return_tensors="pt")["input_ids"]
+        return input_ids.to(self.device)
+
+    def _generate(
+        self,
+        prompt: str,
+        pixel_values: torch.Tensor,
+        max_new_tokens: int,
+        streamer: Optional[BaseStreamer] = None,
+        stage: str = "generate",
+    ) -> List[str]:
+        """
+        Запускає generate для task-prompt на батчі зображень.
 
-        Args:
-            ocr_text: Сирий текст з OCR
+        Prompt однаковий для всього батчу, тому паддинг input_ids не потрібен.
+        Зі streamer генерація greedy (num_beams=1), інакше - з generation_config моделі.
+        stage - назва етапу для stage_timer (vision_encode виділяється окремо).
 
         Returns:
-            Знайдений номер паспорта або None
+            Сирі тексти з спецтокенами (по одному на зображення). <pad>, яким
+            generate доповнює вже завершені послідовності батчу, прибирається -
+            текст зображення не залежить від того, з чим воно потрапило в батч.
         """
-        if not ocr_text:
-            return None
-
-        # Видаляємо зайві пропуски та переносимо на нові рядки
-        cleaned_text = re.sub(r"\s+", " ", ocr_text).upper()
-
-        # ID-картка: 9 цифр у форматі XXX XXX XXX або xxxxxxxxx
-        pattern = REGEX_PATTERNS.get("ukrainian_id_card")
-        match = re.search(pattern, cleaned_text)
-        if match:
-            passport = match.group(1).replace(" ", "")
-            if passport.isdigit() and len(passport) == 9:
-                if VERBOSE_INFERENCE:
-                    print(f"[DEBUG] Found ID card: {passport}")
-                return passport
-
-        # Паспортна книжечка: 2 літери + 6 цифр у форматі XX 123456 або XX123456
-        pattern = REGEX_PATTERNS.get("passport_book")
-        match = re.search(pattern, cleaned_text)
-        if match:
-            passport = match.group(1).replace(" ", "")
-            if VERBOSE_INFERENCE:
-                print(f"[DEBUG] Found passport book: {passport}")
-            return passport
-
-        # Міжнародний паспорт: 9 символів загального формату
-        pattern = REGEX_PATTERNS.get("international")
-        match = re.search(pattern, cleaned_text)
-        if match:
-            passport = match.group(1)
-            if VERBOSE_INFERENCE:
-                print(f"[DEBUG] Found international passport: {passport}")
-            return passport
+        input_ids = self._tokenize_prompt(prompt).expand(pixel_values.shape[0], -1)
+        extra = {"streamer": streamer, "num_beams": 1} if streamer is not None else {}
+        with torch.no_grad(), self._stage(stage):
+            generated_ids = self.model.generate(
+                input_ids=input_ids,
+                pixel_values=pixel_values,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                **extra,
+            )
 
-        if VERBOSE_INFERENCE:
-            print("[WARN] Passport number not recognized in OCR text")
-        return None
+        if self.stage_timer is not None:
+            # Без стартового токена декодера
+            self.stage_timer.add_tokens(generated_ids.shape[0] * (generated_ids.shape[1] - 1), stage)
 
-    def process_image(self, image_path: str) -> Dict[str, Any]:
-        """
-        Обробляє зображення для вилучення номера паспорта.
+        texts = self.processor.batch_decode(generated_ids, skip_special_tokens=False)
+        pad_token = self.processor.tokenizer.pad_token
+        return [text.replace(pad_token, "") for text in texts] if pad_token else texts
 
-        Args:
-            image_path: Абсолютний шлях до зображення
+    @staticmethod
+    def _pad_box(box, image: Image.Image, padding: float) -> Tuple[int, int, int, int]:
+        """Розширює рамку на padding від її розміру (з обрізанням по межах зображення)."""
+        x1, y1, x2, y2 = box
+        w, h = x2 - x1, y2 - y1
+        padding_x = w * padding
+        padding_y = h * padding
 
-        Returns:
-            Словник з результатами:
-            {
-                "passport_number": str або None,
-                "ocr_text": str (сирий текст),
-                "confidence": float (умовна впевненість),
-                "image": PIL.Image,
-                "processing_time": float
-            }
+        x1 = max(0, x1 - padding_x)
+        y1 = max(0, y1 - padding_y)
+        x2 = min(image.width, x2 + padding_x)
+        y2 = min(image.height, y2 + padding_y)
 
-        Raises:
-            FileNotFoundError: Файл не знайдено
-            RuntimeError: Помилка при інференсу (GPU OOM тощо)
+        return (int(x1), int(y1), int(x2), int(y2))
+
+    def _ground_faces(
+        self, images: List[Image.Image], pixel_values: torch.Tensor
+    ) -> List[Optional[Tuple[int, int, int, int]]]:
         """
-        import time
+        Шукає обличчя через Florence-2 <CAPTION_TO_PHRASE_GROUNDING>.
 
-        process_start = time.time()
-        print(f"\n[INFO] Starting processing: {Path(image_path).name}")
+        Дорогий шлях (генерація до 1024 токенів на кожну фразу),
+        використовується лише як fallback після швидкого детектора.
+        Запасна фраза запускається батчем лише для зображень без результату.
 
-        # Завантажуємо зображення
-        image = self._load_image(image_path)
+        Returns:
+            Найбільша знайдена рамка (без відступу) або None для кожного зображення
+        """
+        task_prompt = "<CAPTION_TO_PHRASE_GROUNDING>"
+        phrases = ["face", "portrait"] # Primary and fallback prompts
 
-        try:
-            # 1. OCR Step
-            prompt_ocr = "<OCR>"
-            inputs_ocr = self.processor(
-                text=prompt_ocr,
-                images=image,
-                return_tensors="pt",
-            ).to(self.device, dtype=torch.float16 if self.device == "cuda" else torch.float32)
+        boxes: List[Optional[Tuple[int, int, int, int]]] = [None] * len(images)
+        pending = list(range(len(images)))
 
-            print("[INFO] Running OCR inference...")
-            with torch.no_grad():
-                generated_ids_ocr = self.model.generate(
-                    input_ids=inputs_ocr["input_ids"],
-                    pixel_values=inputs_ocr["pixel_values"],
-                    max_new_tokens=MODEL_CONFIG.get("max_new_tokens", 256),
-                    do_sample=False,
-                )
+        for phrase in phrases:
+            if not pending:
+                break
 
-            ocr_text = self.processor.batch_decode(
-                generated_ids_ocr, skip_special_tokens=False
-            )[0]
-            ocr_text = ocr_text.replace("<OCR>", "").replace("</OCR>", "").strip()
-            print(f"[DEBUG] Raw OCR text: {ocr_text[:100]}...")
+            face_result_texts = self._generate(
+                task_prompt + phrase,
+                pixel_values[pending],
+                max_new_tokens=1024,
+                stage="grounding_decode",
+            )
 
-            # 2. Face Detection Step
-            print("[INFO] Running Face Detection...")
-            task_prompt = "<CAPTION_TO_PHRASE_GROUNDING>"
-            phrases = ["face", "portrait"] # Primary and fallback prompts
-            
-            face_box = None
-            
-            for phrase in phrases:
-                prompt_text = task_prompt + phrase
-                
-                inputs_face = self.processor(
-                    text=prompt_text,
-                    images=image,
-                    return_tensors="pt",
-                ).to(self.device, dtype=torch.float16 if self.device == "cuda" else torch.float32)
-
-                with torch.no_grad():
-                    generated_ids_face = self.model.generate(
-                        input_ids=inputs_face["input_ids"],
-                        pixel_values=inputs_face["pixel_values"],
-                        max_new_tokens=1024,
-                        do_sample=False,
-                    )
-                
-                face_result_text = self.processor.batch_decode(
-                    generated_ids_face, skip_special_tokens=False
-                )[0]
-                
+            for index, face_result_text in zip(pending, face_result_texts):
+                image = images[index]
                 parsed_result = self.processor.post_process_generation(
-                    face_result_text, 
-                    task=task_prompt, 
+                    face_result_text,
+                    task=task_prompt,
                     image_size=(image.width, image.height)
                 )
-                
+
                 # Check results
                 if parsed_result and task_prompt in parsed_result:
                     data = parsed_result[task_prompt]
                     bboxes = data.get('bboxes', [])
-                    
+
                     # Filter valid boxes
                     valid_bboxes = [b for b in bboxes if (b[2] > b[0] and b[3] > b[1])]
-                    
+
                     if valid_bboxes:
-                         # Found valid face
-                         print(f"[INFO] Face detected with phrase '{phrase}'")
-                         best_box = max(valid_bboxes, key=lambda box: (box[2]-box[0]) * (box[3]-box[1]))
-                         
-                         # Expand box slightly (padding) for better crop
-                         x1, y1, x2, y2 = best_box
-                         w, h = x2 - x1, y2 - y1
-                         padding_x = w * 0.1
-                         padding_y = h * 0.1
-                         
-                         x1 = max(0, x1 - padding_x)
-                         y1 = max(0, y1 - padding_y)
-                         x2 = min(image.width, x2 + padding_x)
-                         y2 = min(image.height, y2 + padding_y)
-                         
-                         face_box = (int(x1), int(y1), int(x2), int(y2))
-                         break # Stop searching if found
-            
-            # Crop image
-            if face_box:
-                x1, y1, x2, y2 = face_box
-                if (x2 - x1) > 10 and (y2 - y1) > 10:
-                    face_image = image.crop((x1, y1, x2, y2))
-                    print(f"[INFO] Cropped face: ({x1}, {y1}, {x2}, {y2})")
-                else:
-                    print(f"[WARN] Detected face too small: {face_box}. Returning full image.")
-                    face_image = image
+                        print(f"[INFO] Face detected with phrase '{phrase}'")
+                        boxes[index] = max(valid_bboxes, key=lambda box: (box[2]-box[0]) * (box[3]-box[1]))
+
+            pending = [index for index in pending if boxes[index] is None]
+
+        return boxes
+
+    def _detect_faces(
+        self,
+        images: List[Image.Image],
+        resolution: int,
+        pixel_values: Optional[torch.Tensor] = None,
+        document_types: Optional[List[Optional[str]]] = None,
+        ocr_texts: Optional[List[Optional[str]]] = None,
+    ) -> List[Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]]:
+        """
+        Знаходить обличчя: шаблон документа, далі швидкий CPU-детектор, потім Florence grounding.
+
+        Args:
+            images: PIL Images
+            resolution: Розмір входу vision tower для fallback-генерації
+            pixel_values: Вже підготовлений тензор (якщо OCR вже виконано)
+            document_types: Типи документів з OCR (None - визначаються за пропорціями)
+            ocr_texts: Тексти OCR (розрізняють шаблони з однаковими пропорціями)
+
+        Returns:
+            Для кожного зображення: (рамка з відступом або None,
+            назва джерела: "template"/"haar"/"florence"/None)
+        """
+        if document_types is None:
+            document_types = [None] * len(images)
+        if ocr_texts is None:
+            ocr_texts = [None] * len(images)
+
+        faces: List[Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]] = []
+        for image, document_type, ocr_text in zip(images, document_types, ocr_texts):
+            with self._stage("face_detect"):
+                if self.layout_templates:
+                    box = predict_face_box(image, document_type, ocr_text, self.face_detector)
+                    if box is not None:
+                        print(f"[INFO] Face box taken from document layout ({document_type or 'by aspect'})")
+                        faces.append((box, "template"))
+                        continue
+
+                if self.face_detector is not None:
+                    box = self.face_detector.detect(image)
+                    if box is not None:
+                        print(f"[INFO] Face detected by fast detector '{self.face_detector.name}'")
+                        faces.append((self._pad_box(box, image, self.face_detector.padding), self.face_detector.name))
+                        continue
+                    print("[INFO] Fast detector found no face, falling back to Florence grounding...")
+
+            faces.append((None, None))
+
+        pending = [index for index, (box, _) in enumerate(faces) if box is None]
+        if pending:
+            print("[INFO] Running Face Detection...")
+            pending_images = [images[index] for index in pending]
+            if pixel_values is None:
+                pending_pixels = self._preprocess_images(pending_images, resolution)
             else:
-                print("[WARN] No face detected with any prompt. Returning full image.")
-                face_image = image
+                pending_pixels = pixel_values[pending]
+
+            for index, box in zip(pending, self._ground_faces(pending_images, pending_pixels)):
+                if box is not None:
+                    # Expand box slightly (padding) for better crop
+                    faces[index] = (self._pad_box(box, images[index], 0.1), "florence")
+
+        return faces
+
+    def process_batch(
+        self,
+        images: List[Image.Image],
+        names: Optional[List[str]] = None,
+        quality: str = DEFAULT_QUALITY,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        on_event: Optional[EventCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Обробляє батч вже завантажених зображень.
 
-            # Вилучаємо номер паспорта
-            passport_number = self._extract_passport_number(ocr_text)
+        OCR та Florence grounding виконуються одним generate на весь батч;
+        шаблони, швидкий детектор і кадрування - по кожному зображенню.
+        processing_time кожного результату - його частка спільних етапів
+        плюс власні етапи.
 
-            processing_time = time.time() - process_start
+        Args:
+            images: PIL Images (RGB)
+            names: Імена для журналу (default: порядкові номери)
+            quality: Рівень якості з QUALITY_LEVELS
+            tasks: Задачі з PROCESS_TASKS
+            on_event: Колбек проміжних результатів, щойно вони готові:
+                "ocr_token" {"text"} (лише для одного зображення),
+                "number" {"index", "passport_number", "document_type", "ocr_text"},
+                "face_box" {"index", "face_box", "face_source"}
 
-            print(
-                f"[INFO] Processing complete in {processing_time:.2f}s. "
-                f"Passport: {passport_number or 'Not found'}"
-            )
+        Returns:
+            Список результатів у форматі process_image (у тому ж порядку)
+
+        Raises:
+            ValueError: Невідомий рівень якості або задача
+            RuntimeError: Помилка при інференсу (GPU OOM тощо)
+        """
+        import time
+
+        resolution = self._resolve_resolution(quality)
+        tasks = self._resolve_tasks(tasks)
+        need_ocr = "number" in tasks or "ocr_text" in tasks
+        need_face = "face_box" in tasks or "face_image" in tasks
+
+        if not images:
+            return []
+        if names is None:
+            names = [f"#{index}" for index in range(len(images))]
+
+        batch_start = time.time()
+        print(
+            f"\n[INFO] Starting processing: {', '.join(names)} "
+            f"(quality: {quality}, {resolution}px, tasks: {', '.join(tasks)})"
+        )
+
+        try:
+            count = len(images)
+            pixel_values = None
+            ocr_texts: List[Optional[str]] = [None] * count
+            matches: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * count
+            faces: List[Tuple[Optional[Tuple[int, int, int, int]], Optional[str]]] = [(None, None)] * count
+
+            # 1. OCR Step
+            if need_ocr:
+                pixel_values = self._preprocess_images(images, resolution)
+                prompt_ocr = "<OCR>"
+                print("[INFO] Running OCR inference...")
+                streamer = None
+                if on_event is not None and count == 1:
+                    streamer = OCRTokenStreamer(self.processor.tokenizer, on_event)
+                raw_texts = self._generate(
+                    prompt_ocr,
+                    pixel_values,
+                    max_new_tokens=MODEL_CONFIG.get("max_new_tokens", 256),
+                    streamer=streamer,
+                    stage="ocr_decode",
+                )
+                for index, ocr_text in enumerate(raw_texts):
+                    ocr_text = ocr_text.replace("<OCR>", "").replace("</OCR>", "").strip()
+                    print(f"[DEBUG] Raw OCR text: {ocr_text[:100]}...")
+                    ocr_texts[index] = ocr_text
+
+                    # Вилучаємо номер паспорта (формат номера також визначає тип документа)
+                    matches[index] = self._match_passport_number(ocr_text)
+                    if on_event is not None:
+                        on_event("number", {
+                            "index": index,
+                            "passport_number": matches[index][0],
+                            "document_type": matches[index][1],
+                            "ocr_text": ocr_text,
+                        })
+
+            # 2. Face Detection Step
+            if need_face:
+                faces = self._detect_faces(
+                    images, resolution, pixel_values, [document_type for _, document_type in matches], ocr_texts
+                )
+                if on_event is not None:
+                    for index, (face_box, face_source) in enumerate(faces):
+                        on_event("face_box", {
+                            "index": index,
+                            "face_box": list(face_box) if face_box else None,
+                            "face_source": face_source,
+                        })
+
+            shared_time = (time.time() - batch_start) / count
+
+            results = []
+            for index, image in enumerate(images):
+                item_start = time.time()
+                passport_number, document_type = matches[index]
+                face_box, face_source = faces[index]
+
+                # Crop image
+                face_image = None
+                if "face_image" in tasks:
+                    with self._stage("crop"):
+                        face_image = self._crop_face(image, face_box)
+
+                processing_time = shared_time + (time.time() - item_start)
+
+                print(
+                    f"[INFO] Processing complete in {processing_time:.2f}s ({names[index]}). "
+                    f"Passport: {passport_number or 'Not found'}"
+                )
 
-            return {
-                "passport_number": passport_number,
-                "ocr_text": ocr_text,
-                "confidence": 0.85 if passport_number else 0.0,
-                "image": face_image, # Return cropped face
-                "processing_time": processing_time,
-            }
+                results.append({
+                    "passport_number": passport_number,
+                    "ocr_text": ocr_texts[index],
+                    "confidence": 0.85 if passport_number else 0.0,
+                    "image": face_image, # Return cropped face
+                    "face_box": face_box,
+                    "face_source": face_source,
+                    "document_type": document_type,
+                    "quality": quality,
+                    "tasks": tasks,
+                    "processing_time": processing_time,
+                })
+
+            return results
 
         except torch.cuda.OutOfMemoryError:
             raise RuntimeError(
@@ -305,4 +548,4 @@ class PassportOCREngine:
         if self.processor is not None:
             del self.processor
         torch.cuda.empty_cache()
-        print("[INFO] Model cleared from VRAM")
\ No newline at end of file
+        print("[INFO] Model cleared from VRAM")
@@ -0,0 +1,158 @@
+"""
+Черга асинхронних задач (POST /api/jobs) у вбудованій SQLite.
+
+Кожна задача - рядок таблиці jobs зі статусом queued -> running -> done/error.
+База працює в режимі WAL з synchronous=FULL: підтверджена задача переживає
+падіння процесу чи перезавантаження. Задачі, що були "running" в момент
+падіння, при старті повертаються в чергу.
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import JOBS_DB_PATH
+
+JOB_STATUSES = ("queued", "running", "done", "error")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    batch_key   TEXT NOT NULL,
+    request     TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, batch_key, created_at);
+"""
+
+
+class JobStore:
+    """Потокобезпечна обгортка над SQLite-файлом задач."""
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+
+    @staticmethod
+    def batch_key(request: Dict[str, Any]) -> str:
+        """Задачі з однаковим ключем можна обробити одним батчем рушія."""
+        return json.dumps([
+            request.get("quality"),
+            request.get("model_tier"),
+            sorted(request.get("tasks", [])),
+            request.get("face_image_format"),
+        ])
+
+    def create(self, request: Dict[str, Any]) -> str:
+        """Ставить задачу в чергу і повертає її ідентифікатор."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, batch_key, request, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, self.batch_key(request), json.dumps(request, ensure_ascii=False), time.time()),
+            )
+        return job_id
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Атомарно забирає до limit найстаріших задач з однаковим batch_key.
+
+        Returns:
+            Задачі (вже зі статусом "running") або порожній список
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._db.execute(
+                    "SELECT batch_key FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if first is None:
+                    self._db.execute("COMMIT")
+                    return []
+
+                rows = self._db.execute(
+                    "SELECT id, request FROM jobs WHERE status = 'queued' AND batch_key = ? "
+                    "ORDER BY created_at LIMIT ?",
+                    (first["batch_key"], limit),
+                ).fetchall()
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                    [(now, row["id"]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return [{"id": row["id"], "request": json.loads(row["request"])} for row in rows]
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._finish(job_id, "done", json.dumps(result, ensure_ascii=False), None)
+
+    def fail(self, job_id: str, message: str) -> None:
+        self._finish(job_id, "error", None, message)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Стан задачі або None, якщо її немає."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error_message": row["error"],
+        }
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def requeue_running(self) -> int:
+        """Повертає в чергу задачі, перервані падінням процесу."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Видаляє завершені задачі, старші за older_than_seconds."""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'error') AND finished_at < ?",
+                (time.time() - older_than_seconds,),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,93 @@
+"""
+Мікробенчмарк серіалізації відповіді /api/process.
+
+Порівнює стандартний шлях FastAPI (ProcessResponse -> валідація response_model ->
+jsonable_encoder -> json.dumps) зі швидким (FAST_JSON_RESPONSES: словник полів ->
+orjson) на типових відповідях: лише номер, номер + OCR, номер + фото в Base64.
+Модель не завантажується.
+
+Використання:
+    python json_bench.py
+    python json_bench.py --iterations 2000 --image-kb 400
+"""
+
+import os
+import time
+import base64
+import argparse
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api import ProcessResponse
+from fast_json import FastJSONResponse, orjson
+
+
+def make_payloads(image_kb: int) -> Dict[str, Dict[str, Any]]:
+    """Поля відповіді у формі, яку збирає _build_response_fields."""
+    base = {
+        "status": "success",
+        "processing_time": "0.41s",
+        "quality": "high",
+        "model_tier": "base",
+        "escalated": False,
+        "error_message": None,
+        "passport_number": "001234567",
+        "document_type": "ukrainian_id_card",
+    }
+    with_ocr = dict(base, ocr_text=("УКРАЇНА ПАСПОРТ ГРОМАДЯНИНА 001234567 " * 20)[:500])
+    image = base64.b64encode(os.urandom(image_kb * 1024)).decode("ascii")
+    with_image = dict(
+        with_ocr,
+        face_box=[64, 120, 410, 560],
+        face_source="haar",
+        image_base64=f"data:image/jpeg;base64,{image}",
+    )
+    return {"number": base, "number+ocr": with_ocr, "number+ocr+image": with_image}
+
+
+def standard_path(fields: Dict[str, Any]) -> bytes:
+    """Як FastAPI з response_model: модель, повторна валідація, jsonable_encoder, json.dumps."""
+    model = ProcessResponse(**fields)
+    validated = ProcessResponse.model_validate(model)
+    return JSONResponse(jsonable_encoder(validated, exclude_unset=True)).body
+
+
+def fast_path(fields: Dict[str, Any]) -> bytes:
+    return FastJSONResponse(fields).body
+
+
+def measure(fn: Callable[[Dict[str, Any]], bytes], fields: Dict[str, Any], iterations: int) -> float:
+    """Середній час одного виклику, мкс."""
+    fn(fields)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(fields)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    """Головна функція."""
+    parser = argparse.ArgumentParser(description="Passport Reader - JSON response benchmark")
+    parser.add_argument("--iterations", type=int, default=1000, help="Повторів на варіант (default: 1000)")
+    parser.add_argument("--image-kb", type=int, default=300, help="Розмір фото до Base64, KB (default: 300)")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print(" JSON RESPONSE SERIALIZATION")
+    print("=" * 70)
+    print(f"  encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}\n")
+    print(f"  {'payload':18s} {'size':>9s} {'standard':>11s} {'fast':>11s} {'speedup':>8s}")
+
+    for name, fields in make_payloads(args.image_kb).items():
+        size = len(fast_path(fields))
+        standard = measure(standard_path, fields, args.iterations)
+        fast = measure(fast_path, fields, args.iterations)
+        print(f"  {name:18s} {size / 1024:>7.1f}KB {standard:>9.1f}us {fast:>9.1f}us {standard / fast:>7.1f}x")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Шаблони розміщення фото для відомих типів документів.
+
+Українська ID-картка та паспортні бланки мають фіксоване місце фото.
+Після дешевого визначення типу документа (за форматом номера і текстом OCR
+або за пропорціями) та вирівнювання (пошук меж документа на скані) рамка
+обличчя береться з геометрії шаблону - без генерації моделі.
+
+Шаблон приймається лише тоді, коли в його рамці є обличчя: швидкий детектор
+знаходить його в околі рамки (або, без детектора, рамка містить достатньо
+пікселів кольору шкіри). Інакше працює звичайний ланцюжок детекторів.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+from config import (
+    DOCUMENT_LAYOUTS, LAYOUT_ASPECT_TOLERANCE, LAYOUT_MIN_CROP_STD,
+    LAYOUT_ALIGN_MAX_SIDE, LAYOUT_BACKGROUND_THRESHOLD,
+    LAYOUT_FACE_SEARCH_MARGIN, LAYOUT_MIN_SKIN_RATIO,
+)
+
+Box = Tuple[int, int, int, int]
+
+
+class DocumentLayout:
+    """Геометрія документа: пропорції та відносне положення фото."""
+
+    def __init__(
+        self,
+        name: str,
+        aspect_ratio: float,
+        face_box: Tuple[float, float, float, float],
+        text_markers: Sequence[str] = (),
+    ):
+        """
+        Args:
+            name: Тип документа (ключ як у PASSPORT_REGEX_PATTERNS)
+            aspect_ratio: Ширина / висота вирівняного документа
+            face_box: Фото у частках документа (x1, y1, x2, y2)
+            text_markers: Рядки, один з яких має бути в тексті OCR (порожньо - без вимоги)
+        """
+        self.name = name
+        self.aspect_ratio = aspect_ratio
+        self.face_box = face_box
+        self.text_markers = tuple(text_markers)
+
+    def matches_text(self, ocr_text: str) -> bool:
+        """Чи є в тексті OCR хоча б один маркер шаблону."""
+        text = ocr_text.replace(" ", "")
+        return any(marker in text for marker in self.text_markers)
+
+    def matches_aspect(self, width: int, height: int, tolerance: float = LAYOUT_ASPECT_TOLERANCE) -> bool:
+        """Чи відповідають пропорції знайденого документа шаблону."""
+        if height == 0:
+            return False
+        return abs(width / height - self.aspect_ratio) <= self.aspect_ratio * tolerance
+
+    def face_box_in(self, document_box: Box) -> Box:
+        """Переводить відносну рамку фото в координати зображення."""
+        x1, y1, x2, y2 = document_box
+        width, height = x2 - x1, y2 - y1
+        fx1, fy1, fx2, fy2 = self.face_box
+        return (
+            int(x1 + fx1 * width),
+            int(y1 + fy1 * height),
+            int(x1 + fx2 * width),
+            int(y1 + fy2 * height),
+        )
+
+
+# Реєстр шаблонів за типом документа
+LAYOUT_REGISTRY: Dict[str, DocumentLayout] = {
+    name: DocumentLayout(name, layout["aspect_ratio"], layout["face_box"], layout.get("text_markers", ()))
+    for name, layout in DOCUMENT_LAYOUTS.items()
+}
+
+
+def register_layout(layout: DocumentLayout) -> None:
+    """Додає або замінює шаблон у реєстрі."""
+    LAYOUT_REGISTRY[layout.name] = layout
+
+
+def align_document(image: Image.Image) -> Box:
+    """
+    Знаходить межі документа на скані.
+
+    Фон оцінюється за кольором кутів зображення; усе, що помітно від нього
+    відрізняється, вважається документом. Пошук виконується на зменшеній копії.
+    Якщо документ займає весь кадр, повертаються межі зображення.
+
+    Returns:
+        Рамка документа (x1, y1, x2, y2) у координатах зображення
+    """
+    scale = min(1.0, LAYOUT_ALIGN_MAX_SIDE / max(image.width, image.height))
+    small = image.convert("RGB")
+    if scale < 1.0:
+        small = small.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BILINEAR)
+
+    w, h = small.size
+    corners = [small.getpixel((0, 0)), small.getpixel((w - 1, 0)), small.getpixel((0, h - 1)), small.getpixel((w - 1, h - 1))]
+    background = tuple(sorted(channel)[len(channel) // 2] for channel in zip(*corners))
+
+    diff = ImageChops.difference(small, Image.new("RGB", small.size, background)).convert("L")
+    mask = diff.point(lambda value: 255 if value > LAYOUT_BACKGROUND_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return (0, 0, image.width, image.height)
+
+    x1, y1, x2, y2 = bbox
+    return (
+        int(x1 / scale),
+        int(y1 / scale),
+        min(image.width, int(x2 / scale)),
+        min(image.height, int(y2 / scale)),
+    )
+
+
+def classify_by_aspect(document_box: Box) -> Optional[str]:
+    """Тип документа лише за пропорціями - якщо підходить рівно один шаблон."""
+    candidates = resolve_layouts(document_box)
+    return candidates[0].name if len(candidates) == 1 else None
+
+
+def resolve_layouts(
+    document_box: Box,
+    document_type: Optional[str] = None,
+    ocr_text: Optional[str] = None,
+) -> List[DocumentLayout]:
+    """
+    Шаблони, що підходять документу.
+
+    Кандидати - шаблони з такими ж пропорціями. Якщо текст OCR відомий,
+    шаблони з маркерами без жодного маркера в тексті відкидаються, а
+    знайдений маркер відкидає шаблони без маркерів (сторінка даних з MRZ -
+    не паспортна книжечка, хоча пропорції однакові). Тип з OCR лише звужує
+    цей список: формат номера сам по собі не розрізняє шаблони.
+
+    Returns:
+        Шаблони-кандидати; рамку можна брати, лише якщо кандидат один
+    """
+    width = document_box[2] - document_box[0]
+    height = document_box[3] - document_box[1]
+    candidates = [layout for layout in LAYOUT_REGISTRY.values() if layout.matches_aspect(width, height)]
+
+    if ocr_text is not None:
+        candidates = [layout for layout in candidates if not layout.text_markers or layout.matches_text(ocr_text)]
+        if any(layout.text_markers for layout in candidates):
+            candidates = [layout for layout in candidates if layout.text_markers]
+
+    if document_type is not None:
+        candidates = [layout for layout in candidates if layout.name == document_type]
+
+    return candidates
+
+
+def _skin_ratio(crop: Image.Image) -> float:
+    """Частка пікселів кольору шкіри (діапазон Cb/Cr у YCbCr)."""
+    _, cb, cr = crop.convert("YCbCr").split()
+    cb_mask = cb.point(lambda value: 255 if 77 <= value <= 127 else 0)
+    cr_mask = cr.point(lambda value: 255 if 133 <= value <= 173 else 0)
+    return ImageStat.Stat(ImageChops.multiply(cb_mask, cr_mask)).mean[0] / 255
+
+
+def _contains_face(image: Image.Image, box: Box, face_detector=None) -> bool:
+    """
+    Чи є обличчя в рамці шаблону.
+
+    Рамка має бути в межах зображення і не порожньою. Далі швидкий детектор
+    шукає обличчя в околі рамки (LAYOUT_FACE_SEARCH_MARGIN), і центр
+    знайденого обличчя має лежати всередині рамки. Без детектора потрібна
+    частка пікселів кольору шкіри LAYOUT_MIN_SKIN_RATIO (чорно-білі фото
+    цю перевірку не проходять - тоді працює звичайний ланцюжок детекторів).
+    """
+    x1, y1, x2, y2 = box
+    if x1 < 0 or y1 < 0 or x2 > image.width or y2 > image.height:
+        return False
+    if (x2 - x1) <= 10 or (y2 - y1) <= 10:
+        return False
+
+    crop = image.crop(box)
+    if ImageStat.Stat(crop.convert("L")).stddev[0] < LAYOUT_MIN_CROP_STD:
+        return False
+
+    if face_detector is None:
+        return _skin_ratio(crop) >= LAYOUT_MIN_SKIN_RATIO
+
+    margin_x = int((x2 - x1) * LAYOUT_FACE_SEARCH_MARGIN)
+    margin_y = int((y2 - y1) * LAYOUT_FACE_SEARCH_MARGIN)
+    search_box = (
+        max(0, x1 - margin_x),
+        max(0, y1 - margin_y),
+        min(image.width, x2 + margin_x),
+        min(image.height, y2 + margin_y),
+    )
+    face = face_detector.detect(image.crop(search_box))
+    if face is None:
+        return False
+
+    center_x = search_box[0] + (face[0] + face[2]) / 2
+    center_y = search_box[1] + (face[1] + face[3]) / 2
+    return x1 <= center_x <= x2 and y1 <= center_y <= y2
+
+
+def predict_face_box(
+    image: Image.Image,
+    document_type: Optional[str] = None,
+    ocr_text: Optional[str] = None,
+    face_detector=None,
+) -> Optional[Box]:
+    """
+    Рамка фото з шаблону документа.
+
+    Args:
+        image: PIL Image
+        document_type: Тип документа з OCR (None - визначити за пропорціями)
+        ocr_text: Текст OCR (розрізняє шаблони з однаковими пропорціями)
+        face_detector: Швидкий детектор (face_detection.FaceDetector) для перевірки
+            обличчя в рамці; None - перевірка за кольором шкіри
+
+    Returns:
+        Рамка (x1, y1, x2, y2) або None, якщо шаблон не визначено однозначно
+        чи в його рамці не знайдено обличчя
+    """
+    document_box = align_document(image)
+    candidates = resolve_layouts(document_box, document_type, ocr_text)
+    if len(candidates) != 1:
+        if document_type is not None or len(candidates) > 1:
+            width = document_box[2] - document_box[0]
+            height = document_box[3] - document_box[1]
+            print(
+                f"[INFO] No unique layout for document {width}x{height} "
+                f"(type: {document_type or 'unknown'}, candidates: {[layout.name for layout in candidates]})"
+            )
+        return None
+
+    layout = candidates[0]
+    box = layout.face_box_in(document_box)
+    if not _contains_face(image, box, face_detector):
+        print(f"[INFO] No face found in layout '{layout.name}' face box: {box}")
+        return None
+
+    return box
@@ -0,0 +1,301 @@
+"""
+Генератор навантаження: відтворює JSONL-журнал запитів проти запущеного сервера.
+
+Режими:
+    closed - --concurrency клієнтів, кожен надсилає наступний запит після
+             відповіді на попередній (пропускна здатність при фіксованій паралельності);
+    open   - запити надходять з частотою --rate на секунду незалежно від відповідей
+             (рівномірно або за Пуассоном); затримка рахується від запланованого
+             моменту, тож черга на клієнті теж потрапляє в заміри.
+
+Формат журналу - один JSON-об'єкт на рядок:
+    {"method": "POST", "path": "/api/process", "body": {"file_path": "D:\\\\Scans\\\\a.jpg"}}
+    {"path": "/api/process/upload?tasks=number", "body_file": "data/1.jpeg"}
+    {"file_path": "D:\\\\Scans\\\\b.jpg", "tasks": ["number"]}   # скорочено: тіло для POST /api/process
+
+Використання:
+    python loadtest.py --log requests_log.jsonl --mode closed --concurrency 4 --duration 60
+    python loadtest.py --log requests_log.jsonl --mode open --rate 2.5 --poisson --output load.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import API_HOST, API_PORT
+from benchmark import summarize
+
+# Межі кошиків гістограми затримок (мс)
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+
+def load_requests(path: Path) -> List[Dict[str, Any]]:
+    """
+    Читає журнал і готує запити: {"method", "path", "body" (bytes), "headers"}.
+
+    Raises:
+        ValueError: Некоректний рядок журналу
+    """
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"[ERROR] {path}:{line_number}: {e}")
+
+            if "path" not in entry:
+                entry = {"method": "POST", "path": "/api/process", "body": entry}
+
+            headers = dict(entry.get("headers", {}))
+            if "body_file" in entry:
+                body = Path(entry["body_file"]).read_bytes()
+                headers.setdefault("Content-Type", "application/octet-stream")
+                headers.setdefault("X-Filename", Path(entry["body_file"]).name)
+            elif "body" in entry:
+                body = json.dumps(entry["body"], ensure_ascii=False).encode("utf-8")
+                headers.setdefault("Content-Type", "application/json")
+            else:
+                body = None
+
+            requests.append({
+                "method": entry.get("method", "POST" if body is not None else "GET"),
+                "path": entry["path"],
+                "body": body,
+                "headers": headers,
+            })
+
+    if not requests:
+        raise ValueError(f"[ERROR] No requests in {path}")
+    return requests
+
+
+class LoadClient:
+    """HTTP-клієнт з keep-alive з'єднанням на потік."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def send(self, request: Dict[str, Any]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Надсилає запит і повністю читає відповідь (включно з потоковими).
+
+        Returns:
+            (HTTP-статус або None, помилка з'єднання або None)
+        """
+        connection = self._connection()
+        try:
+            connection.request(request["method"], request["path"], body=request["body"], headers=request["headers"])
+            response = connection.getresponse()
+            response.read()
+            return response.status, None
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            self._local.connection = None
+            return None, f"{type(e).__name__}: {e}"
+
+
+class Recorder:
+    """Потокобезпечний збір результатів запитів."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies_ms: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: Optional[int], error: Optional[str]) -> None:
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+            key = str(status) if status is not None else "connection_error"
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            if error is not None:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+
+def run_closed_loop(client: LoadClient, requests, recorder: Recorder, concurrency: int, deadline: float, limit: Optional[int]):
+    """concurrency клієнтів, кожен чекає відповідь перед наступним запитом."""
+    counter = iter(range(sys.maxsize if limit is None else limit))
+    counter_lock = threading.Lock()
+
+    def worker():
+        while time.monotonic() < deadline:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.monotonic()
+            status, error = client.send(requests[index % len(requests)])
+            recorder.record((time.monotonic() - start) * 1000, status, error)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(
+    client: LoadClient, requests, recorder: Recorder, rate: float, poisson: bool,
+    max_inflight: int, deadline: float, limit: Optional[int],
+):
+    """Запити за розкладом з частотою rate/с незалежно від відповідей сервера."""
+
+    def fire(request, scheduled: float):
+        status, error = client.send(request)
+        # Від запланованого моменту: затримка в черзі клієнта теж рахується
+        recorder.record((time.monotonic() - scheduled) * 1000, status, error)
+
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        scheduled = time.monotonic()
+        index = 0
+        while scheduled < deadline and (limit is None or index < limit):
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, requests[index % len(requests)], scheduled)
+            index += 1
+            scheduled += random.expovariate(rate) if poisson else 1.0 / rate
+
+
+def histogram(latencies_ms: List[float]) -> List[Tuple[str, int]]:
+    counts = [0] * len(HISTOGRAM_BUCKETS_MS)
+    for latency in latencies_ms:
+        for position, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if latency <= bound:
+                counts[position] += 1
+                break
+
+    rows, lower = [], 0
+    for bound, count in zip(HISTOGRAM_BUCKETS_MS, counts):
+        label = f"> {lower}ms" if bound == float("inf") else f"<= {bound}ms"
+        rows.append((label, count))
+        lower = bound
+    return rows
+
+
+def build_report(recorder: Recorder, elapsed: float, args) -> Dict[str, Any]:
+    total = len(recorder.latencies_ms)
+    ok = sum(count for status, count in recorder.statuses.items() if status.startswith("2"))
+    return {
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "duration_s": elapsed,
+        "requests": total,
+        "throughput_rps": ok / elapsed if elapsed > 0 else 0.0,
+        "error_rate": (total - ok) / total if total else 0.0,
+        "rate_429": recorder.statuses.get("429", 0) / total if total else 0.0,
+        "statuses": recorder.statuses,
+        "errors": recorder.errors,
+        "latency_ms": summarize(recorder.latencies_ms),
+        "histogram": histogram(recorder.latencies_ms),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 70)
+    print(" LOAD TEST")
+    print("=" * 70)
+    load = f"concurrency {report['concurrency']}" if report["mode"] == "closed" else f"rate {report['rate']}/s"
+    print(f"  mode: {report['mode']} ({load}), {report['requests']} requests in {report['duration_s']:.1f}s\n")
+    print(f"  {'throughput':14s}: {report['throughput_rps']:.2f} req/s (2xx)")
+    print(f"  {'error rate':14s}: {report['error_rate'] * 100:.2f}%")
+    print(f"  {'429 rate':14s}: {report['rate_429'] * 100:.2f}%")
+    print(f"  {'statuses':14s}: {', '.join(f'{k}={v}' for k, v in sorted(report['statuses'].items()))}")
+
+    latency = report["latency_ms"]
+    print(
+        f"  {'latency':14s}: p50 {latency['p50']:.0f}ms  p95 {latency['p95']:.0f}ms  "
+        f"p99 {latency['p99']:.0f}ms  mean {latency['mean']:.0f}ms\n"
+    )
+
+    peak = max((count for _, count in report["histogram"]), default=0) or 1
+    for label, count in report["histogram"]:
+        if count:
+            print(f"  {label:>10s} {count:>7d} {'#' * max(1, int(40 * count / peak))}")
+
+    for error, count in report["errors"].items():
+        print(f"  [WARN] {count}x {error}")
+    print("=" * 70)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Passport Reader - HTTP load generator")
+    parser.add_argument("--log", required=True, help="JSONL-журнал запитів для відтворення (по колу)")
+    parser.add_argument(
+        "--url",
+        default=f"http://{API_HOST}:{API_PORT}",
+        help=f"Адреса сервера (default: http://{API_HOST}:{API_PORT})"
+    )
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="Модель навантаження")
+    parser.add_argument("--concurrency", type=int, default=1, help="closed: кількість клієнтів (default: 1)")
+    parser.add_argument("--rate", type=float, default=1.0, help="open: запитів на секунду (default: 1.0)")
+    parser.add_argument("--poisson", action="store_true", help="open: пуассонівський потік замість рівномірного")
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=256,
+        help="open: максимум одночасних з'єднань клієнта (default: 256)"
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="Тривалість, с (default: 60)")
+    parser.add_argument("--requests", type=int, default=None, help="Зупинитись після стількох запитів")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут запиту, с (default: 120)")
+    parser.add_argument("--output", type=str, default=None, help="Зберегти звіт у JSON")
+    return parser
+
+
+def main():
+    """Головна функція."""
+    args = build_parser().parse_args()
+
+    try:
+        requests = load_requests(Path(args.log))
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    client = LoadClient(args.url, args.timeout)
+    recorder = Recorder()
+
+    print(f"[INFO] Replaying {len(requests)} request(s) from {args.log} against {args.url} ({args.mode} loop)")
+    start = time.monotonic()
+    deadline = start + args.duration
+
+    if args.mode == "closed":
+        run_closed_loop(client, requests, recorder, args.concurrency, deadline, args.requests)
+    else:
+        run_open_loop(client, requests, recorder, args.rate, args.poisson, args.max_inflight, deadline, args.requests)
+
+    report = build_report(recorder, time.monotonic() - start, args)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[INFO] Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
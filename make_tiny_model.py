@@ -0,0 +1,182 @@
+"""
+Генератор мініатюрної Florence-2 з випадковими вагами для швидких наскрізних тестів.
+
+Бере код моделі, процесор і токенізатор з локальної копії (models/florence2-large),
+зменшує Florence2Config (вузькі стадії DaViT, малий d_model, по одному шару
+енкодера й декодера) і зберігає модель з випадковими вагами в тій самій
+структурі папки. PassportOCREngine завантажує її як звичайну модель і проходить
+увесь шлях preprocessing -> generate -> post-processing за частки секунди.
+
+Розпізнавання, звісно, не працює: випадкова модель генерує сміття. Тому
+final_logits_bias зсувається в бік EOS (--eos-bias), щоб generate закінчувався
+за кілька кроків, а не на max_new_tokens; --eos-bias 0 - чисто випадкові ваги.
+
+Використання:
+    python make_tiny_model.py                            # -> models/florence2-tiny
+    python make_tiny_model.py --check data/1.jpeg        # + прогін через PassportOCREngine
+    python make_tiny_model.py --d-model 128 --layers 2 --output /tmp/florence2-tiny
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+from typing import Any, Dict
+
+from config import MODEL_LOCAL_PATH, TINY_MODEL_PATH
+
+# Файли з локальної копії, потрібні для завантаження (ваги не копіюються)
+MODEL_FILES = (
+    "configuration_florence2.py",
+    "modeling_florence2.py",
+    "processing_florence2.py",
+    "preprocessor_config.json",
+    "generation_config.json",
+    "tokenizer.json",
+    "tokenizer_config.json",
+    "vocab.json",
+    "merges.txt",
+    "special_tokens_map.json",
+    "added_tokens.json",
+)
+
+
+def shrink_config(config: Dict[str, Any], d_model: int, layers: int) -> Dict[str, Any]:
+    """
+    Зменшує конфігурацію Florence-2.
+
+    Кроки патчів DaViT (сумарний stride 32) та кількість токенів зображення не
+    змінюються, тож процесор і рівні якості працюють як з повною моделлю.
+    """
+    config = json.loads(json.dumps(config))
+
+    text = config["text_config"]
+    heads = max(1, d_model // 32)
+    text.update({
+        "d_model": d_model,
+        "encoder_layers": layers,
+        "decoder_layers": layers,
+        "num_hidden_layers": layers,
+        "encoder_attention_heads": heads,
+        "decoder_attention_heads": heads,
+        "encoder_ffn_dim": d_model * 2,
+        "decoder_ffn_dim": d_model * 2,
+    })
+
+    vision = config["vision_config"]
+    stages = len(vision["dim_embed"])
+    # Ширина стадій подвоюється, як у DaViT; голови по 16 каналів
+    dims = [max(16, d_model // 2 ** (stages - 1 - stage)) for stage in range(stages)]
+    vision.update({
+        "dim_embed": dims,
+        "num_heads": [max(1, dim // 16) for dim in dims],
+        "num_groups": [max(1, dim // 16) for dim in dims],
+        "depths": [1] * stages,
+        "projection_dim": d_model,
+        "drop_path_rate": 0.0,
+    })
+
+    # Токени зображення (projection_dim) і тексту (d_model) йдуть в один енкодер
+    config["projection_dim"] = d_model
+    config["torch_dtype"] = "float32"
+    return config
+
+
+def make_tiny_model(source: Path, output: Path, d_model: int, layers: int, eos_bias: float, seed: int) -> None:
+    """
+    Створює мініатюрну модель у папці output.
+
+    Raises:
+        FileNotFoundError: Немає локальної копії повної моделі
+    """
+    if not (source / "config.json").exists():
+        raise FileNotFoundError(
+            f"[ERROR] Model folder not found: {source.absolute()}\n"
+            f"Execute: python model_setup.py"
+        )
+
+    output.mkdir(parents=True, exist_ok=True)
+    for name in MODEL_FILES:
+        if (source / name).exists():
+            shutil.copy2(source / name, output / name)
+
+    config = shrink_config(json.loads((source / "config.json").read_text(encoding="utf-8")), d_model, layers)
+    (output / "config.json").write_text(json.dumps(config, indent=2), encoding="utf-8")
+
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    torch.manual_seed(seed)
+    model_config = AutoConfig.from_pretrained(str(output), trust_remote_code=True)
+    model = AutoModelForCausalLM.from_config(model_config, trust_remote_code=True)
+
+    # torch.empty без ініціалізації в _init_weights - заповнюємо явно
+    torch.nn.init.normal_(model.image_projection, std=d_model ** -0.5)
+
+    if eos_bias:
+        eos_token_id = config["text_config"]["eos_token_id"]
+        model.language_model.final_logits_bias[0, eos_token_id] = eos_bias
+
+    model.save_pretrained(str(output), safe_serialization=True)
+
+    parameters = sum(parameter.numel() for parameter in model.parameters())
+    size_mb = sum(path.stat().st_size for path in output.glob("*.safetensors")) / (1024 * 1024)
+    print(f"[INFO] Tiny model saved: {output} ({parameters / 1e6:.1f}M parameters, {size_mb:.1f} MB)")
+
+
+def check_model(output: Path, image_path: str) -> None:
+    """Проганяє зображення через PassportOCREngine і друкує час."""
+    from inference import PassportOCREngine
+
+    engine = PassportOCREngine(model_path=str(output), face_detector=None)
+    start = time.time()
+    result = engine.process_image(image_path)
+    print(
+        f"[INFO] Full pipeline in {time.time() - start:.2f}s "
+        f"(OCR: {len(result['ocr_text'] or '')} chars, face box: {result['face_box']})"
+    )
+    engine.cleanup()
+
+
+def main():
+    """Головна функція."""
+    parser = argparse.ArgumentParser(description="Passport Reader - tiny random Florence-2 generator")
+    parser.add_argument(
+        "--source",
+        default=MODEL_LOCAL_PATH,
+        help=f"Локальна копія Florence-2 (код, процесор, токенізатор) (default: {MODEL_LOCAL_PATH})"
+    )
+    parser.add_argument("--output", default=TINY_MODEL_PATH, help=f"Куди зберегти (default: {TINY_MODEL_PATH})")
+    parser.add_argument("--d-model", type=int, default=64, help="Ширина мовної моделі та проекції (default: 64)")
+    parser.add_argument("--layers", type=int, default=1, help="Шарів енкодера й декодера (default: 1)")
+    parser.add_argument(
+        "--eos-bias",
+        type=float,
+        default=20.0,
+        help="Зсув логіта EOS, щоб generate завершувався одразу (default: 20, 0 - вимкнено)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Зерно випадкових ваг (default: 0)")
+    parser.add_argument("--check", metavar="IMAGE", default=None, help="Прогнати зображення через PassportOCREngine")
+    args = parser.parse_args()
+
+    if args.d_model % 16:
+        parser.error("--d-model must be a multiple of 16")
+
+    print("=" * 70)
+    print(" PASSPORT READER - TINY MODEL")
+    print("=" * 70)
+
+    try:
+        make_tiny_model(Path(args.source), Path(args.output), args.d_model, args.layers, args.eos_bias, args.seed)
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+
+    if args.check:
+        check_model(Path(args.output), args.check)
+
+
+if __name__ == "__main__":
+    main()
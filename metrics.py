@@ -0,0 +1,275 @@
+"""
+Метрики сервера у текстовому форматі Prometheus (GET /metrics).
+
+Легка власна реалізація без prometheus_client: лічильники, шкали (gauge) та
+гістограми з мітками, потокобезпечні (оновлюються з пулу потоків рушія й
+циклу подій). Шкали можуть мати функцію, що викликається під час збору
+(глибина черги, RSS процесу), - тоді їх не треба оновлювати вручну.
+"""
+
+import os
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import METRICS_LATENCY_BUCKETS, METRICS_BATCH_SIZE_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Спільна частина метрик: назва, опис, мітки, блокування."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"[ERROR] Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    """Монотонний лічильник."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Поточне значення; з callback - обчислюється під час збору."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        # Шкала без міток видна з нулем ще до першого оновлення
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+        self._callback = callback
+
+    def set_function(self, callback: Optional[Callable[[], Optional[float]]]) -> None:
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception:
+                value = None
+            return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Гістограма з кумулятивними кошиками (_bucket, _sum, _count)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # {мітки: [лічильники кошиків..., сума, кількість]}
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[position] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+
+        lines = []
+        for key, state in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    """Набір метрик, що віддається одним текстом."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics)
+
+
+def process_rss_bytes() -> Optional[float]:
+    """Поточна RSS процесу (байти) або None, якщо платформа не дає її виміряти."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "passport_http_requests_total",
+    "HTTP requests by route template, method and status code.",
+    ("route", "method", "status"),
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "passport_http_request_duration_seconds",
+    "HTTP request latency until the response headers (streams: until the first byte).",
+    ("route",),
+    METRICS_LATENCY_BUCKETS,
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "passport_stage_duration_seconds",
+    "Engine stage time per engine call (exclusive of nested stages).",
+    ("stage",),
+    METRICS_LATENCY_BUCKETS,
+))
+GENERATED_TOKENS = REGISTRY.register(Counter(
+    "passport_generated_tokens_total",
+    "Tokens generated by the language model, by decode stage.",
+    ("stage",),
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "passport_engine_batch_size",
+    "Images per engine call.",
+    (),
+    METRICS_BATCH_SIZE_BUCKETS,
+))
+ENGINE_WAITING = REGISTRY.register(Gauge(
+    "passport_engine_waiting",
+    "Engine calls waiting for a free engine slot (MAX_CONCURRENT_REQUESTS).",
+))
+ENGINE_BUSY = REGISTRY.register(Gauge(
+    "passport_engine_busy",
+    "Engine calls currently running.",
+))
+RESULTS = REGISTRY.register(Counter(
+    "passport_results_total",
+    "Processed documents by answering model tier and escalation.",
+    ("model_tier", "escalated"),
+))
+JOBS_QUEUED = REGISTRY.register(Gauge(
+    "passport_jobs_queued",
+    "Async jobs waiting in the queue.",
+))
+JOBS_RUNNING = REGISTRY.register(Gauge(
+    "passport_jobs_running",
+    "Async jobs being processed.",
+))
+RESULT_CACHE_REQUESTS = REGISTRY.register(Counter(
+    "passport_result_cache_requests_total",
+    "Face image link lookups by outcome (hit, miss).",
+    ("result",),
+))
+RESULT_CACHE_ITEMS = REGISTRY.register(Gauge(
+    "passport_result_cache_items",
+    "Face images held in the result cache.",
+))
+RESULT_CACHE_BYTES = REGISTRY.register(Gauge(
+    "passport_result_cache_bytes",
+    "Estimated memory held by the result cache (raw pixels or encoded bytes).",
+))
+PROCESS_RSS = REGISTRY.register(Gauge(
+    "passport_process_resident_memory_bytes",
+    "Resident set size of the server process.",
+    callback=process_rss_bytes,
+))
@@ -0,0 +1,226 @@
+"""
+Заміри часу підмодулів Florence-2 через forward-хуки (benchmark.py --module-timing).
+
+Хуки вішаються на стадії DaViT (вбудовування патчів і блоки), SpatialBlock і
+ChannelBlock, шари енкодера й декодера мовної моделі та lm_head. Час кожної
+групи накопичується між запитами разом з кількістю викликів, а підсумок за
+частинами моделі (vision tower / encoder / decoder / lm_head) показує,
+що домінує на цьому залізі.
+
+Florence-2 викликає vision tower не через forward, а через
+vision_tower.forward_features_unpool() у model._encode_image, тож хук на
+корені DaViT ніколи не спрацював би. Vision tower заміряється обгорткою
+_encode_image (DaViT + проекція, як етап vision_encode в inference.py), а
+якщо її немає - сумою стадій DaViT.
+
+Час групи інклюзивний: SpatialBlock входить і в свою стадію DaViT, тож
+рядки різних рівнів не додаються. Без synchronize час GPU-модулів - це
+лише час постановки ядер у чергу.
+"""
+
+import time
+import threading
+from typing import Any, Dict, List
+
+# Класи модулів, час яких збирається по назві класу
+MODULE_CLASSES = ("SpatialBlock", "ChannelBlock", "Florence2EncoderLayer", "Florence2DecoderLayer")
+
+# Група обгортки model._encode_image
+VISION_GROUP = "vision_tower"
+
+# Частини моделі для підсумку: назва -> ключ групи (не перетинаються між собою)
+MODEL_PARTS = {
+    "vision tower": VISION_GROUP,
+    "encoder": "Florence2Encoder",
+    "decoder": "Florence2Decoder",
+    "lm_head": "lm_head",
+}
+
+
+def _group_names(model) -> Dict[Any, str]:
+    """{модуль: ключ групи} для всіх модулів, що заміряються."""
+    groups = {}
+    for name, module in model.named_modules():
+        class_name = type(module).__name__
+        if class_name in MODULE_CLASSES:
+            groups[module] = class_name
+        elif class_name in ("Florence2Encoder", "Florence2Decoder"):
+            groups[module] = class_name
+        elif name.split(".")[-1] == "lm_head":
+            groups[module] = "lm_head"
+        elif class_name == "DaViT":
+            # Корінь DaViT не викликається через forward - лише його стадії:
+            # вбудовування патчів (convs[i]) + блоки (blocks[i])
+            for stage, conv in enumerate(getattr(module, "convs", [])):
+                groups[conv] = f"DaViT.stage{stage}.patch_embed"
+            for stage, blocks in enumerate(getattr(module, "blocks", [])):
+                groups[blocks] = f"DaViT.stage{stage}.blocks"
+    return groups
+
+
+class ModuleTimer:
+    """Накопичує час і кількість викликів груп підмодулів моделі."""
+
+    def __init__(self, synchronize: bool = True):
+        """
+        Args:
+            synchronize: Викликати torch.cuda.synchronize до і після кожного
+                модуля (точний час GPU ціною зупинки асинхронного конвеєра)
+        """
+        self._synchronize = None
+        if synchronize:
+            import torch
+            if torch.cuda.is_available():
+                self._synchronize = torch.cuda.synchronize
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._handles: List[Any] = []
+        self._wrapped_model = None
+        self._original_encode_image = None
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def attach(self, model) -> int:
+        """
+        Вішає хуки на підмодулі model.
+
+        Returns:
+            Кількість модулів з хуками
+
+        Raises:
+            ValueError: У моделі немає жодного модуля, що заміряється
+        """
+        groups = _group_names(model)
+        if not groups:
+            raise ValueError(f"[ERROR] No Florence-2 submodules found in {type(model).__name__}")
+
+        for module, group in groups.items():
+            self._handles.append(module.register_forward_pre_hook(self._pre_hook))
+            self._handles.append(module.register_forward_hook(self._make_post_hook(group)))
+
+        if callable(getattr(model, "_encode_image", None)):
+            self._wrap_encode_image(model)
+
+        print(f"[INFO] Module timing hooks attached to {len(groups)} module(s)")
+        return len(groups)
+
+    def _wrap_encode_image(self, model) -> None:
+        """Заміряє model._encode_image (разом з обгорткою етапу з inference.py)."""
+        encode_image = model._encode_image
+
+        def timed_encode_image(*args, **kwargs):
+            if self._synchronize is not None:
+                self._synchronize()
+            start = time.perf_counter()
+            try:
+                return encode_image(*args, **kwargs)
+            finally:
+                if self._synchronize is not None:
+                    self._synchronize()
+                self._record(VISION_GROUP, time.perf_counter() - start)
+
+        # Обгортка inference.py теж лежить в атрибуті екземпляра - зберігаємо її
+        self._original_encode_image = model.__dict__.get("_encode_image")
+        model._encode_image = timed_encode_image
+        self._wrapped_model = model
+
+    def detach(self) -> None:
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+        if self._wrapped_model is not None:
+            if self._original_encode_image is not None:
+                self._wrapped_model._encode_image = self._original_encode_image
+            else:
+                del self._wrapped_model._encode_image
+            self._wrapped_model = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.totals = {}
+            self.calls = {}
+
+    def _starts(self) -> Dict[int, List[float]]:
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = {}
+        return starts
+
+    def _pre_hook(self, module, args) -> None:
+        if self._synchronize is not None:
+            self._synchronize()
+        self._starts().setdefault(id(module), []).append(time.perf_counter())
+
+    def _make_post_hook(self, group: str):
+        def post_hook(module, args, output) -> None:
+            if self._synchronize is not None:
+                self._synchronize()
+            stack = self._starts().get(id(module))
+            if not stack:
+                return
+            self._record(group, time.perf_counter() - stack.pop())
+
+        return post_hook
+
+    def _record(self, group: str, elapsed: float) -> None:
+        with self._lock:
+            self.totals[group] = self.totals.get(group, 0.0) + elapsed
+            self.calls[group] = self.calls.get(group, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns:
+            {"modules": [{"name", "calls", "total_ms", "mean_ms"}, ...] (за спаданням часу),
+             "parts": {частина моделі: {"total_ms", "share"}},
+             "missing_parts": [частини, заміри яких жодного разу не спрацювали]}
+        """
+        with self._lock:
+            totals = dict(self.totals)
+            calls = dict(self.calls)
+
+        part_totals = {part: totals.get(group) for part, group in MODEL_PARTS.items()}
+        if part_totals["vision tower"] is None:
+            stages = [seconds for name, seconds in totals.items() if name.startswith("DaViT.stage")]
+            part_totals["vision tower"] = sum(stages) if stages else None
+        missing = [part for part, seconds in part_totals.items() if seconds is None]
+
+        modules = [
+            {
+                "name": name,
+                "calls": calls[name],
+                "total_ms": seconds * 1000,
+                "mean_ms": seconds * 1000 / calls[name],
+            }
+            for name, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+        parts_total = sum(seconds or 0.0 for seconds in part_totals.values())
+        parts = {
+            part: {
+                "total_ms": (seconds or 0.0) * 1000,
+                "share": (seconds or 0.0) / parts_total if parts_total > 0 else 0.0,
+            }
+            for part, seconds in part_totals.items()
+        }
+        return {"modules": modules, "parts": parts, "missing_parts": missing}
+
+
+def print_module_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 78)
+    print(" MODULE TIMING (forward hooks, inclusive)")
+    print("=" * 78)
+    print(f"  {'module':32s} {'calls':>8s} {'total':>12s} {'mean':>10s}")
+    for row in report["modules"]:
+        print(f"  {row['name']:32s} {row['calls']:>8d} {row['total_ms']:>10.1f}ms {row['mean_ms']:>8.2f}ms")
+
+    print()
+    for part, stats in report["parts"].items():
+        print(f"  {part:32s} {stats['total_ms']:>19.1f}ms {stats['share'] * 100:>8.1f}%")
+    print("=" * 78)
+    if report["missing_parts"]:
+        print(
+            f"[WARN] No timings recorded for: {', '.join(report['missing_parts'])} "
+            f"(hooks did not fire - model code differs from the expected Florence-2 layout?)"
+        )
@@ -0,0 +1,183 @@
+"""
+Захоплення torch.profiler на вимогу (POST /api/admin/profile).
+
+Адмін "взводить" профайлер на наступні N викликів рушія; кожен з них
+виконується всередині torch.profiler.profile (run), а після звільнення
+engine_gate (finish) в PROFILER_DIR/<capture_id>/ пишуться Chrome trace
+(request_NNN.json, відкривається в chrome://tracing або Perfetto) та таблиця
+операторів (summary.txt). Експорт великого trace не тримає слот рушія.
+
+Поки профайлер не взведено, виклик рушія перевіряє лише один атрибут
+(armed) - без імпорту torch і без накладних витрат.
+"""
+
+import time
+import uuid
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import PROFILER_DIR, PROFILER_MAX_REQUESTS, PROFILER_RECORD_SHAPES, PROFILER_SUMMARY_ROWS
+
+
+class ProfilerCapture:
+    """Захоплення профілю для наступних N викликів рушія."""
+
+    def __init__(self, output_root: Path = PROFILER_DIR):
+        self.output_root = Path(output_root)
+        # Читається без блокування на кожному виклику рушія
+        self.armed = False
+        self._lock = threading.Lock()
+        self._capture_id: Optional[str] = None
+        self._remaining = 0
+        self._captured = 0
+        self._busy = False
+        self._files: List[str] = []
+        # Знятий, але ще не експортований профіль потоку, що викликав run()
+        self._local = threading.local()
+
+    def arm(self, requests: int) -> Dict[str, Any]:
+        """
+        Взводить профайлер на наступні requests викликів рушія.
+
+        Raises:
+            ValueError: requests поза межами 1..PROFILER_MAX_REQUESTS
+            RuntimeError: Попереднє захоплення ще не завершене або torch не встановлено
+        """
+        if not 1 <= requests <= PROFILER_MAX_REQUESTS:
+            raise ValueError(f"[ERROR] requests must be between 1 and {PROFILER_MAX_REQUESTS}")
+        if importlib.util.find_spec("torch") is None:
+            raise RuntimeError("[ERROR] torch is not installed, profiling is unavailable")
+
+        with self._lock:
+            if self.armed:
+                raise RuntimeError(
+                    f"[ERROR] Capture {self._capture_id} is still running ({self._remaining} request(s) left)"
+                )
+            # Суфікс uuid: два arm в межах однієї секунди не пишуть в одну папку
+            self._capture_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            self._remaining = requests
+            self._captured = 0
+            self._files = []
+            self.armed = True
+
+        print(f"[INFO] Profiler armed for {requests} request(s): {self._output_dir()}")
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "armed": self.armed,
+                "capture_id": self._capture_id,
+                "remaining": self._remaining,
+                "captured": self._captured,
+                "output_dir": str(self._output_dir()) if self._capture_id else None,
+                "files": list(self._files),
+            }
+
+    def _output_dir(self) -> Path:
+        return self.output_root / (self._capture_id or "")
+
+    def _claim(self) -> Optional[Tuple[Path, int]]:
+        """Бере слот захоплення; None - нема слотів або профілюється інший виклик."""
+        with self._lock:
+            if not self.armed or self._remaining <= 0 or self._busy:
+                return None
+            self._remaining -= 1
+            self._busy = True
+            return self._output_dir(), self._captured + 1
+
+    def run(self, call: Callable[[], Any]) -> Any:
+        """
+        Виконує call() під профайлером, якщо є вільний слот, інакше просто call().
+
+        Кожне захоплення профілює лише один виклик за раз: torch.profiler
+        не вкладається, тож паралельні виклики (MAX_CONCURRENT_REQUESTS > 1)
+        виконуються без профілю й не витрачають слоти. Знятий профіль
+        експортує finish() з того ж потоку.
+        """
+        slot = self._claim()
+        if slot is None:
+            return call()
+        output_dir, index = slot
+
+        try:
+            import torch
+            from torch.profiler import profile, ProfilerActivity
+
+            cuda = torch.cuda.is_available()
+            activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if cuda else [])
+            prof = profile(activities=activities, record_shapes=PROFILER_RECORD_SHAPES)
+            prof.start()
+        except Exception as e:
+            # Профайлер не повинен ламати сам запит
+            print(f"[ERROR] Failed to start profiler: {e}")
+            self._cancel()
+            return call()
+
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            elapsed = time.perf_counter() - start
+            try:
+                prof.stop()
+            except Exception as e:
+                print(f"[ERROR] Failed to stop profiler: {e}")
+                prof = None
+            self._local.pending = (prof, output_dir, index, elapsed, cuda)
+
+    def finish(self) -> None:
+        """
+        Експортує профіль, знятий run() у цьому потоці, і звільняє слот захоплення.
+
+        Викликається після звільнення engine_gate; без знятого профілю - нічого не робить.
+        """
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            return
+        self._local.pending = None
+
+        prof, output_dir, index, elapsed, cuda = pending
+        files = []
+        try:
+            if prof is not None:
+                files = self._export(prof, output_dir, index, elapsed, cuda)
+        except Exception as e:
+            print(f"[ERROR] Failed to export profile: {e}")
+        finally:
+            self._release(files)
+
+    def _export(self, prof, output_dir: Path, index: int, elapsed: float, cuda: bool) -> List[str]:
+        """Пише Chrome trace і дописує таблицю операторів у summary.txt."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        trace_path = output_dir / f"request_{index:03d}.json"
+        prof.export_chrome_trace(str(trace_path))
+
+        sort_by = "cuda_time_total" if cuda else "cpu_time_total"
+        table = prof.key_averages().table(sort_by=sort_by, row_limit=PROFILER_SUMMARY_ROWS)
+        summary_path = output_dir / "summary.txt"
+        with open(summary_path, "a", encoding="utf-8") as f:
+            f.write(f"=== Request {index} ({elapsed * 1000:.1f} ms, sorted by {sort_by}) ===\n")
+            f.write(table + "\n\n")
+
+        print(f"[INFO] Profile saved: {trace_path}")
+        return [str(trace_path)]
+
+    def _cancel(self) -> None:
+        """Профайлер не запустився: захоплення скасовується, слот не зараховується."""
+        with self._lock:
+            self._busy = False
+            self._remaining = 0
+            self.armed = False
+        print(f"[ERROR] Profiler capture {self._capture_id} cancelled after {self._captured} request(s)")
+
+    def _release(self, files: List[str]) -> None:
+        with self._lock:
+            self._busy = False
+            self._captured += 1
+            self._files.extend(files)
+            if self._remaining <= 0:
+                self.armed = False
+                print(f"[INFO] Profiler capture {self._capture_id} finished: {self._output_dir()}")
@@ -0,0 +1,328 @@
+"""
+Захист точності для режимів прискорення: порівняння з еталонними (golden) результатами.
+
+Кожен режим (EVAL_MODES) - набір "ручок швидкості": рівень якості (QUALITY_LEVELS),
+рівень моделі (MODEL_TIERS), швидкий детектор обличчя та шаблони документів
+(layouts.py). Кожна ручка задається в режимі явно, незалежно від config.py.
+Режим проганяється по зображеннях з data/ і порівнюється з еталоном -
+результатами режиму "high" (large, 768px, детектор за замовчуванням, без
+шаблонів): збіг номера паспорта, IoU рамки обличчя, нормована відстань
+редагування тексту OCR (CER) та прискорення. Режими, рівень моделі яких не
+завантажено, пропускаються.
+
+Еталон можна записати один раз (--record) і надалі порівнювати з файлом -
+точність рахується відносно файлу, а час еталонного режиму все одно
+заміряється локально, бо час з файлу залежить від машини, на якій його
+записали (умови запису зберігаються у файлі в "meta"). З порогами (--min-number-match, --min-iou,
+--max-cer) скрипт завершується з кодом 1, якщо якийсь режим їх порушив.
+
+Використання:
+    python quality_eval.py                                  # Всі режими, еталон рахується на льоту
+    python quality_eval.py --record                         # Записати golden/results.json
+    python quality_eval.py --modes fast base --min-number-match 1.0 --max-cer 0.05
+    python quality_eval.py --data-dir D:\\Scans --modes medium
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PROJECT_ROOT, QUALITY_LEVELS, SUPPORTED_FORMATS, MODEL_TIERS, FACE_DETECTOR
+
+# Режими: tier - рівень моделі, quality - рівень якості, face_detector - ключ з FACE_DETECTORS
+# або None, layout_templates - рамка обличчя з шаблону документа перед детектором
+EVAL_MODES = {
+    "high": {"tier": "large", "quality": "high", "face_detector": FACE_DETECTOR, "layout_templates": False},
+    "medium": {"tier": "large", "quality": "medium", "face_detector": FACE_DETECTOR, "layout_templates": False},
+    "fast": {"tier": "large", "quality": "fast", "face_detector": FACE_DETECTOR, "layout_templates": False},
+    "base": {"tier": "base", "quality": "high", "face_detector": FACE_DETECTOR, "layout_templates": False},
+    "base-fast": {"tier": "base", "quality": "fast", "face_detector": FACE_DETECTOR, "layout_templates": False},
+    "templates": {"tier": "large", "quality": "high", "face_detector": FACE_DETECTOR, "layout_templates": True},
+    "templates-fast": {"tier": "large", "quality": "fast", "face_detector": FACE_DETECTOR, "layout_templates": True},
+    "florence-face": {"tier": "large", "quality": "high", "face_detector": None, "layout_templates": False},
+}
+
+# Еталонний режим (поведінка сервера за замовчуванням без ескалації)
+REFERENCE_MODE = "high"
+
+DEFAULT_GOLDEN_PATH = PROJECT_ROOT / "golden" / "results.json"
+
+
+def box_iou(box_a: Optional[Tuple[int, int, int, int]], box_b: Optional[Tuple[int, int, int, int]]) -> float:
+    """IoU двох рамок (x1, y1, x2, y2). Дві відсутні рамки вважаються збігом."""
+    if box_a is None and box_b is None:
+        return 1.0
+    if box_a is None or box_b is None:
+        return 0.0
+
+    x1 = max(box_a[0], box_b[0])
+    y1 = max(box_a[1], box_b[1])
+    x2 = min(box_a[2], box_b[2])
+    y2 = min(box_a[3], box_b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Відстань Левенштейна (вставка, видалення, заміна символу)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def char_error_rate(text: Optional[str], reference: Optional[str]) -> float:
+    """Відстань редагування, нормована на довжину еталонного тексту (0 - збіг)."""
+    text, reference = text or "", reference or ""
+    if not reference:
+        return 0.0 if not text else 1.0
+    return edit_distance(text, reference) / len(reference)
+
+
+def find_images(data_dir: Path) -> List[Path]:
+    if not data_dir.is_dir():
+        return []
+    return sorted(p for p in data_dir.iterdir() if p.suffix.lower() in SUPPORTED_FORMATS)
+
+
+def missing_tier(mode: str) -> Optional[str]:
+    """Рівень моделі режиму, якщо його локальна копія не завантажена."""
+    tier = EVAL_MODES[mode]["tier"]
+    return None if Path(MODEL_TIERS[tier]["path"]).exists() else tier
+
+
+def load_golden(path: Path) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Читає golden-файл.
+
+    Returns:
+        (результати по зображеннях, умови запису "meta"; {} для старих файлів без meta)
+    """
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if "results" in data and isinstance(data.get("meta"), dict):
+        return data["results"], data["meta"]
+    return data, {}
+
+
+def run_mode(mode: str, images: List[Path], engines: Dict[Tuple[str, Optional[str], bool], Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Проганяє зображення в режимі mode.
+
+    Returns:
+        {ім'я файлу: {"passport_number", "face_box", "ocr_text", "processing_time"}}
+    """
+    from inference import PassportOCREngine
+
+    settings = EVAL_MODES[mode]
+    key = (settings["tier"], settings["face_detector"], settings["layout_templates"])
+    if key not in engines:
+        engines[key] = PassportOCREngine(
+            model_path=MODEL_TIERS[settings["tier"]]["path"],
+            face_detector=settings["face_detector"],
+            layout_templates=settings["layout_templates"],
+        )
+    engine = engines[key]
+
+    # Прогрів без заміру: перший виклик платить за CUDA-контекст, автотюнінг
+    # ядер і кеші, тож не повинен потрапляти в середній час режиму
+    engine.process_image(str(images[0]), quality=settings["quality"])
+
+    results = {}
+    for image_path in images:
+        result = engine.process_image(str(image_path), quality=settings["quality"])
+        results[image_path.name] = {
+            "passport_number": result["passport_number"],
+            "face_box": list(result["face_box"]) if result["face_box"] else None,
+            "ocr_text": result["ocr_text"],
+            "processing_time": result["processing_time"],
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], golden: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """Метрики режиму відносно еталону (лише спільні зображення)."""
+    names = [name for name in results if name in golden]
+    count = len(names) or 1
+    return {
+        "images": len(names),
+        "avg_time": sum(results[name]["processing_time"] for name in names) / count,
+        "number_match": sum(
+            1 for name in names if results[name]["passport_number"] == golden[name]["passport_number"]
+        ) / count,
+        "face_iou": sum(box_iou(results[name]["face_box"], golden[name]["face_box"]) for name in names) / count,
+        "ocr_cer": sum(
+            char_error_rate(results[name]["ocr_text"], golden[name]["ocr_text"]) for name in names
+        ) / count,
+    }
+
+
+def print_table(
+    rows: Dict[str, Dict[str, float]],
+    reference_time: float,
+    source: str,
+    failures: Dict[str, List[str]],
+    skipped: Dict[str, str],
+) -> None:
+    print("\n" + "=" * 102)
+    print(" SPEED MODES - ACCURACY vs GOLDEN OUTPUTS")
+    print("=" * 102)
+    print(f"  Reference: {source}\n")
+    print(
+        f"  {'mode':14s} {'tier':6s} {'input':>7s} {'detector':>9s} {'templates':>9s} {'avg time':>9s} "
+        f"{'speedup':>8s} {'number':>7s} {'face IoU':>9s} {'OCR CER':>8s}"
+    )
+
+    for mode, metrics in rows.items():
+        settings = EVAL_MODES[mode]
+        speedup = reference_time / metrics["avg_time"] if metrics["avg_time"] > 0 else 0.0
+        verdict = f"  FAIL: {', '.join(failures[mode])}" if failures.get(mode) else ""
+        print(
+            f"  {mode:14s} {settings['tier']:6s} {QUALITY_LEVELS[settings['quality']]:>5d}px "
+            f"{settings['face_detector'] or 'florence':>9s} {'on' if settings['layout_templates'] else 'off':>9s} "
+            f"{metrics['avg_time']:>8.2f}s {speedup:>7.2f}x "
+            f"{metrics['number_match'] * 100:>6.1f}% {metrics['face_iou']:>9.3f} {metrics['ocr_cer']:>8.3f}{verdict}"
+        )
+
+    for mode, reason in skipped.items():
+        print(f"  {mode:14s} SKIPPED: {reason}")
+
+    print("=" * 102)
+
+
+def main():
+    """Головна функція."""
+    parser = argparse.ArgumentParser(description="Passport Reader - golden-output accuracy guard")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=str(PROJECT_ROOT / "data"),
+        help="Папка з зображеннями (default: data/)"
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(EVAL_MODES),
+        default=list(EVAL_MODES),
+        help="Режими для порівняння (default: всі)"
+    )
+    parser.add_argument(
+        "--golden",
+        type=str,
+        default=str(DEFAULT_GOLDEN_PATH),
+        help="Файл еталонних результатів (default: golden/results.json)"
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help=f"Прогнати режим '{REFERENCE_MODE}' і записати його результати як еталон"
+    )
+    parser.add_argument("--min-number-match", type=float, default=None, help="Мінімальна частка збігу номера (0-1)")
+    parser.add_argument("--min-iou", type=float, default=None, help="Мінімальний середній IoU рамки обличчя")
+    parser.add_argument("--max-cer", type=float, default=None, help="Максимальний середній CER тексту OCR")
+    args = parser.parse_args()
+
+    images = find_images(Path(args.data_dir))
+    if not images:
+        print(f"[ERROR] No images found in {args.data_dir}")
+        sys.exit(1)
+
+    engines: Dict[Tuple[str, Optional[str], bool], Any] = {}
+    golden_path = Path(args.golden)
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    skipped = {}
+    for mode in args.modes:
+        tier = missing_tier(mode)
+        if tier is not None:
+            skipped[mode] = f"model tier '{tier}' not downloaded ({MODEL_TIERS[tier]['path']})"
+            print(f"[WARN] Mode '{mode}' skipped: {skipped[mode]}")
+
+    if args.record or not golden_path.exists():
+        tier = missing_tier(REFERENCE_MODE)
+        if tier is not None:
+            print(f"[ERROR] Reference mode '{REFERENCE_MODE}' needs model tier '{tier}'. Execute: python model_setup.py")
+            sys.exit(1)
+        results[REFERENCE_MODE] = run_mode(REFERENCE_MODE, images, engines)
+        golden = results[REFERENCE_MODE]
+        source = f"mode '{REFERENCE_MODE}' ({len(images)} images, {args.data_dir})"
+        if args.record:
+            engine = next(iter(engines.values()))
+            meta = {
+                "mode": REFERENCE_MODE,
+                **EVAL_MODES[REFERENCE_MODE],
+                "device": getattr(engine, "device", None),
+                "host": platform.node(),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            golden_path.parent.mkdir(parents=True, exist_ok=True)
+            golden_path.write_text(
+                json.dumps({"meta": meta, "results": golden}, indent=2, ensure_ascii=False), encoding="utf-8"
+            )
+            print(f"[INFO] Golden results saved: {golden_path}")
+    else:
+        golden, meta = load_golden(golden_path)
+        source = f"{golden_path} ({len(golden)} images)"
+        if meta:
+            source += f", recorded on {meta.get('host')} ({meta.get('device')}) at {meta.get('recorded_at')}"
+        missing = [image.name for image in images if image.name not in golden]
+        if missing:
+            print(f"[WARN] Not in golden results, skipped: {', '.join(missing)}")
+
+    modes = [mode for mode in args.modes if mode not in skipped]
+    for mode in modes:
+        if mode not in results:
+            results[mode] = run_mode(mode, images, engines)
+
+    # Прискорення рахується відносно еталонного режиму, заміряного на цій же машині:
+    # час з golden-файлу залежить від заліза, на якому його записали
+    if REFERENCE_MODE not in results and missing_tier(REFERENCE_MODE) is None:
+        results[REFERENCE_MODE] = run_mode(REFERENCE_MODE, images, engines)
+    if REFERENCE_MODE in results:
+        reference_times = [result["processing_time"] for result in results[REFERENCE_MODE].values()]
+    else:
+        print(f"[WARN] Reference mode '{REFERENCE_MODE}' not available locally, speedup uses golden file timings")
+        reference_times = [golden[image.name]["processing_time"] for image in images if image.name in golden]
+    reference_time = sum(reference_times) / max(len(reference_times), 1)
+
+    rows = {mode: compare(results[mode], golden) for mode in modes}
+
+    failures: Dict[str, List[str]] = {}
+    for mode, metrics in rows.items():
+        failed = []
+        if args.min_number_match is not None and metrics["number_match"] < args.min_number_match:
+            failed.append("number")
+        if args.min_iou is not None and metrics["face_iou"] < args.min_iou:
+            failed.append("face IoU")
+        if args.max_cer is not None and metrics["ocr_cer"] > args.max_cer:
+            failed.append("OCR CER")
+        if failed:
+            failures[mode] = failed
+
+    print_table(rows, reference_time, source, failures, skipped)
+    for engine in engines.values():
+        engine.cleanup()
+
+    if failures:
+        print(f"[ERROR] Accuracy thresholds violated by: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
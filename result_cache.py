@@ -0,0 +1,109 @@
+"""
+Короткоживучий кеш кадрованих облич у пам'яті.
+
+Замість Base64 у JSON відповідь містить посилання /api/results/{id}/face.jpg
+(або .webp), а саме зображення віддається окремим бінарним запитом. Кодування
+виконується лише при першому зверненні - якщо клієнт не забрав фото,
+кодування не відбувається зовсім. Після кодування зберігаються лише байти.
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+from config import FACE_IMAGE_FORMAT, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ITEMS, RESULT_CACHE_MAX_BYTES
+from image_encoding import encode_image
+
+
+class _Entry:
+    __slots__ = ("image", "image_format", "data", "expires_at", "size")
+
+    def __init__(self, image: Image.Image, image_format: str, expires_at: float):
+        self.image = image
+        self.image_format = image_format
+        self.data: Optional[bytes] = None
+        self.expires_at = expires_at
+        # Пам'ять незакодованого зображення; після кодування - розмір байтів
+        self.size = image.width * image.height * len(image.getbands())
+
+
+class ResultCache:
+    """
+    Кеш з TTL і обмеженнями кількості та пам'яті (найстаріші видаляються першими);
+    потокобезпечний (рушій працює в пулі потоків).
+
+    Найновіший запис лишається, навіть якщо сам перевищує max_bytes, - інакше
+    щойно видане посилання одразу б вело на 404.
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULT_CACHE_TTL_SECONDS,
+        max_items: int = RESULT_CACHE_MAX_ITEMS,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            over_limit = len(self._entries) > self.max_items or (
+                self._bytes > self.max_bytes and len(self._entries) > 1
+            )
+            if entry.expires_at > now and not over_limit:
+                break
+            del self._entries[key]
+            self._bytes -= entry.size
+
+    def put(self, image: Image.Image, image_format: str = FACE_IMAGE_FORMAT) -> str:
+        """Зберігає зображення (ще не закодоване) і повертає ідентифікатор результату."""
+        result_id = uuid.uuid4().hex
+        now = time.monotonic()
+        entry = _Entry(image, image_format, now + self.ttl)
+        with self._lock:
+            self._entries[result_id] = entry
+            self._bytes += entry.size
+            self._evict(now)
+        return result_id
+
+    def get(self, result_id: str, image_format: str) -> Optional[bytes]:
+        """
+        Закодоване фото або None, якщо його немає, минув TTL
+        чи фото збережене в іншому форматі.
+        """
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._entries.get(result_id)
+            if entry is None or entry.image_format != image_format:
+                return None
+            if entry.data is not None:
+                return entry.data
+            image = entry.image
+
+        data = encode_image(image, image_format)
+
+        with self._lock:
+            if entry.data is None:
+                entry.data = data
+                entry.image = None
+                if self._entries.get(result_id) is entry:
+                    self._bytes += len(data) - entry.size
+                entry.size = len(data)
+        return data
+
+    @property
+    def nbytes(self) -> int:
+        """Пам'ять, що займають записи кешу (оцінка, байти)."""
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
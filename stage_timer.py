@@ -0,0 +1,64 @@
+"""
+Заміри часу етапів обробки (preprocess, vision_encode, ocr_decode, ...).
+
+Етапи можуть бути вкладеними: vision_encode виконується всередині generate
+(ocr_decode/grounding_decode). Кожен етап отримує власний (exclusive) час -
+без часу вкладених етапів, тож сума етапів дорівнює загальному часу.
+"""
+
+import time
+import importlib.util
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class StageTimer:
+    """Накопичує час етапів та кількість згенерованих токенів."""
+
+    def __init__(self, synchronize: bool = False):
+        """
+        Args:
+            synchronize: Викликати torch.cuda.synchronize на межах етапів
+                (точні заміри GPU-етапів ціною зупинки асинхронного конвеєра);
+                без torch (синтетичний рушій) ігнорується
+        """
+        self._synchronize = None
+        if synchronize and importlib.util.find_spec("torch") is not None:
+            import torch
+            if torch.cuda.is_available():
+                self._synchronize = torch.cuda.synchronize
+
+        self.timings: Dict[str, float] = {}
+        self.tokens = 0
+        self.stage_tokens: Dict[str, int] = {}
+        self._stack: List[List] = []
+
+    def reset(self) -> None:
+        self.timings = {}
+        self.tokens = 0
+        self.stage_tokens = {}
+        self._stack = []
+
+    def add_tokens(self, count: int, stage: Optional[str] = None) -> None:
+        """Згенеровані токени; stage - етап декодування (ocr_decode, grounding_decode)."""
+        self.tokens += count
+        if stage is not None:
+            self.stage_tokens[stage] = self.stage_tokens.get(stage, 0) + count
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замір етапу name (секунди, без вкладених етапів)."""
+        if self._synchronize is not None:
+            self._synchronize()
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            if self._synchronize is not None:
+                self._synchronize()
+            elapsed = time.perf_counter() - frame[0]
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - frame[1]
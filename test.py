@@ -7,6 +7,8 @@
     python test.py                    # Базова перевірка
     python test.py --endpoint-test    # Тестування endpoints
     python test.py --full             # Повне тестування з прикладом зображення
+    python test.py --pipeline         # Мініатюрна модель: process_image та process_batch на data/
+    python test.py --fake-api         # API на синтетичному рушії: batch, jobs, stream, metrics
 """
 
 import sys
@@ -225,6 +227,158 @@ def test_api_endpoints():
     return all(results) if results else None
 
 
+def test_tiny_model_pipeline():
+    """Наскрізний прогін PassportOCREngine на мініатюрній моделі (process_image та process_batch)."""
+    print("\nТестування конвеєра на мініатюрній моделі...")
+
+    images = sorted((Path(__file__).parent / "data").glob("*.jpeg"))[:3]
+    if not images:
+        print("  Зображення в data/ не знайдено")
+        return False
+
+    try:
+        import tempfile
+        from PIL import Image
+        from config import MODEL_LOCAL_PATH
+        from make_tiny_model import make_tiny_model
+        from inference import PassportOCREngine
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = Path(tmp) / "florence2-tiny"
+            # Помірний зсув EOS: послідовності батчу завершуються на різних кроках,
+            # тож generate доповнює коротші <pad> - це перевіряє OCR батчу нижче
+            make_tiny_model(Path(MODEL_LOCAL_PATH), model_path, d_model=64, layers=1, eos_bias=3.0, seed=0)
+
+            engine = PassportOCREngine(model_path=str(model_path), face_detector=None)
+            try:
+                result = engine.process_image(str(images[0]))
+                expected = {"passport_number", "ocr_text", "image", "face_box", "face_source", "processing_time"}
+                missing = expected - set(result)
+                if missing or result["ocr_text"] is None:
+                    print(f"  process_image - FAIL (missing: {sorted(missing)}, ocr_text: {result.get('ocr_text')!r})")
+                    return False
+                print(f"  {'process_image':30s} - OK ({result['processing_time']:.2f}s)")
+
+                loaded = [Image.open(path).convert("RGB") for path in images]
+                batch = engine.process_batch(
+                    loaded, [path.name for path in images], quality="fast", tasks=("number", "face_box")
+                )
+                if len(batch) != len(images) or any(item["image"] is not None for item in batch):
+                    print(f"  process_batch - FAIL ({len(batch)} result(s) for {len(images)} image(s))")
+                    return False
+                print(f"  {'process_batch':30s} - OK ({len(batch)} images)")
+
+                # Текст OCR зображення не залежить від того, чи оброблялося воно в батчі
+                batched = engine.process_batch(loaded, [path.name for path in images], tasks=("ocr_text",))
+                for path, image, item in zip(images, loaded, batched):
+                    single = engine.process_batch([image], [path.name], tasks=("ocr_text",))[0]
+                    if item["ocr_text"] != single["ocr_text"] or "<pad>" in item["ocr_text"]:
+                        print(f"  batched OCR text - FAIL ({path.name}: {item['ocr_text']!r} != {single['ocr_text']!r})")
+                        return False
+                print(f"  {'batched OCR text == single':30s} - OK")
+            finally:
+                engine.cleanup()
+
+        return True
+
+    except FileNotFoundError as e:
+        print(f"  {e}")
+        return False
+
+    except Exception as e:
+        print(f"  Помилка конвеєра: {e}")
+        return False
+
+
+def test_api_fake_engine():
+    """Тестує batch, jobs, stream і metrics через TestClient на синтетичному рушії (без torch і моделі)."""
+    print("\nТестування API на синтетичному рушії...")
+
+    try:
+        import time
+        import tempfile
+        import functools
+        from fastapi.testclient import TestClient
+        import api
+        from engine_base import TieredOCREngine
+        from job_store import JobStore
+    except ImportError as e:
+        print(f"  {e}. Пропущено.")
+        print("     Install: pip install fastapi httpx")
+        return None
+
+    images = [str(path.absolute()) for path in sorted((Path(__file__).parent / "data").glob("*.jpeg"))[:3]]
+    if not images:
+        print("  Зображення в data/ не знайдено")
+        return False
+
+    results = []
+    original_engine, original_store = api.TieredOCREngine, api.JobStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Синтетичний рушій і окрема база задач замість робочих
+        api.TieredOCREngine = functools.partial(TieredOCREngine, backend="fake")
+        api.JobStore = functools.partial(JobStore, Path(tmp) / "jobs.sqlite3")
+        try:
+            with TestClient(api.app) as client:
+                # Пакет: по рядку NDJSON на кожен файл
+                response = client.post(
+                    "/api/process/batch", json={"file_paths": images, "tasks": ["number", "face_box"]}
+                )
+                lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+                ok = (
+                    response.status_code == 200
+                    and sorted(line["index"] for line in lines) == list(range(len(images)))
+                    and all(line["status"] == "success" for line in lines)
+                )
+                print(f"  {'Batch (NDJSON)':30s} - {'OK' if ok else 'FAIL'} ({response.status_code}, {len(lines)} lines)")
+                results.append(ok)
+
+                # Черга задач: 202, далі опитування до done
+                response = client.post("/api/jobs", json={"file_path": images[0], "tasks": ["number"]})
+                job = response.json() if response.status_code == 202 else {}
+                deadline = time.time() + 10
+                while job.get("job_id") and job.get("status") not in ("done", "error") and time.time() < deadline:
+                    time.sleep(0.1)
+                    job = dict(client.get(f"/api/jobs/{job['job_id']}").json(), job_id=job["job_id"])
+                ok = job.get("status") == "done" and "result" in job
+                print(f"  {'Jobs':30s} - {'OK' if ok else 'FAIL'} (status: {job.get('status')})")
+                results.append(ok)
+
+                # Незавантажений рівень моделі відхиляється одразу, а не падає в задачі
+                response = client.post("/api/jobs", json={"file_path": images[0], "model_tier": "missing"})
+                ok = response.status_code == 400
+                print(f"  {'Jobs: unknown model_tier':30s} - {'OK' if ok else 'FAIL'} ({response.status_code})")
+                results.append(ok)
+
+                # Потік подій: number одразу після OCR, result - останнім
+                response = client.get(
+                    "/api/process/stream", params={"file_path": images[0], "tasks": ["number", "face_box"]}
+                )
+                events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+                ok = response.status_code == 200 and "number" in events and events[-1:] == ["result"]
+                print(f"  {'Stream (SSE)':30s} - {'OK' if ok else 'FAIL'} ({', '.join(dict.fromkeys(events))})")
+                results.append(ok)
+
+                # Метрики: запити вище потрапили в лічильник за шаблоном маршруту
+                response = client.get("/metrics")
+                ok = response.status_code == 200 and 'route="/api/process/batch"' in response.text
+                if response.status_code == 404:
+                    ok = None
+                print(f"  {'Metrics':30s} - {'SKIPPED' if ok is None else 'OK' if ok else 'FAIL'} ({response.status_code})")
+                if ok is not None:
+                    results.append(ok)
+
+        except Exception as e:
+            print(f"  Помилка API: {e}")
+            results.append(False)
+
+        finally:
+            api.TieredOCREngine, api.JobStore = original_engine, original_store
+
+    return all(results)
+
+
 def run_basic_tests():
     """Запускає базові тести."""
     print("=" * 80)
@@ -272,6 +426,12 @@ def main():
     parser = argparse.ArgumentParser(description="Passport Reader API - Test Suite")
     parser.add_argument("--endpoint-test", action="store_true", help="Тестувати API endpoints")
     parser.add_argument("--full", action="store_true", help="Повне тестування")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Прогін PassportOCREngine на мініатюрній моделі (потребує models/florence2-large)"
+    )
+    parser.add_argument("--fake-api", action="store_true", help="batch/jobs/stream/metrics на синтетичному рушії")
     
     args = parser.parse_args()
     
@@ -284,10 +444,14 @@ def main():
         if endpoint_results is False:
             sys.exit(1)
     
-    # Повне тестування (потребує запущеного сервера + приклад зображення)
-    if args.full:
-        print("\n  Повне тестування не реалізовано")
-        print("    (потребує прикладу зображення паспорта)")
+    # Конвеєр і API на зображеннях з data/ (сервер не потрібен)
+    if args.pipeline or args.full:
+        if not test_tiny_model_pipeline():
+            sys.exit(1)
+
+    if args.fake_api or args.full:
+        if test_api_fake_engine() is False:
+            sys.exit(1)
     
     # Вихід
     sys.exit(0 if basic_pass else 1)
@@ -0,0 +1,173 @@
+"""
+Читання завантажених файлів з тіла HTTP-запиту в пам'ять.
+
+Тіло читається потоком (request.stream()), розмір перевіряється на кожному
+шматку, тож завеликий файл відхиляється без повного прийому. Multipart
+розбирається callback-парсером python-multipart прямо в буфер -
+на відміну від UploadFile, без SpooledTemporaryFile на диску.
+"""
+
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from config import MAX_FILE_SIZE_MB
+
+MAX_UPLOAD_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+
+# Запас на заголовки частин multipart понад розмір самих файлів
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# (ім'я файлу, вміст)
+UploadedFile = Tuple[str, bytes]
+
+
+class PayloadTooLargeError(ValueError):
+    """Тіло запиту перевищує MAX_FILE_SIZE_MB."""
+
+
+def _too_large() -> PayloadTooLargeError:
+    return PayloadTooLargeError(f"[ERROR] Upload exceeds {MAX_FILE_SIZE_MB} MB limit")
+
+
+def check_content_length(headers, max_bytes: int = MAX_UPLOAD_BYTES) -> None:
+    """Відхиляє запит ще до читання тіла, якщо Content-Length завеликий."""
+    length = headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise _too_large()
+
+
+async def read_octet_stream(stream: AsyncIterator[bytes], max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Читає сире тіло (application/octet-stream) з обмеженням розміру.
+
+    Raises:
+        PayloadTooLargeError: Тіло більше за max_bytes
+        ValueError: Порожнє тіло
+    """
+    buffer = bytearray()
+    async for chunk in stream:
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise _too_large()
+
+    if not buffer:
+        raise ValueError("[ERROR] Empty request body")
+    return bytes(buffer)
+
+
+class _MultipartCollector:
+    """Збирає файлові частини multipart у пам'ять (поля без filename ігноруються)."""
+
+    def __init__(self):
+        self.files: List[UploadedFile] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._filename = None
+        self._data = bytearray()
+
+    def on_part_begin(self) -> None:
+        self._filename = None
+        self._data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            filename = options.get(b"filename")
+            if filename is not None:
+                self._filename = filename.decode("utf-8", errors="replace") or "upload"
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._filename is not None:
+            self._data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._filename is not None:
+            self.files.append((self._filename, bytes(self._data)))
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+
+async def read_multipart(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_files: int = 1,
+    max_total: Optional[int] = None,
+) -> List[UploadedFile]:
+    """
+    Розбирає multipart/form-data потоком і повертає всі файлові частини.
+
+    Ліміт max_bytes діє на кожен файл, max_total (default: max_bytes * max_files) -
+    на все тіло.
+
+    Raises:
+        PayloadTooLargeError: Файл або тіло завеликі
+        ValueError: Немає boundary, файлів або файлів більше за max_files
+    """
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("[ERROR] Multipart boundary is missing")
+
+    if max_total is None:
+        max_total = max_bytes * max_files
+
+    collector = _MultipartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_total + MULTIPART_OVERHEAD_BYTES:
+            raise _too_large()
+        parser.write(chunk)
+        if len(collector._data) > max_bytes:
+            raise _too_large()
+        if len(collector.files) > max_files:
+            raise ValueError(f"[ERROR] Too many files in one request (max {max_files})")
+    parser.finalize()
+
+    if not collector.files:
+        raise ValueError("[ERROR] No file parts in multipart body")
+    return collector.files
+
+
+async def read_upload(request, max_files: int = 1, max_total: Optional[int] = None) -> List[UploadedFile]:
+    """
+    Файли з тіла запиту FastAPI/Starlette.
+
+    multipart/form-data - усі частини з filename; інше (application/octet-stream,
+    image/*) - одне зображення, ім'я береться з заголовка X-Filename.
+
+    Raises:
+        PayloadTooLargeError: Перевищено MAX_FILE_SIZE_MB
+        ValueError: Порожнє або некоректне тіло
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        return await read_multipart(request.stream(), content_type, max_files=max_files, max_total=max_total)
+
+    check_content_length(request.headers)
+    data = await read_octet_stream(request.stream())
+    return [(request.headers.get("x-filename", "upload"), data)]
@@ -0,0 +1,433 @@
+"""
+Спостереження за "гарячою" папкою сканера без зовнішнього поллера.
+
+Нові та змінені файли виявляються через inotify (Linux, пакет inotify_simple)
+або, якщо він недоступний чи папка мережева, через періодичний індекс mtime.
+Файл береться в обробку лише після того, як його розмір і mtime не
+змінювались WATCH_DEBOUNCE_SECONDS (сканер ще дописує файл). Усі готові
+файли обробляються одним батчем у TieredOCREngine цього ж процесу, а
+результати пишуться в JSONL або в sidecar-файл <скан>.json поруч зі сканом.
+
+Використання:
+    python watcher.py /srv/scans --output watch_results.jsonl
+    python watcher.py /srv/scans --sink sidecar
+    python watcher.py //nas/scans --poll --include-existing
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    SUPPORTED_FORMATS, QUALITY_LEVELS, DEFAULT_QUALITY, PROCESS_TASKS,
+    BATCH_SIZE, BATCH_DEFAULT_TASKS, MODEL_TIERS,
+    WATCH_DEBOUNCE_SECONDS, WATCH_POLL_INTERVAL, WATCH_SINK,
+)
+from batch import run_batch
+
+# Підпис версії файлу: (mtime_ns, size)
+Signature = Tuple[int, int]
+
+
+def _is_supported(name: str) -> bool:
+    return name.lower().endswith(SUPPORTED_FORMATS) and not name.startswith(".")
+
+
+def _signature(path: Path) -> Optional[Signature]:
+    """Підпис файлу або None, якщо файл зник."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def scan_directory(root: Path) -> Dict[Path, Signature]:
+    """Рекурсивний індекс підтримуваних файлів: шлях -> підпис."""
+    index = {}
+    stack = [root]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file() and _is_supported(entry.name):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                index[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return index
+
+
+class PollingWatcher:
+    """
+    Виявлення змін порівнянням індексу mtime між скануваннями.
+
+    Дерево сканується не частіше, ніж раз на interval, навіть якщо changes()
+    викликається частіше (цикл watch прокидається і для debounce).
+    """
+
+    name = "poll"
+
+    def __init__(self, root: Path, interval: float = WATCH_POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.index = scan_directory(root)
+        self._next_scan = time.monotonic() + interval
+
+    def existing(self) -> List[Path]:
+        return list(self.index)
+
+    def changes(self, timeout: float) -> List[Path]:
+        """Чекає до timeout секунд і повертає нові або змінені файли (порожньо до наступного сканування)."""
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+
+        current = scan_directory(self.root)
+        self._next_scan = time.monotonic() + self.interval
+        changed = [path for path, sig in current.items() if self.index.get(path) != sig]
+        self.index = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Виявлення змін через inotify (рекурсивно, нові підпапки додаються на льоту).
+
+    Примітка: inotify не бачить записів, зроблених іншим хостом на NFS/SMB,
+    для мережевих папок потрібен --poll.
+    """
+
+    name = "inotify"
+
+    def __init__(self, root: Path):
+        """
+        Raises:
+            ImportError: inotify_simple не встановлено (або не Linux)
+        """
+        from inotify_simple import INotify, flags
+
+        self.root = root
+        self._flags = flags
+        self._inotify = INotify()
+        self._mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.MODIFY
+        self._dirs: Dict[int, Path] = {}
+        self._existing: List[Path] = []
+
+        for dirpath, _, filenames in os.walk(root):
+            self._add_watch(Path(dirpath))
+            self._existing.extend(Path(dirpath) / name for name in filenames if _is_supported(name))
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._inotify.add_watch(str(directory), self._mask)
+        self._dirs[wd] = directory
+
+    def existing(self) -> List[Path]:
+        return list(self._existing)
+
+    def changes(self, timeout: float) -> List[Path]:
+        """Чекає подій до timeout секунд."""
+        changed = []
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            directory = self._dirs.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = directory / event.name
+
+            if event.mask & self._flags.ISDIR:
+                if event.mask & (self._flags.CREATE | self._flags.MOVED_TO):
+                    self._add_watch(path)
+                    changed.extend(scan_directory(path))
+            elif _is_supported(event.name):
+                changed.append(path)
+        return changed
+
+    def close(self) -> None:
+        self._inotify.close()
+
+
+def create_watcher(root: Path, poll: bool = False, interval: float = WATCH_POLL_INTERVAL):
+    """inotify, якщо доступний і не вимкнений, інакше сканування mtime."""
+    if not poll:
+        try:
+            return InotifyWatcher(root)
+        except (ImportError, OSError) as e:
+            print(f"[WARN] inotify unavailable ({e}). Falling back to mtime polling.")
+    return PollingWatcher(root, interval)
+
+
+class Debouncer:
+    """
+    Відкладає файли, доки сканер їх дописує.
+
+    Файл готовий, коли його підпис не змінювався debounce секунд. Вже оброблена
+    версія (той самий підпис) повторно не повертається. Записи про оброблені
+    файли, яких уже немає (забрали з папки), раз на prune_interval видаляються.
+    """
+
+    # Як часто (с) перевіряти, чи оброблені файли ще існують
+    prune_interval = 300.0
+
+    def __init__(self, debounce: float = WATCH_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self.pending: Dict[Path, Tuple[Signature, float]] = {}
+        self.processed: Dict[Path, Signature] = {}
+        self._last_prune = time.time()
+
+    def touch(self, path: Path, now: float) -> None:
+        """Реєструє зміну файлу."""
+        sig = _signature(path)
+        if sig is None:
+            self.pending.pop(path, None)
+            return
+        if sig == self.processed.get(path):
+            return
+        previous = self.pending.get(path)
+        if previous is None or previous[0] != sig:
+            self.pending[path] = (sig, now)
+
+    def mark_processed(self, paths: List[Path]) -> None:
+        """Позначає поточні версії файлів як оброблені (не ставити в чергу)."""
+        for path in paths:
+            sig = _signature(path)
+            if sig is not None:
+                self.processed[path] = sig
+
+    def prune(self, now: float) -> int:
+        """
+        Забуває оброблені файли, яких більше немає (не частіше, ніж раз на prune_interval).
+
+        Returns:
+            Кількість видалених записів
+        """
+        if now - self._last_prune < self.prune_interval:
+            return 0
+        self._last_prune = now
+
+        gone = [path for path in self.processed if not path.exists()]
+        for path in gone:
+            del self.processed[path]
+        return len(gone)
+
+    def pop_ready(self, now: float) -> List[Tuple[Path, Signature]]:
+        """Файли, стабільні протягом debounce; повторно перевіряє їх підпис."""
+        ready = []
+        for path, (sig, changed_at) in list(self.pending.items()):
+            current = _signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != sig:
+                self.pending[path] = (current, now)
+            elif now - changed_at >= self.debounce:
+                del self.pending[path]
+                ready.append((path, sig))
+        ready.sort()
+        return ready
+
+
+class JsonlSink:
+    """Усі результати в один JSONL-файл (ключ - шлях відносно папки)."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write_record(self, record: Dict[str, Any]) -> None:
+        record["processed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SidecarSink:
+    """Результат кожного скану в <скан>.json поруч з ним (атомарна заміна)."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def write_record(self, record: Dict[str, Any]) -> None:
+        target = self.root / (record["file"] + ".json")
+        tmp = target.with_name(f".{target.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, target)
+
+    def close(self) -> None:
+        pass
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def watch(
+    engine,
+    root: Path,
+    sink,
+    watcher,
+    debouncer: Debouncer,
+    batch_size: int = BATCH_SIZE,
+    quality: str = DEFAULT_QUALITY,
+    tasks=BATCH_DEFAULT_TASKS,
+    tier: Optional[str] = None,
+) -> None:
+    """Нескінченний цикл: зміни -> debounce -> батч в рушій -> sink."""
+    # Пробудження для debounce; PollingWatcher сам сканує не частіше за свій interval
+    tick = max(0.1, min(debouncer.debounce, getattr(watcher, "interval", debouncer.debounce)) / 2)
+
+    while True:
+        now = time.time()
+        for path in watcher.changes(tick):
+            debouncer.touch(path, now)
+        debouncer.prune(now)
+
+        ready = debouncer.pop_ready(time.time())
+        for chunk in _chunks(ready, batch_size):
+            items = [
+                (path.relative_to(root).as_posix(), (lambda path=path: path))
+                for path, _ in chunk
+            ]
+            counts = run_batch(
+                engine,
+                items,
+                sink,
+                batch_size=batch_size,
+                quality=quality,
+                tasks=tasks,
+                tier=tier,
+                workers=min(len(items), 4),
+            )
+            for path, sig in chunk:
+                debouncer.processed[path] = sig
+            print(f"[INFO] Processed {len(chunk)} file(s): {counts['success']} ok, {counts['error']} error(s)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Passport Reader - hot folder watcher")
+    parser.add_argument("folder", help="Папка, в яку сканер кладе файли")
+    parser.add_argument(
+        "--sink",
+        choices=["jsonl", "sidecar"],
+        default=WATCH_SINK,
+        help=f"Куди писати результати (default: {WATCH_SINK})"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="watch_results.jsonl",
+        help="JSONL-файл для --sink jsonl (default: watch_results.jsonl)"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Сканувати mtime замість inotify (мережеві папки)"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_POLL_INTERVAL,
+        help=f"Інтервал сканування, с (default: {WATCH_POLL_INTERVAL})"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=WATCH_DEBOUNCE_SECONDS,
+        help=f"Скільки секунд файл має не змінюватись (default: {WATCH_DEBOUNCE_SECONDS})"
+    )
+    parser.add_argument(
+        "--include-existing",
+        action="store_true",
+        help="Обробити також файли, що вже лежать у папці при старті"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Максимум файлів в одному generate (default: {BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--quality",
+        choices=list(QUALITY_LEVELS),
+        default=DEFAULT_QUALITY,
+        help=f"Рівень якості (default: {DEFAULT_QUALITY})"
+    )
+    parser.add_argument(
+        "--tasks",
+        nargs="+",
+        choices=[task for task in PROCESS_TASKS if task != "face_image"],
+        default=list(BATCH_DEFAULT_TASKS),
+        help="Задачі (default: " + " ".join(BATCH_DEFAULT_TASKS) + ")"
+    )
+    parser.add_argument(
+        "--model-tier",
+        choices=list(MODEL_TIERS),
+        default=None,
+        help="Примусовий рівень моделі (default: автоматична ескалація)"
+    )
+    return parser
+
+
+def main():
+    """Головна функція."""
+    args = build_parser().parse_args()
+
+    root = Path(args.folder).resolve()
+    if not root.is_dir():
+        print(f"[ERROR] Folder not found: {root}")
+        sys.exit(1)
+
+    watcher = create_watcher(root, poll=args.poll, interval=args.interval)
+    debouncer = Debouncer(args.debounce)
+
+    now = time.time()
+    if args.include_existing:
+        for path in watcher.existing():
+            debouncer.touch(path, now - args.debounce)
+    else:
+        debouncer.mark_processed(watcher.existing())
+
+    sink = SidecarSink(root) if args.sink == "sidecar" else JsonlSink(Path(args.output))
+
+    from engine_base import TieredOCREngine
+    engine = TieredOCREngine()
+
+    print(f"[INFO] Watching {root} ({watcher.name}, debounce {args.debounce}s, sink {args.sink})")
+    try:
+        watch(
+            engine,
+            root,
+            sink,
+            watcher,
+            debouncer,
+            batch_size=args.batch_size,
+            quality=args.quality,
+            tasks=args.tasks,
+            tier=args.model_tier,
+        )
+    except KeyboardInterrupt:
+        print("\n[INFO] Watcher stopped")
+    finally:
+        watcher.close()
+        sink.close()
+        engine.cleanup()
+
+
+if __name__ == "__main__":
+    main()